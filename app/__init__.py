@@ -1,12 +1,21 @@
 from flask import Flask
 from flask_socketio import SocketIO
-from app.game import Game
+from app.game.registry import GameRegistry
+from app.game.journal import Journal
+from app.game.store import RedisStore
+from app.web.fanout import client_manager
+import logging
 import os
 
 socketio = SocketIO(cors_allowed_origins="*", async_mode='eventlet')
-game_instance = Game()
+# Столы всех комнат процесса
+registry = GameRegistry()
 
-def create_app(test_config=None):
+logger = logging.getLogger(__name__)
+
+def create_app(test_config=None, asgi=False):
+    """Приложение Flask; asgi=True - для app/asgi.py: Socket.IO и цикл
+    столов обслуживает ASGI-сервер, Flask отдает страницы и HTTP API"""
     app = Flask(__name__,
                 template_folder='../templates',  # Путь к папке с шаблонами
                 static_folder='../static')       # Путь к статическим файлам
@@ -15,6 +24,16 @@ def create_app(test_config=None):
         app.config.from_mapping(
             SECRET_KEY=os.environ.get('SECRET_KEY', 'dev'),
             AI_PROGRESS_TOKEN=os.environ.get('AI_PROGRESS_TOKEN'),
+            # Каталог журналов столов; пустое значение отключает журнал.
+            # Используется одно хранилище: с REDIS_URL журнал не ведется
+            JOURNAL_DIR=os.environ.get('JOURNAL_DIR', 'journal'),
+            # Общее состояние столов для нескольких процессов
+            REDIS_URL=os.environ.get('REDIS_URL'),
+            # Очередь сообщений Socket.IO между процессами и интервал
+            # накопления дельт перед рассылкой
+            SOCKETIO_MESSAGE_QUEUE=os.environ.get('SOCKETIO_MESSAGE_QUEUE',
+                                                  os.environ.get('REDIS_URL')),
+            SOCKETIO_BATCH_INTERVAL=float(os.environ.get('SOCKETIO_BATCH_INTERVAL', '0.02')),
             DEBUG=os.environ.get('FLASK_DEBUG', '0') == '1'
         )
     else:
@@ -24,7 +43,36 @@ def create_app(test_config=None):
 
     from .web.routes import bp
     app.register_blueprint(bp)
+    recover = configure_registry(app)
+    if asgi:
+        return app
+
+    from .web import socket  # Регистрация обработчиков Socket.IO
+    socket.batcher.interval = app.config.get('SOCKETIO_BATCH_INTERVAL', 0.0)
 
-    socketio.init_app(app)
+    # Менеджер передается всегда: init_app запоминает параметры прошлых вызовов
+    socketio.init_app(app,
+                      client_manager=client_manager(app.config.get('SOCKETIO_MESSAGE_QUEUE')))
+    if recover:
+        registry.recover()
+    registry.start_gc()
 
     return app
+
+def configure_registry(app) -> bool:
+    """Хранилище столов из настроек; True - столы нужно восстановить из журнала
+
+    Общее хранилище - для нескольких процессов (состояние переживает
+    перезапуск в Redis), журнал файлов - для одного процесса. Используется
+    одно из них: стол переходит между процессами, и журнал каждого из них
+    содержал бы только часть событий стола.
+    """
+    if app.config.get('REDIS_URL') and registry.store is None:
+        if app.config.get('JOURNAL_DIR'):
+            logger.warning("Заданы REDIS_URL и JOURNAL_DIR: столы хранятся в Redis, "
+                           "журнал столов и история раздач не ведутся")
+        registry.store = RedisStore.from_url(app.config['REDIS_URL'])
+    elif app.config.get('JOURNAL_DIR') and registry.journal is None:
+        registry.journal = Journal(app.config['JOURNAL_DIR'])
+        return True
+    return False
@@ -0,0 +1,289 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+import argparse
+import json
+import os
+import random
+import time
+import numpy as np
+from .state import GameStateInfo
+from .strategy import Strategy, RandomStrategy, RuleBasedStrategy, MCTSStrategy
+from .batch_eval import line_categories, settle_boards, pad_line
+from .fantasy import FantasySolver
+from ..game.core import GameCore
+from ..game.deck import Card, Deck
+from ..game.player import Player, PlayerManager
+
+LINES = ('top', 'middle', 'bottom')
+SCOOP_BONUS = 3                # Как в ScoreCalculator: выигрыш всех линий
+Z_95 = 1.96
+
+def _make_mccfr(**params) -> Strategy:
+    from .mccfr import MCCFRAgent
+    return MCCFRAgent(player_id=params.pop('player_id', 'arena'), **params)
+
+# Фабрики стратегий по имени; параметры передаются в конструктор
+STRATEGIES = {
+    'random': RandomStrategy,
+    'rule': RuleBasedStrategy,
+    'mcts': MCTSStrategy,
+    'mccfr': _make_mccfr,
+}
+
+@dataclass(frozen=True)
+class StrategySpec:
+    """Описание стратегии, которое можно передать в процесс-воркер"""
+    name: str
+    params: Tuple[Tuple[str, object], ...] = ()
+    label: Optional[str] = None
+
+    @classmethod
+    def parse(cls, text: str) -> 'StrategySpec':
+        """Разбор строки вида "mcts:simulation_count=200" """
+        name, _, rest = text.partition(':')
+        params = []
+        for item in filter(None, rest.split(',')):
+            key, _, value = item.partition('=')
+            params.append((key, json.loads(value)))
+        return cls(name, tuple(params), label=text)
+
+    @property
+    def title(self) -> str:
+        return self.label or self.name
+
+    def create(self) -> Strategy:
+        if self.name not in STRATEGIES:
+            raise ValueError(f"Неизвестная стратегия: {self.name}")
+        return STRATEGIES[self.name](**dict(self.params))
+
+@dataclass
+class SeatRecord:
+    """Итог одной раздачи для одного места"""
+    points: float
+    fouled: bool
+    royalties: int
+    fantasy: bool
+    errors: int = 0             # Недопустимые действия стратегии
+
+def deal_deck(seed: int) -> List[Card]:
+    """Колода, перемешанная детерминированно по seed (порядок раздачи GameCore)"""
+    return Deck(random.Random(seed)).cards
+
+def score_boards(boards: Sequence[Dict[str, List[Card]]]) -> Tuple[List[float], List[SeatRecord]]:
+    """Очки двух игроков по правилам ScoreCalculator с учетом мертвых рук
+
+    Линии сравниваются по категориям комбинаций, выигрыш всех линий
+    дает SCOOP_BONUS, затем добавляется разница роялти. Мертвая рука
+    проигрывает все линии и не получает роялти.
+    """
+    def ids(cards: List[Card]) -> List[int]:
+        return [GameStateInfo._card_to_index(card) for card in cards]
+
+    lines = [np.stack([pad_line(ids(board[position]), 5) for board in boards])
+             for position in LINES]
+    _, fouled, royalties = settle_boards(lines[0][:, :3], lines[1], lines[2])
+    categories = np.stack([line_categories(line) for line in lines], axis=1)
+    fantasy = FantasySolver._qualifies_many(lines[0][:, :3]) & ~fouled
+
+    if fouled[0] and fouled[1]:
+        lines_won = 0
+    elif fouled[0] or fouled[1]:
+        lines_won = -3 if fouled[0] else 3
+    else:
+        lines_won = int(np.sign(categories[0] - categories[1]).sum())
+    points = lines_won + (SCOOP_BONUS * np.sign(lines_won) if abs(lines_won) == 3 else 0)
+    points += int(royalties[0]) - int(royalties[1])
+
+    records = [
+        SeatRecord(points=float(points * sign), fouled=bool(fouled[i]),
+                   royalties=int(royalties[i]), fantasy=bool(fantasy[i]))
+        for i, sign in enumerate((1, -1))
+    ]
+    return [record.points for record in records], records
+
+class HandRunner:
+    """Одна раздача двух стратегий в GameCore с колодой, заданной seed
+
+    Фантазия между раздачами не переносится: каждая раздача начинается
+    с обычной первой улицы.
+    """
+    def __init__(self, think_time: Optional[float] = None):
+        self.think_time = think_time
+
+    def play(self, strategies: Sequence[Strategy], seed: int) -> List[SeatRecord]:
+        players = PlayerManager()
+        for i in range(len(strategies)):
+            players.add_player(Player(f"seat{i}", f"Seat {i}", is_ai=True))
+        core = GameCore(players, random.Random(seed))
+
+        # Дерево MCTS от прошлой раздачи не пригодится
+        for strategy in strategies:
+            if isinstance(strategy, MCTSStrategy):
+                strategy.reset()
+
+        result = core.play_hand({f"seat{i}": strategy for i, strategy in enumerate(strategies)},
+                                self.think_time)
+        boards = [{position: getattr(player.hand, position) for position in LINES}
+                  for player in players.players.values()]
+        _, records = score_boards(boards)
+        for i, record in enumerate(records):
+            record.errors = result.errors[f"seat{i}"]
+        return records
+
+# Стратегии процесса-воркера, создаются один раз на спецификацию
+_worker_strategies: Dict[StrategySpec, Strategy] = {}
+
+def _strategy(spec: StrategySpec) -> Strategy:
+    if spec not in _worker_strategies:
+        _worker_strategies[spec] = spec.create()
+    return _worker_strategies[spec]
+
+def _play_duplicates(first: StrategySpec, second: StrategySpec, seeds: List[int],
+                     think_time: Optional[float]) -> List[Tuple[SeatRecord, SeatRecord]]:
+    """Дубликатные пары раздач: одна колода, стратегии меняются местами
+
+    Возвращает записи первой стратегии в обеих раздачах пары.
+    """
+    runner = HandRunner(think_time)
+    strategies = [_strategy(first), _strategy(second)]
+    pairs = []
+    for seed in seeds:
+        np.random.seed(seed % (2 ** 32))
+        direct = runner.play(strategies, seed)
+        np.random.seed(seed % (2 ** 32))
+        swapped = runner.play(strategies[::-1], seed)
+        pairs.append(((direct[0], swapped[1]), (direct[1], swapped[0])))
+    return pairs
+
+@dataclass
+class StrategyStats:
+    """Показатели стратегии в матче"""
+    hands: int = 0
+    fouls: int = 0
+    royalty_hands: int = 0
+    royalties: int = 0
+    fantasies: int = 0
+    errors: int = 0
+
+    def add(self, record: SeatRecord) -> None:
+        self.hands += 1
+        self.fouls += record.fouled
+        self.royalty_hands += record.royalties > 0
+        self.royalties += record.royalties
+        self.fantasies += record.fantasy
+        self.errors += record.errors
+
+    def to_dict(self) -> Dict:
+        hands = max(self.hands, 1)
+        return {
+            'foul_rate': self.fouls / hands,
+            'royalty_rate': self.royalty_hands / hands,
+            'mean_royalties': self.royalties / hands,
+            'fantasy_rate': self.fantasies / hands,
+            'errors': self.errors
+        }
+
+@dataclass
+class MatchResult:
+    """Итог матча двух стратегий"""
+    first: str
+    second: str
+    hands: int                  # Всего раздач (по две на дубликатную пару)
+    points_per_hand: float      # Очки первой стратегии за раздачу
+    ci95: float                 # Полуширина 95% доверительного интервала
+    elapsed: float
+    first_stats: StrategyStats = field(default_factory=StrategyStats)
+    second_stats: StrategyStats = field(default_factory=StrategyStats)
+
+    @property
+    def hands_per_second(self) -> float:
+        return self.hands / self.elapsed if self.elapsed > 0 else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            'first': self.first,
+            'second': self.second,
+            'hands': self.hands,
+            'points_per_hand': self.points_per_hand,
+            'ci95': self.ci95,
+            'hands_per_second': self.hands_per_second,
+            'first_stats': self.first_stats.to_dict(),
+            'second_stats': self.second_stats.to_dict()
+        }
+
+class Arena:
+    """Матчи стратегий на дубликатных раздачах в пуле процессов
+
+    Каждая колода играется дважды со сменой мест, поэтому удача раздачи
+    взаимно компенсируется. Независимая единица для доверительного
+    интервала - дубликатная пара.
+    """
+    def __init__(self, workers: Optional[int] = None, seed: int = 0,
+                 think_time: Optional[float] = None, chunk_size: int = 8):
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.seed = seed
+        self.think_time = think_time
+        self.chunk_size = chunk_size
+
+    def match(self, first: StrategySpec, second: StrategySpec, deals: int) -> MatchResult:
+        """Матч из deals дубликатных пар (2 * deals раздач)"""
+        seeds = [self.seed * 1_000_003 + i for i in range(deals)]
+        chunks = [seeds[i:i + self.chunk_size] for i in range(0, len(seeds), self.chunk_size)]
+        started = time.monotonic()
+
+        if self.workers > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = [pool.submit(_play_duplicates, first, second, chunk, self.think_time)
+                           for chunk in chunks]
+                pairs = [pair for future in futures for pair in future.result()]
+        else:
+            pairs = [pair for chunk in chunks
+                     for pair in _play_duplicates(first, second, chunk, self.think_time)]
+
+        result = MatchResult(first=first.title, second=second.title, hands=2 * len(pairs),
+                             points_per_hand=0.0, ci95=0.0,
+                             elapsed=time.monotonic() - started)
+        totals = []
+        for first_records, second_records in pairs:
+            totals.append(sum(record.points for record in first_records))
+            for record in first_records:
+                result.first_stats.add(record)
+            for record in second_records:
+                result.second_stats.add(record)
+
+        totals = np.array(totals, dtype=np.float64)
+        if len(totals):
+            result.points_per_hand = float(totals.mean() / 2)
+        if len(totals) > 1:
+            result.ci95 = float(Z_95 * totals.std(ddof=1) / np.sqrt(len(totals)) / 2)
+        return result
+
+    def round_robin(self, specs: Sequence[StrategySpec], deals: int) -> List[MatchResult]:
+        """Все пары стратегий"""
+        return [
+            self.match(specs[i], specs[j], deals)
+            for i in range(len(specs)) for j in range(i + 1, len(specs))
+        ]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Турнир стратегий ИИ")
+    parser.add_argument('strategies', nargs='+',
+                        help="Стратегии: random, rule, mcts, mccfr; параметры через "
+                             "двоеточие, например mcts:simulation_count=200")
+    parser.add_argument('--deals', type=int, default=100, help="Дубликатных пар на матч")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--think-time', type=float, default=None)
+    args = parser.parse_args()
+
+    specs = [StrategySpec.parse(text) for text in args.strategies]
+    if len(specs) < 2:
+        parser.error("Нужно не меньше двух стратегий")
+
+    arena = Arena(workers=args.workers, seed=args.seed, think_time=args.think_time)
+    for result in arena.round_robin(specs, args.deals):
+        print(json.dumps(result.to_dict()))
+
+if __name__ == '__main__':
+    main()
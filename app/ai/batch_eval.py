@@ -0,0 +1,109 @@
+from typing import Sequence, Tuple
+import numpy as np
+
+# Карты кодируются индексами 0-51 (ранг * 4 + масть), как в GameStateInfo.
+# Пустое место в линии обозначается -1.
+
+EMPTY = -1
+LINE_SIZES = (3, 5, 5)        # top, middle, bottom
+LINE_WEIGHTS = np.array([1.0, 1.5, 2.0])
+FOUL_PENALTY = 6.0            # Мертвая рука: проигрыш всех линий и бонус за скуп
+
+# Роялти по категории комбинации (индекс - результат HandEvaluator.evaluate_line)
+MIDDLE_ROYALTIES = np.array([0, 0, 0, 2, 4, 8, 12, 20, 30, 50], dtype=np.int32)
+BOTTOM_ROYALTIES = np.array([0, 0, 0, 0, 2, 4, 6, 10, 15, 25], dtype=np.int32)
+TOP_PAIR_ROYALTIES = np.zeros(13, dtype=np.int32)
+TOP_PAIR_ROYALTIES[10:] = [1, 2, 3]   # QQ, KK, AA
+
+_TEN = 8                       # Индекс ранга '10'
+
+def rank_counts(cards: np.ndarray) -> np.ndarray:
+    """Количество карт каждого ранга в линиях: (N, L) -> (N, 13)"""
+    cards = np.asarray(cards)
+    rows = np.broadcast_to(np.arange(len(cards))[:, None], cards.shape)
+    valid = cards >= 0
+    bins = rows[valid] * 13 + cards[valid] // 4
+    return np.bincount(bins, minlength=len(cards) * 13).reshape(len(cards), 13)
+
+def line_categories(cards: np.ndarray) -> np.ndarray:
+    """Категории комбинаций по правилам HandEvaluator.evaluate_line
+
+    Принимает массив (N, L) индексов карт и возвращает (N,) значений 0-9.
+    """
+    cards = np.asarray(cards)
+    valid = cards >= 0
+    count = valid.sum(axis=1)
+    counts = rank_counts(cards)
+
+    pairs = (counts == 2).sum(axis=1)
+    has_trips = (counts == 3).any(axis=1)
+    has_quads = (counts == 4).any(axis=1)
+
+    suits = np.where(valid, cards % 4, EMPTY)
+    five = count == 5
+    flush = five & (suits == suits[:, :1]).all(axis=1)
+
+    ranks = np.where(valid, cards // 4, EMPTY)
+    low = np.where(valid, ranks, 13).min(axis=1)
+    straight = five & ((counts > 0).sum(axis=1) == 5) & (ranks.max(axis=1) - low == 4)
+
+    return np.select(
+        [
+            flush & straight & (low == _TEN),
+            flush & straight,
+            has_quads,
+            has_trips & (pairs > 0),
+            flush,
+            straight,
+            has_trips,
+            pairs >= 2,
+            pairs == 1
+        ],
+        [9, 8, 7, 6, 5, 4, 3, 2, 1],
+        default=0
+    )
+
+def top_royalties(cards: np.ndarray) -> np.ndarray:
+    """Роялти верхней линии: сет или пара от дам"""
+    counts = rank_counts(cards)
+    complete = (np.asarray(cards) >= 0).sum(axis=1) == 3
+    best_rank = counts.argmax(axis=1)
+    best_count = counts.max(axis=1)
+    royalties = np.where(best_count == 3, best_rank + 10,
+                         np.where(best_count == 2, TOP_PAIR_ROYALTIES[best_rank], 0))
+    return np.where(complete, royalties, 0)
+
+def settle_boards(top: np.ndarray, middle: np.ndarray,
+                  bottom: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Оценка расстановок одного игрока
+
+    Возвращает (value, fouled, royalties). Мертвая законченная рука
+    стоит -FOUL_PENALTY, иначе сумма роялти плюс взвешенная сила линий.
+    """
+    categories = np.stack([
+        line_categories(top), line_categories(middle), line_categories(bottom)
+    ], axis=1)
+    complete = ((np.asarray(top) >= 0).sum(axis=1) == 3) & \
+        ((np.asarray(middle) >= 0).sum(axis=1) == 5) & \
+        ((np.asarray(bottom) >= 0).sum(axis=1) == 5)
+    fouled = complete & ((categories[:, 0] > categories[:, 1]) |
+                         (categories[:, 1] > categories[:, 2]))
+
+    royalties = top_royalties(top) + MIDDLE_ROYALTIES[categories[:, 1]] + \
+        BOTTOM_ROYALTIES[categories[:, 2]]
+    royalties = np.where(fouled, 0, royalties)
+
+    value = np.where(fouled, -FOUL_PENALTY, royalties + categories @ LINE_WEIGHTS)
+    return value, fouled, royalties
+
+def pad_line(cards: Sequence[int], size: int) -> np.ndarray:
+    """Линия фиксированной длины с пустыми местами"""
+    line = np.full(size, EMPTY, dtype=np.int16)
+    line[:len(cards)] = cards
+    return line
+
+def settle_board(top: Sequence[int], middle: Sequence[int], bottom: Sequence[int]) -> float:
+    """Оценка одной расстановки (см. settle_boards)"""
+    value, _, _ = settle_boards(pad_line(top, 3)[None], pad_line(middle, 5)[None],
+                                pad_line(bottom, 5)[None])
+    return float(value[0])
@@ -0,0 +1,58 @@
+from typing import Any, Callable, Optional
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class DecisionPool:
+    """Решения ИИ вне цикла столов: пул потоков с дедлайнами
+
+    Решения агента (прямой проход сети, поиск) блокировали бы
+    цикл всех столов процесса; в пуле они идут в своих потоках (torch
+    отпускает GIL на время вычислений), а корутина стола ждет результата,
+    не мешая ходам людей за другими столами. Пул процессов здесь не
+    подходит: модель агента общая для столов и живет в основном процессе.
+
+    Решение, не готовое к дедлайну (плюс grace секунд на возврат
+    результата), отбрасывается - decide возвращает None, и стол ходит
+    быстрой эвристикой. Отмена ожидающей корутины (стол закрыт) отменяет
+    и задачу пула, если она еще не начата.
+    """
+    def __init__(self, workers: int = 2, grace: float = 0.05):
+        self.workers = workers
+        self.grace = grace
+        self.timeouts = 0          # Решений, не уложившихся в дедлайн
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                thread_name_prefix='ai-decisions')
+        return self._executor
+
+    async def run(self, function: Callable, *args: Any) -> Any:
+        """Вызов в пуле без дедлайна (решатель фантазии)"""
+        return await asyncio.wrap_future(self._get_executor().submit(function, *args))
+
+    async def decide(self, agent, state, deadline: float) -> Optional[Any]:
+        """Действие agent.get_action(state, deadline) или None, если агент
+        не успел к дедлайну или упал"""
+        future = asyncio.wrap_future(self._get_executor().submit(agent.get_action, state,
+                                                                 deadline))
+        timeout = max(deadline - time.monotonic(), 0.0) + self.grace
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logger.warning("Решение ИИ не готово за %.2f с", timeout)
+        except Exception:
+            logger.exception("Ошибка решения ИИ")
+        return None
+
+    def close(self) -> None:
+        """Остановка пула; начатые решения дорабатывают до своих дедлайнов"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
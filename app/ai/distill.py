@@ -0,0 +1,266 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+from dataclasses import dataclass, field
+import argparse
+import json
+import os
+import tempfile
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from .state import GameStateInfo, ActionSpace
+from .strategy import Strategy
+from .experience import ExperienceStore, PolicyTrainer, make_experience_loader, STATE_SIZE, ACTION_SIZE
+from ..game.deck import Card, Deck
+
+class CompactPolicyNetwork(nn.Module):
+    """Компактный вариант PolicyNetwork для раздачи в веб-воркеры
+
+    Без BatchNorm и Dropout: модель всегда работает в режиме инференса
+    и корректно обрабатывает одиночные состояния.
+    """
+    def __init__(self, input_size: int = STATE_SIZE,
+                 hidden_sizes: Sequence[int] = (128, 64)):
+        super().__init__()
+        self.hidden_sizes = tuple(hidden_sizes)
+        sizes = [input_size] + list(self.hidden_sizes)
+        self.hidden = nn.ModuleList(
+            nn.Linear(sizes[i], sizes[i + 1]) for i in range(len(self.hidden_sizes))
+        )
+        self.output = nn.Linear(sizes[-1], ACTION_SIZE)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        for layer in self.hidden:
+            x = F.relu(layer(x))
+        return F.softmax(self.output(x), dim=-1)
+
+def model_memory_bytes(model: nn.Module) -> int:
+    """Объем памяти параметров и буферов модели в байтах"""
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+def sample_states(count: int, seed: Optional[int] = None) -> List[GameStateInfo]:
+    """Случайные достижимые состояния игры для обучения ученика"""
+    rng = np.random.default_rng(seed)
+    all_cards = [Card(rank, suit) for suit in Deck.SUITS for rank in Deck.RANKS]
+    states = []
+
+    for _ in range(count):
+        street = int(rng.integers(1, 6))
+        order = rng.permutation(len(all_cards))
+        cards = [all_cards[i] for i in order]
+
+        placed_count = 0 if street == 1 else 5 + 2 * (street - 2)
+        hand_count = 5 if street == 1 else 3
+        lines = {'top': [], 'middle': [], 'bottom': []}
+        capacity = {'top': 3, 'middle': 5, 'bottom': 5}
+        for card in cards[:placed_count]:
+            open_lines = [pos for pos in lines if len(lines[pos]) < capacity[pos]]
+            lines[open_lines[int(rng.integers(len(open_lines)))]].append(card)
+
+        states.append(GameStateInfo(
+            available_cards=cards[placed_count + hand_count:],
+            hand_cards=cards[placed_count:placed_count + hand_count],
+            top_line=lines['top'],
+            middle_line=lines['middle'],
+            bottom_line=lines['bottom'],
+            opponent_visible={},
+            street=street,
+            is_fantasy=False
+        ))
+
+    return states
+
+class StrategyTableTeacher:
+    """Учитель из экспортированной таблицы усредненной стратегии MCCFR"""
+    def __init__(self, strategy_sum: Dict[str, float]):
+        self.strategy_sum = strategy_sum
+        self.action_space = ActionSpace()
+
+    @classmethod
+    def from_file(cls, path: str) -> 'StrategyTableTeacher':
+        """Загрузка таблицы из JSON или из сохраненного состояния агента"""
+        if path.endswith('.json'):
+            with open(path) as f:
+                state = json.load(f)
+        else:
+            state = torch.load(path, map_location='cpu', weights_only=False)
+        return cls(state['strategy_sum'])
+
+    def get_average_strategy(self, state: GameStateInfo) -> np.ndarray:
+        from .mccfr import MCCFRAgent
+
+        valid_actions = self.action_space.get_valid_actions(state)
+        return MCCFRAgent.average_strategy(
+            self.strategy_sum, MCCFRAgent._state_to_key(state), len(valid_actions)
+        )
+
+@dataclass
+class DistillationReport:
+    """Результат дистилляции одной конфигурации ученика"""
+    hidden_sizes: Tuple[int, ...]
+    agreement: float            # Доля совпадений лучшего действия с учителем
+    memory_bytes: int           # Объем параметров модели
+    samples: int
+    losses: List[float] = field(default_factory=list)
+
+    def to_dict(self) -> Dict:
+        return {
+            'hidden_sizes': list(self.hidden_sizes),
+            'agreement': self.agreement,
+            'memory_bytes': self.memory_bytes,
+            'samples': self.samples,
+            'losses': self.losses
+        }
+
+class PolicyDistiller:
+    """Дистилляция усредненной стратегии MCCFR в компактную сеть
+
+    Учитель - любой объект с методом get_average_strategy(state),
+    например MCCFRAgent или StrategyTableTeacher.
+    """
+    def __init__(self, teacher, learning_rate: float = 0.003,
+                 batch_size: int = 256, num_workers: int = 0):
+        self.teacher = teacher
+        self.action_space = ActionSpace()
+        self.learning_rate = learning_rate
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+
+    def _encode(self, state: GameStateInfo) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Вектор состояния, маска допустимых действий и цель учителя"""
+        valid_actions = self.action_space.get_valid_actions(state)
+        strategy = self.teacher.get_average_strategy(state)
+        mask = np.zeros(ACTION_SIZE, dtype=np.uint8)
+        target = np.zeros(ACTION_SIZE, dtype=np.float32)
+        for action, prob in zip(valid_actions, strategy):
+            idx = self.action_space.action_to_index(action)
+            mask[idx] = 1
+            target[idx] += prob
+        return state.to_numpy().astype(np.float32), mask, target
+
+    def build_dataset(self, states: List[GameStateInfo], directory: str) -> ExperienceStore:
+        """Запись целей учителя в хранилище опыта"""
+        store = ExperienceStore(directory, capacity=max(len(states), 1))
+        for state in states:
+            if not state.hand_cards:
+                continue
+            store.append(*self._encode(state))
+        store.flush()
+        return store
+
+    def agreement(self, model: nn.Module, states: List[GameStateInfo]) -> float:
+        """Доля состояний, где лучшее действие ученика совпадает с учителем"""
+        encoded = [self._encode(state) for state in states if state.hand_cards]
+        if not encoded:
+            return 0.0
+
+        vectors, masks, targets = (np.stack(part) for part in zip(*encoded))
+        model.eval()
+        with torch.no_grad():
+            probs = model(torch.from_numpy(vectors)).numpy()
+
+        student_best = np.argmax(np.where(masks > 0, probs, -1.0), axis=1)
+        teacher_best = np.argmax(np.where(masks > 0, targets, -1.0), axis=1)
+        return float(np.mean(student_best == teacher_best))
+
+    def distill(self, states: List[GameStateInfo], hidden_sizes: Sequence[int] = (128, 64),
+                epochs: int = 10, holdout: Optional[List[GameStateInfo]] = None,
+                workdir: Optional[str] = None) -> Tuple[CompactPolicyNetwork, DistillationReport]:
+        """Обучение ученика на целях учителя"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            directory = workdir or os.path.join(tmp_dir, 'distill')
+            store = self.build_dataset(states, directory)
+
+            model = CompactPolicyNetwork(hidden_sizes=hidden_sizes)
+            optimizer = torch.optim.Adam(model.parameters(), lr=self.learning_rate)
+            loader = make_experience_loader(directory, batch_size=self.batch_size,
+                                            num_workers=self.num_workers)
+            losses = PolicyTrainer(model, optimizer).fit(loader, epochs)
+
+        report = DistillationReport(
+            hidden_sizes=model.hidden_sizes,
+            agreement=self.agreement(model, holdout if holdout is not None else states),
+            memory_bytes=model_memory_bytes(model),
+            samples=len(store),
+            losses=losses
+        )
+        return model, report
+
+    def sweep(self, states: List[GameStateInfo], holdout: List[GameStateInfo],
+              hidden_configs: List[Sequence[int]], epochs: int = 10) -> List[DistillationReport]:
+        """Дистилляция нескольких конфигураций скрытых слоев"""
+        return [
+            self.distill(states, hidden_sizes, epochs=epochs, holdout=holdout)[1]
+            for hidden_sizes in hidden_configs
+        ]
+
+def save_compact_policy(model: CompactPolicyNetwork, path: str, half: bool = True) -> None:
+    """Сохранение ученика (по умолчанию в float16)"""
+    state_dict = {
+        name: tensor.half() if half and tensor.is_floating_point() else tensor
+        for name, tensor in model.state_dict().items()
+    }
+    torch.save({'hidden_sizes': list(model.hidden_sizes), 'state_dict': state_dict}, path)
+
+def load_compact_policy(path: str) -> CompactPolicyNetwork:
+    """Загрузка ученика для инференса"""
+    data = torch.load(path, map_location='cpu')
+    model = CompactPolicyNetwork(hidden_sizes=data['hidden_sizes'])
+    model.load_state_dict({name: tensor.float() for name, tensor in data['state_dict'].items()})
+    model.eval()
+    return model
+
+class DistilledPolicyStrategy(Strategy):
+    """Стратегия на основе дистиллированной компактной сети"""
+    def __init__(self, model: CompactPolicyNetwork):
+        self.model = model.eval()
+        self.action_space = ActionSpace()
+
+    @classmethod
+    def from_file(cls, path: str) -> 'DistilledPolicyStrategy':
+        return cls(load_compact_policy(path))
+
+    def get_action(self, state: GameStateInfo, deadline: Optional[float] = None) -> Dict:
+        valid_actions = self.action_space.get_valid_actions(state)
+        if not valid_actions:
+            return {}
+
+        state_tensor = torch.from_numpy(state.to_numpy().astype(np.float32)).unsqueeze(0)
+        with torch.no_grad():
+            probs = self.model(state_tensor)[0].numpy()
+
+        indices = [self.action_space.action_to_index(action) for action in valid_actions]
+        return valid_actions[int(np.argmax(probs[indices]))]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Дистилляция стратегии MCCFR")
+    parser.add_argument('tables', help="Файл с strategy_sum (JSON или torch)")
+    parser.add_argument('output', help="Путь для сохранения компактной модели")
+    parser.add_argument('--hidden', action='append', default=None,
+                        help="Размеры скрытых слоев через запятую, можно несколько")
+    parser.add_argument('--samples', type=int, default=20000)
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    hidden_configs = [
+        tuple(int(size) for size in config.split(','))
+        for config in (args.hidden or ['128,64'])
+    ]
+    distiller = PolicyDistiller(StrategyTableTeacher.from_file(args.tables))
+    states = sample_states(args.samples, seed=args.seed)
+    holdout = sample_states(max(args.samples // 10, 1), seed=args.seed + 1)
+
+    best_model, best_report = None, None
+    for hidden_sizes in hidden_configs:
+        model, report = distiller.distill(states, hidden_sizes, epochs=args.epochs,
+                                          holdout=holdout)
+        print(json.dumps(report.to_dict()))
+        if best_report is None or report.agreement > best_report.agreement:
+            best_model, best_report = model, report
+
+    save_compact_policy(best_model, args.output)
+
+if __name__ == '__main__':
+    main()
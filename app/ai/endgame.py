@@ -0,0 +1,226 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import combinations
+import time
+import numpy as np
+from .state import GameStateInfo
+from .batch_eval import (LINE_WEIGHTS, FOUL_PENALTY, MIDDLE_ROYALTIES, BOTTOM_ROYALTIES,
+                         line_categories, top_royalties, settle_boards)
+from .search_state import SearchState, CAPACITY, LINES, CARDS
+from .placement import street_assignments, build_boards
+from .rollout import DISCARD
+from ..game.deck import Card
+
+SUIT_BITS = sum(1 << (rank * 4) for rank in range(13))   # Карты масти 0 в маске
+DEAL_SIZE = 3                  # Карт на улице после первой
+PLACE_SIZE = 2                 # Из них размещается
+
+def permute_suits(mask: int, permutation: Sequence[int]) -> int:
+    """Маска карт после перестановки мастей"""
+    result = 0
+    for suit in range(4):
+        result |= ((mask >> suit) & SUIT_BITS) << permutation[suit]
+    return result
+
+def canonical_key(masks: Sequence[int]) -> Tuple[int, ...]:
+    """Ключ, одинаковый для позиций, отличающихся только названиями мастей
+
+    Масти равноправны: сила линий и роялти не зависят от конкретной
+    масти. Масти упорядочиваются по набору своих карт во всех масках,
+    одинаковые по этому набору масти взаимозаменяемы, поэтому ключ не
+    зависит от исходных названий.
+    """
+    parts = [tuple((mask >> suit) & SUIT_BITS for mask in masks) for suit in range(4)]
+    order = sorted(range(4), key=lambda suit: parts[suit], reverse=True)
+    key = [0] * len(masks)
+    for new_suit, suit in enumerate(order):
+        for i, part in enumerate(parts[suit]):
+            key[i] |= part << new_suit
+    return tuple(key)
+
+@lru_cache(maxsize=64)
+def _deal_pairs(deck_size: int) -> np.ndarray:
+    """Плоские индексы таблицы пар (6, D) для всех раздач трех карт из колоды
+    размера deck_size: упорядоченные пары карт раздачи, первая карта - в
+    первое свободное место, вторая - во второе"""
+    deals = np.array(list(combinations(range(deck_size), DEAL_SIZE)),
+                     dtype=np.intp).reshape(-1, DEAL_SIZE)
+    result = np.stack([deals[:, a] * deck_size + deals[:, b]
+                       for a in range(DEAL_SIZE) for b in range(DEAL_SIZE) if a != b])
+    result.setflags(write=False)
+    return result
+
+@dataclass
+class EndgameSolution:
+    """Точное решение последних улиц"""
+    actions: List[Dict]         # Размещения оставшихся карт текущей улицы
+    value: float                # Ожидаемая оценка доски (как settle_board)
+    options: int                # Рассмотрено распределений улицы
+    boards: int                 # Оценено конечных досок
+    memo_hits: int
+    elapsed: float = 0.0
+
+class EndgameSolver:
+    """Точный expectimax для улиц 4-5
+
+    На последней улице каждое распределение карт руки сразу дает
+    законченную доску. На предпоследней после размещения остается два
+    места; для такой доски строится таблица оценок всех упорядоченных
+    пар карт колоды в этих местах, и ожидаемое значение - среднее по всем
+    раздачам трех карт максимума по шести способам выбрать две из них.
+    Ожидания запоминаются по каноническому ключу (линии и колода с
+    точностью до перестановки мастей), поэтому второе размещение улицы
+    и совпадающие доски не пересчитываются.
+
+    Оценка доски - settle_board, как у терминальных узлов MCTS.
+    """
+    def __init__(self, max_entries: int = 1 << 14):
+        self.max_entries = max_entries
+        self.memo: Dict[Tuple[int, ...], float] = {}
+        self.memo_hits = 0
+        self.boards = 0
+
+    @staticmethod
+    def _street_shape(state: SearchState) -> Tuple[int, int]:
+        """(карт разместить на этой улице, мест останется после нее)"""
+        discards = 1 if state.street > 1 or state.is_fantasy else 0
+        hand = bin(state.hand).count('1')
+        place_count = max(min(hand - discards, state.free_slots()), 0)
+        return place_count, state.free_slots() - place_count
+
+    def is_applicable(self, state: SearchState) -> bool:
+        """Дерево до конца раздачи достаточно мало для точного решения"""
+        if state.is_fantasy:
+            return False
+        place_count, remaining = self._street_shape(state)
+        if place_count == 0:
+            return False
+        if remaining == 0:
+            return True
+        return remaining == PLACE_SIZE and bin(state.deck).count('1') >= DEAL_SIZE
+
+    def solve(self, state: GameStateInfo) -> Optional[EndgameSolution]:
+        """Лучшее по ожиданию распределение карт улицы или None,
+        если позиция слишком далека от конца раздачи"""
+        started = time.monotonic()
+        search_state = SearchState.from_state(state)
+        if not self.is_applicable(search_state):
+            return None
+
+        hits_before, boards_before = self.memo_hits, self.boards
+        place_count, remaining = self._street_shape(search_state)
+        hand = search_state.hand_cards()
+        free = tuple(CAPACITY[line] - search_state.line_len[line] for line in range(3))
+
+        assignments = street_assignments(len(hand), place_count, free)
+        line_len = np.array(search_state.line_len, dtype=np.int8)
+        lines, lengths = build_boards(search_state.board(), line_len,
+                                      np.array(hand, dtype=np.int16), assignments)
+
+        if remaining == 0:
+            values, _, _ = settle_boards(lines[:, 0, :3], lines[:, 1], lines[:, 2])
+            self.boards += len(lines)
+        else:
+            deck = search_state.remaining_deck()
+            values = np.array([self._expected_value(board, board_len, deck)
+                               for board, board_len in zip(lines, lengths)])
+
+        best = int(np.argmax(values))
+        actions = []
+        next_index = search_state.line_len.copy()
+        for card, line in zip(hand, assignments[best].tolist()):
+            if line == DISCARD:
+                continue
+            actions.append({'type': 'place_card', 'card': _hand_card(state, card),
+                            'position': LINES[line], 'index': next_index[line]})
+            next_index[line] += 1
+
+        return EndgameSolution(
+            actions=actions,
+            value=float(values[best]),
+            options=len(assignments),
+            boards=self.boards - boards_before,
+            memo_hits=self.memo_hits - hits_before,
+            elapsed=time.monotonic() - started
+        )
+
+    def _expected_value(self, board: np.ndarray, board_len: np.ndarray,
+                        deck: List[int]) -> float:
+        """Ожидание лучшей конечной доски после раздачи последней улицы"""
+        line_masks = [sum(1 << int(card) for card in board[line, :board_len[line]])
+                      for line in range(3)]
+        deck_mask = sum(1 << card for card in deck)
+        key = canonical_key(line_masks + [deck_mask])
+        if key in self.memo:
+            self.memo_hits += 1
+            return self.memo[key]
+
+        table = self._pair_table(board, board_len, np.array(deck, dtype=np.int16))
+        value = float(table.ravel().take(_deal_pairs(len(deck))).max(axis=0).mean())
+
+        if len(self.memo) >= self.max_entries:
+            self.memo.clear()
+        self.memo[key] = value
+        return value
+
+    def _pair_table(self, board: np.ndarray, board_len: np.ndarray,
+                    deck: np.ndarray) -> np.ndarray:
+        """Оценки законченных досок (n, n): карта i колоды в первое свободное
+        место, карта j - во второе; на диагонали -inf
+
+        Если свободные места в разных линиях, каждая из них зависит от одной
+        карты, и оцениваются только 2n линий вместо n^2 досок.
+        """
+        size = len(deck)
+        slots = [(line, int(board_len[line]) + offset) for line in range(3)
+                 for offset in range(CAPACITY[line] - int(board_len[line]))]
+        (first_line, first_pos), (second_line, second_pos) = slots
+
+        categories, royalties = [], []
+        for line in range(3):
+            cards = board[line, :CAPACITY[line]]
+            if line == first_line == second_line:
+                # Оба места в одной линии: все пары карт (диагональ отбрасывается)
+                cards = np.tile(cards, (size * size, 1))
+                cards[:, first_pos] = np.repeat(deck, size)
+                cards[:, second_pos] = np.tile(deck, size)
+                shape = (size, size)
+            elif line in (first_line, second_line):
+                cards = np.tile(cards, (size, 1))
+                cards[:, first_pos if line == first_line else second_pos] = deck
+                shape = (size, 1) if line == first_line else (1, size)
+            else:
+                cards = cards[None]
+                shape = (1, 1)
+
+            category, royalty = _line_values(line, cards)
+            categories.append(category.reshape(shape))
+            royalties.append(royalty.reshape(shape))
+        self.boards += size * (size - 1)
+
+        fouled = (categories[0] > categories[1]) | (categories[1] > categories[2])
+        value = royalties[0] + royalties[1] + royalties[2] + \
+            LINE_WEIGHTS[0] * categories[0] + LINE_WEIGHTS[1] * categories[1] + \
+            LINE_WEIGHTS[2] * categories[2]
+        table = np.where(fouled, -FOUL_PENALTY, value)
+        table = np.broadcast_to(table, (size, size)).astype(np.float64)
+        np.fill_diagonal(table, -np.inf)
+        return table
+
+    def clear(self) -> None:
+        self.memo.clear()
+
+def _line_values(line: int, cards: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Категории и роялти законченных линий (как в settle_boards)"""
+    categories = line_categories(cards)
+    if line == 0:
+        return categories, top_royalties(cards)
+    return categories, (MIDDLE_ROYALTIES if line == 1 else BOTTOM_ROYALTIES)[categories]
+
+def _hand_card(state: GameStateInfo, card: int) -> Card:
+    """Объект карты руки по индексу (действие должно ссылаться на карту руки)"""
+    for hand_card in state.hand_cards:
+        if GameStateInfo._card_to_index(hand_card) == card:
+            return hand_card
+    return CARDS[card]
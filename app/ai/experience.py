@@ -0,0 +1,232 @@
+from typing import Dict, List, Optional, Tuple
+import json
+import os
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.utils.data import BatchSampler, DataLoader, Dataset, RandomSampler, SequentialSampler
+
+STATE_SIZE = 220          # Размер вектора GameStateInfo.to_numpy()
+ACTION_SIZE = 52 * 13     # Размер пространства действий ActionSpace
+
+class ExperienceStore:
+    """Хранилище опыта на memmap-файлах (только добавление)
+
+    Каждая запись - закодированное состояние, маска допустимых действий,
+    целевое распределение по действиям и вес примера. Данные лежат на
+    локальном диске, поэтому объем выборки не ограничен оперативной памятью.
+    """
+    FIELDS = {
+        'states': (np.float32, STATE_SIZE),
+        'masks': (np.uint8, ACTION_SIZE),
+        'targets': (np.float32, ACTION_SIZE),
+        'weights': (np.float32, None)
+    }
+    META_FILE = 'meta.json'
+
+    def __init__(self, directory: str, capacity: int = 10000, readonly: bool = False):
+        self.directory = directory
+        self.readonly = readonly
+        self.size = 0
+        self.capacity = capacity
+        self._arrays: Dict[str, np.memmap] = {}
+
+        meta_path = os.path.join(directory, self.META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            self.size = meta['size']
+            self.capacity = meta['capacity']
+            self._open('r' if readonly else 'r+')
+        elif readonly:
+            raise ValueError(f"Хранилище опыта не найдено: {directory}")
+        else:
+            os.makedirs(directory, exist_ok=True)
+            self._open('w+')
+            self._write_meta()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.dat")
+
+    def _shape(self, name: str) -> Tuple[int, ...]:
+        width = self.FIELDS[name][1]
+        return (self.capacity,) if width is None else (self.capacity, width)
+
+    def _open(self, mode: str) -> None:
+        """Открытие memmap-файлов всех полей"""
+        self._arrays = {
+            name: np.memmap(self._path(name), dtype=dtype, mode=mode,
+                            shape=self._shape(name))
+            for name, (dtype, _) in self.FIELDS.items()
+        }
+
+    def _write_meta(self) -> None:
+        meta = {'size': self.size, 'capacity': self.capacity}
+        tmp_path = os.path.join(self.directory, self.META_FILE + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(self.directory, self.META_FILE))
+
+    def _reserve(self, count: int) -> None:
+        """Увеличение емкости файлов при необходимости"""
+        required = self.size + count
+        if required <= self.capacity:
+            return
+
+        new_capacity = max(required, self.capacity * 2)
+        self.flush()
+        self._arrays = {}
+        for name, (dtype, width) in self.FIELDS.items():
+            row_bytes = np.dtype(dtype).itemsize * (width or 1)
+            with open(self._path(name), 'r+b') as f:
+                f.truncate(new_capacity * row_bytes)
+        self.capacity = new_capacity
+        self._open('r+')
+
+    def append(self, state: np.ndarray, mask: np.ndarray, target: np.ndarray,
+               weight: float = 1.0) -> int:
+        """Добавление одной записи, возвращает ее индекс"""
+        self.extend(state[None], mask[None], target[None], np.array([weight]))
+        return self.size - 1
+
+    def extend(self, states: np.ndarray, masks: np.ndarray, targets: np.ndarray,
+               weights: Optional[np.ndarray] = None) -> None:
+        """Добавление пачки записей"""
+        if self.readonly:
+            raise ValueError("Хранилище открыто только для чтения")
+
+        count = len(states)
+        if weights is None:
+            weights = np.ones(count, dtype=np.float32)
+        if not (len(masks) == len(targets) == len(weights) == count):
+            raise ValueError("Размеры пачки не совпадают")
+
+        self._reserve(count)
+        start, end = self.size, self.size + count
+        self._arrays['states'][start:end] = states
+        self._arrays['masks'][start:end] = masks
+        self._arrays['targets'][start:end] = targets
+        self._arrays['weights'][start:end] = weights
+        self.size = end
+
+    def get_batch(self, indices: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """Чтение записей по индексам (индексы сортируются для локальности)"""
+        indices = np.sort(np.asarray(indices))
+        return tuple(
+            np.asarray(self._arrays[name][indices])
+            for name in ('states', 'masks', 'targets', 'weights')
+        )
+
+    def flush(self) -> None:
+        """Сброс данных и метаданных на диск"""
+        if self.readonly:
+            return
+        for array in self._arrays.values():
+            array.flush()
+        self._write_meta()
+
+class ExperienceDataset(Dataset):
+    """Датасет поверх ExperienceStore, отдающий сразу целые минибатчи
+
+    Файлы открываются лениво в каждом процессе-воркере, поэтому датасет
+    передается воркерам DataLoader без копирования данных.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._store: Optional[ExperienceStore] = None
+        self._size = len(ExperienceStore(directory, readonly=True))
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, indices: List[int]) -> Tuple[torch.Tensor, ...]:
+        if self._store is None:
+            self._store = ExperienceStore(self.directory, readonly=True)
+        states, masks, targets, weights = self._store.get_batch(indices)
+        return (
+            torch.from_numpy(states),
+            torch.from_numpy(masks.astype(np.bool_)),
+            torch.from_numpy(targets),
+            torch.from_numpy(weights)
+        )
+
+    def __getstate__(self) -> Dict:
+        state = self.__dict__.copy()
+        state['_store'] = None
+        return state
+
+def make_experience_loader(directory: str, batch_size: int = 256, shuffle: bool = True,
+                           num_workers: int = 2, prefetch_factor: int = 4,
+                           seed: Optional[int] = None) -> DataLoader:
+    """DataLoader с перемешанными минибатчами и предвыборкой в воркерах"""
+    dataset = ExperienceDataset(directory)
+    generator = torch.Generator()
+    if seed is not None:
+        generator.manual_seed(seed)
+
+    base_sampler = RandomSampler(dataset, generator=generator) if shuffle \
+        else SequentialSampler(dataset)
+    sampler = BatchSampler(base_sampler, batch_size=batch_size, drop_last=False)
+
+    loader_kwargs = {}
+    if num_workers > 0:
+        loader_kwargs = {'prefetch_factor': prefetch_factor, 'persistent_workers': True}
+
+    return DataLoader(
+        dataset,
+        sampler=sampler,
+        batch_size=None,  # Батчи формирует BatchSampler
+        num_workers=num_workers,
+        pin_memory=torch.cuda.is_available(),
+        **loader_kwargs
+    )
+
+def masked_policy_loss(action_probs: torch.Tensor, masks: torch.Tensor,
+                       targets: torch.Tensor, weights: torch.Tensor) -> torch.Tensor:
+    """Взвешенная кросс-энтропия по допустимым действиям"""
+    masked = action_probs * masks
+    masked = masked / masked.sum(dim=-1, keepdim=True).clamp_min(1e-8)
+    cross_entropy = -(targets * torch.log(masked.clamp_min(1e-8))).sum(dim=-1)
+    return (cross_entropy * weights).sum() / weights.sum().clamp_min(1e-8)
+
+class PolicyTrainer:
+    """Обучение сети политики по эпохам на минибатчах из хранилища"""
+    def __init__(self, network: nn.Module, optimizer: torch.optim.Optimizer,
+                 device: Optional[torch.device] = None):
+        self.network = network
+        self.optimizer = optimizer
+        self.device = device or torch.device("cpu")
+
+    def train_epoch(self, loader: DataLoader) -> float:
+        """Одна эпоха обучения, возвращает средний loss"""
+        self.network.train()
+        total_loss = 0.0
+        total_weight = 0.0
+
+        for states, masks, targets, weights in loader:
+            # BatchNorm не обучается на батче из одной строки
+            if len(states) < 2:
+                continue
+            states = states.to(self.device, non_blocking=True)
+            masks = masks.to(self.device, non_blocking=True)
+            targets = targets.to(self.device, non_blocking=True)
+            weights = weights.to(self.device, non_blocking=True)
+
+            self.optimizer.zero_grad()
+            loss = masked_policy_loss(self.network(states), masks, targets, weights)
+            loss.backward()
+            self.optimizer.step()
+
+            batch_weight = float(weights.sum())
+            total_loss += loss.item() * batch_weight
+            total_weight += batch_weight
+
+        self.network.eval()
+        return total_loss / total_weight if total_weight else 0.0
+
+    def fit(self, loader: DataLoader, epochs: int = 1) -> List[float]:
+        """Обучение на протяжении нескольких эпох"""
+        return [self.train_epoch(loader) for _ in range(epochs)]
@@ -0,0 +1,192 @@
+from typing import Dict, List, Optional, Sequence
+from dataclasses import dataclass, field
+from itertools import combinations
+import time
+import numpy as np
+from .state import GameStateInfo
+from .batch_eval import (EMPTY, LINE_WEIGHTS, MIDDLE_ROYALTIES, BOTTOM_ROYALTIES,
+                         line_categories, top_royalties)
+from ..game.deck import Card
+
+_QUEEN = 10                    # Индекс ранга 'Q'
+
+@dataclass
+class FantasySolution:
+    """Лучшая расстановка фантазии"""
+    top: List[Card]
+    middle: List[Card]
+    bottom: List[Card]
+    discards: List[Card]
+    value: float                # Оценка с учетом бонуса повторной фантазии
+    royalties: int
+    refantasy: bool             # Расстановка снова дает фантазию
+    nodes: int = 0              # Просмотрено пар (низ, середина)
+    elapsed: float = 0.0
+
+    def to_actions(self) -> List[Dict]:
+        """Действия place_card для всех 13 карт"""
+        return [
+            {'type': 'place_card', 'card': card, 'position': position, 'index': index}
+            for position, cards in (('bottom', self.bottom), ('middle', self.middle),
+                                    ('top', self.top))
+            for index, card in enumerate(cards)
+        ]
+
+@dataclass
+class _SubsetTable:
+    """Оценки всех подмножеств карт руки заданного размера"""
+    masks: List[int]
+    categories: List[int]
+    values: List[float]
+    index: Dict[int, int] = field(default_factory=dict)
+
+class FantasySolver:
+    """Расстановка 13 из 14 (или больше) карт фантазии
+
+    Оценки всех пятерок и троек руки вычисляются заранее пакетным
+    оценщиком, после чего перебор идет методом ветвей и границ: нижние
+    линии в порядке убывания верхней оценки, для каждой - средние линии
+    не сильнее нижней в порядке убывания ценности. Ветка отсекается,
+    если даже лучшие оставшиеся линии не превзойдут найденный результат.
+    Мертвые расстановки (правило категорий линий) не рассматриваются.
+
+    Ценность линии - роялти плюс взвешенная категория, как в settle_board.
+    refantasy_bonus добавляется, если верх снова квалифицирует на
+    фантазию (пара дам и выше, как в ScoreCalculator.is_fantasy_qualified).
+    """
+    def __init__(self, refantasy_bonus: float = 0.0):
+        self.refantasy_bonus = refantasy_bonus
+
+    def solve(self, cards: Sequence[Card]) -> FantasySolution:
+        started = time.monotonic()
+        cards = list(cards)
+        if len(cards) < 13:
+            raise ValueError("Для фантазии нужно не меньше 13 карт")
+
+        ids = np.array([GameStateInfo._card_to_index(card) for card in cards], dtype=np.int16)
+        full = (1 << len(cards)) - 1
+        bottoms = self._subsets(ids, 5, BOTTOM_ROYALTIES, LINE_WEIGHTS[2])
+        middles = self._subsets(ids, 5, MIDDLE_ROYALTIES, LINE_WEIGHTS[1])
+        tops = self._subsets(ids, 3, None, LINE_WEIGHTS[0])
+
+        # Лучшая возможная ценность верха и середины при ограничении категории
+        top_best = self._best_by_category(tops)
+        middle_best = self._best_by_category(middles)
+        top_ceiling = top_best[-1]
+
+        bound = [value + middle_best[category] + top_best[category]
+                 for value, category in zip(bottoms.values, bottoms.categories)]
+
+        # Середины в порядке убывания ценности, для отбора по маске низа
+        middle_order = np.argsort(-np.array(middles.values), kind='stable')
+        order_masks = np.array(middles.masks, dtype=np.int64)[middle_order]
+        order_categories = np.array(middles.categories)[middle_order]
+        top_cache: Dict[int, List[int]] = {}
+
+        best_value, best = -np.inf, None
+        nodes = 0
+        for b in sorted(range(len(bottoms.masks)), key=lambda i: -bound[i]):
+            if bound[b] <= best_value:
+                break
+            bottom_mask = bottoms.masks[b]
+            bottom_category = bottoms.categories[b]
+            bottom_value = bottoms.values[b]
+
+            allowed = ((order_masks & bottom_mask) == 0) & (order_categories <= bottom_category)
+            for m in middle_order[allowed].tolist():
+                middle_value = middles.values[m]
+                if bottom_value + middle_value + top_ceiling <= best_value:
+                    break
+                middle_category = middles.categories[m]
+                if bottom_value + middle_value + top_best[middle_category] <= best_value:
+                    continue
+
+                nodes += 1
+                middle_mask = middles.masks[m]
+                rest = full ^ bottom_mask ^ middle_mask
+                candidates = top_cache.get(rest)
+                if candidates is None:
+                    candidates = top_cache[rest] = self._top_candidates(tops, rest)
+
+                # Тройки отсортированы по убыванию ценности: первая допустимая - лучшая
+                for t in candidates:
+                    if tops.categories[t] <= middle_category:
+                        value = bottom_value + middle_value + tops.values[t]
+                        if value > best_value:
+                            best_value, best = value, (bottom_mask, middle_mask, tops.masks[t])
+                        break
+
+        if best is None:
+            raise ValueError("Нет допустимой расстановки")
+
+        def pick(mask: int) -> List[Card]:
+            return [card for i, card in enumerate(cards) if mask >> i & 1]
+
+        bottom_mask, middle_mask, top_mask = best
+        top = pick(top_mask)
+        refantasy = self._qualifies(ids[[i for i in range(len(cards)) if top_mask >> i & 1]])
+        royalties = int(
+            BOTTOM_ROYALTIES[bottoms.categories[bottoms.index[bottom_mask]]] +
+            MIDDLE_ROYALTIES[middles.categories[middles.index[middle_mask]]] +
+            top_royalties(np.array([[GameStateInfo._card_to_index(c) for c in top]]))[0]
+        )
+        return FantasySolution(
+            top=top,
+            middle=pick(middle_mask),
+            bottom=pick(bottom_mask),
+            discards=pick(full ^ bottom_mask ^ middle_mask ^ top_mask),
+            value=float(best_value),
+            royalties=royalties,
+            refantasy=refantasy,
+            nodes=nodes,
+            elapsed=time.monotonic() - started
+        )
+
+    def _subsets(self, ids: np.ndarray, size: int, royalties: Optional[np.ndarray],
+                 weight: float) -> _SubsetTable:
+        """Категории и ценности всех подмножеств размера size"""
+        combos = np.array(list(combinations(range(len(ids)), size)), dtype=np.intp)
+        lines = ids[combos]
+        categories = line_categories(lines)
+        if royalties is None:
+            values = top_royalties(lines) + weight * categories
+            values = values + self.refantasy_bonus * self._qualifies_many(lines)
+        else:
+            values = royalties[categories] + weight * categories
+
+        masks = (1 << combos).sum(axis=1).tolist()
+        return _SubsetTable(
+            masks=masks,
+            categories=categories.tolist(),
+            values=values.astype(np.float64).tolist(),
+            index={mask: i for i, mask in enumerate(masks)}
+        )
+
+    @staticmethod
+    def _best_by_category(table: _SubsetTable) -> List[float]:
+        """Максимальная ценность линии с категорией не выше индекса"""
+        best = [-np.inf] * 10
+        for category, value in zip(table.categories, table.values):
+            best[category] = max(best[category], value)
+        for category in range(1, 10):
+            best[category] = max(best[category], best[category - 1])
+        return best
+
+    @staticmethod
+    def _top_candidates(tops: _SubsetTable, rest: int) -> List[int]:
+        """Индексы троек из оставшихся после низа и середины карт
+        в порядке убывания ценности"""
+        bits = [1 << i for i in range(rest.bit_length()) if rest >> i & 1]
+        candidates = [tops.index[a | b | c] for a, b, c in combinations(bits, 3)]
+        return sorted(candidates, key=lambda t: -tops.values[t])
+
+    @staticmethod
+    def _qualifies_many(lines: np.ndarray) -> np.ndarray:
+        """Верх с парой от дам (правило ScoreCalculator.is_fantasy_qualified)"""
+        ranks = np.sort(np.where(lines >= 0, lines // 4, EMPTY), axis=1)
+        pair = (ranks[:, 0] == ranks[:, 1]) ^ (ranks[:, 1] == ranks[:, 2])
+        return pair & (ranks[:, 1] >= _QUEEN)
+
+    @classmethod
+    def _qualifies(cls, top: np.ndarray) -> bool:
+        return bool(cls._qualifies_many(np.asarray(top)[None])[0])
@@ -2,9 +2,12 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 import numpy as np
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import os
 from .state import GameStateInfo, ActionSpace
+from .transposition import TranspositionTable
+from .search_state import SearchState, LINES, CAPACITY, CARDS
+from .experience import ExperienceStore, PolicyTrainer, make_experience_loader, ACTION_SIZE
 from ..utils.serializer import ProgressSerializer
 
 class PolicyNetwork(nn.Module):
@@ -31,7 +34,8 @@ class PolicyNetwork(nn.Module):
 
 class MCCFRAgent:
     def __init__(self, player_id: str, learning_rate: float = 0.001, 
-                 exploration_factor: float = 0.4):
+                 exploration_factor: float = 0.4, experience_dir: Optional[str] = None,
+                 transposition_table: Optional[TranspositionTable] = None):
         self.player_id = player_id
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.policy_network = PolicyNetwork().to(self.device)
@@ -44,6 +48,14 @@ class MCCFRAgent:
         self.strategy_sum = {}
         self.iterations = 0
         self.exploration_factor = exploration_factor
+
+        # Хранилище опыта для обучения сети минибатчами
+        self.experience_store = ExperienceStore(experience_dir) if experience_dir else None
+
+        # Полезности конечных досок: одна доска достигается многими
+        # порядками размещения, поэтому оценивается один раз
+        self.transpositions = transposition_table if transposition_table is not None \
+            else TranspositionTable(priority=lambda utility: 0.0)
         
         # Инициализация сериализатора с токеном из окружения
         self.serializer = ProgressSerializer(
@@ -56,16 +68,18 @@ class MCCFRAgent:
 
     def get_strategy(self, state: GameStateInfo) -> np.ndarray:
         """Получение стратегии для текущего состояния"""
-        state_key = self._state_to_key(state)
         valid_actions = self.action_space.get_valid_actions(state)
-        
-        if not valid_actions:
+        return self._strategy_for_key(self._state_to_key(state), len(valid_actions))
+
+    def _strategy_for_key(self, state_key: str, action_count: int) -> np.ndarray:
+        """Стратегия из сумм регретов по ключу состояния"""
+        if action_count == 0:
             return np.array([])
 
         # Получаем регреты для всех действий
         regrets = np.array([
             max(0, self.regret_sum.get(f"{state_key}_{i}", 0))
-            for i in range(len(valid_actions))
+            for i in range(action_count)
         ])
 
         # Нормализуем регреты в стратегию
@@ -73,21 +87,46 @@ class MCCFRAgent:
         if regret_sum > 0:
             strategy = regrets / regret_sum
         else:
-            strategy = np.ones(len(valid_actions)) / len(valid_actions)
+            strategy = np.ones(action_count) / action_count
 
         # Добавляем исследование
         if self.iterations < 1000:  # Больше исследования на ранних итерациях
             strategy = (1 - self.exploration_factor) * strategy + \
                       self.exploration_factor * np.random.dirichlet(
-                          np.ones(len(valid_actions))
+                          np.ones(action_count)
                       )
 
         return strategy
 
+    def get_average_strategy(self, state: GameStateInfo) -> np.ndarray:
+        """Усредненная стратегия (накопленная сумма стратегий) для состояния"""
+        valid_actions = self.action_space.get_valid_actions(state)
+        return self.average_strategy(self.strategy_sum, self._state_to_key(state),
+                                     len(valid_actions))
+
+    @staticmethod
+    def average_strategy(strategy_sum: Dict[str, float], state_key: str,
+                         action_count: int) -> np.ndarray:
+        """Нормализация накопленной суммы стратегий по ключу состояния"""
+        if action_count == 0:
+            return np.array([])
+
+        totals = np.array([
+            strategy_sum.get(f"{state_key}_{i}", 0)
+            for i in range(action_count)
+        ], dtype=np.float64)
+        total = np.sum(totals)
+        if total > 0:
+            return totals / total
+        return np.ones(action_count) / action_count
+
     def update_regrets(self, state: GameStateInfo, action_index: int, 
                       utility: float, node_utility: float) -> None:
         """Обновление сумм регретов"""
-        state_key = self._state_to_key(state)
+        self._update_regret(self._state_to_key(state), action_index, utility, node_utility)
+
+    def _update_regret(self, state_key: str, action_index: int,
+                       utility: float, node_utility: float) -> None:
         counterfactual_regret = utility - node_utility
         
         self.regret_sum[f"{state_key}_{action_index}"] = \
@@ -96,35 +135,51 @@ class MCCFRAgent:
 
     def train(self, state: GameStateInfo) -> float:
         """Одна итерация обучения"""
-        if self._is_terminal(state):
-            return self._get_utility(state)
-
-        valid_actions = self.action_space.get_valid_actions(state)
+        return self._train(SearchState.from_state(state))
+
+    def _train(self, state: SearchState) -> float:
+        """Рекурсивный обход: ходы применяются к state и откатываются"""
+        if state.is_terminal() and not state.hand:
+            utility = self.transpositions.get(state.key)
+            if utility is None:
+                utility = self._get_utility(state.to_state())
+                self.transpositions.store(state.key, utility)
+            return utility
+
+        valid_actions = self._search_actions(state)
         if not valid_actions:
             return 0.0
 
         # Получаем стратегию
-        strategy = self.get_strategy(state)
-        
+        state_key = self._search_key(state)
+        strategy = self._strategy_for_key(state_key, len(valid_actions))
+
         # Обновляем сумму стратегий для усреднения
-        state_key = self._state_to_key(state)
         for i, action_prob in enumerate(strategy):
             self.strategy_sum[f"{state_key}_{i}"] = \
                 self.strategy_sum.get(f"{state_key}_{i}", 0) + action_prob
 
+        if self.experience_store is not None:
+            self.record_experience(state.to_state(), strategy, [
+                {'type': 'place_card', 'card': CARDS[card],
+                 'position': LINES[line], 'index': index}
+                for card, line, index in valid_actions
+            ])
+
         # Выбираем действие и рекурсивно вычисляем полезность
         action_utilities = np.zeros(len(valid_actions))
-        
-        for i, action in enumerate(valid_actions):
-            next_state = self._apply_action(state.copy(), action)
-            action_utilities[i] = -self.train(next_state)  # Рекурсивный вызов
+
+        for i, (card, line, index) in enumerate(valid_actions):
+            state.apply(card, line, index)
+            action_utilities[i] = -self._train(state)  # Рекурсивный вызов
+            state.undo()
 
         # Вычисляем общую полезность узла
         node_utility = np.sum(strategy * action_utilities)
 
         # Обновляем регреты
         for i, utility in enumerate(action_utilities):
-            self.update_regrets(state, i, utility, node_utility)
+            self._update_regret(state_key, i, utility, node_utility)
 
         self.iterations += 1
         
@@ -134,7 +189,23 @@ class MCCFRAgent:
 
         return node_utility
 
-    def get_action(self, state: GameStateInfo) -> Dict:
+    @staticmethod
+    def _search_actions(state: SearchState) -> List[Tuple[int, int, int]]:
+        """Действия (карта, линия, индекс) в порядке ActionSpace.get_valid_actions"""
+        return [
+            (card, line, index)
+            for card in state.hand_cards()
+            for line in range(len(LINES)) if state.line_len[line] < CAPACITY[line]
+            for index in range(state.line_len[line] + 1)
+        ]
+
+    @staticmethod
+    def _search_key(state: SearchState) -> str:
+        """Ключ как у _state_to_key для SearchState"""
+        return f"{state.street}_{bin(state.hand).count('1')}_{state.line_len[0]}_" \
+               f"{state.line_len[1]}_{state.line_len[2]}"
+
+    def get_action(self, state: GameStateInfo, deadline: Optional[float] = None) -> Dict:
         """Получение действия на основе текущей стратегии"""
         valid_actions = self.action_space.get_valid_actions(state)
         if not valid_actions:
@@ -143,6 +214,7 @@ class MCCFRAgent:
         # Используем нейронную сеть для получения вероятностей действий
         state_tensor = torch.FloatTensor(state.to_numpy()).unsqueeze(0).to(self.device)
         
+        self.policy_network.eval()
         with torch.no_grad():
             action_probs = self.policy_network(state_tensor).cpu().numpy()[0]
 
@@ -179,6 +251,40 @@ class MCCFRAgent:
         loss.backward()
         self.optimizer.step()
 
+    def record_experience(self, state: GameStateInfo, strategy: np.ndarray,
+                          valid_actions: Optional[List[Dict]] = None,
+                          weight: float = 1.0) -> None:
+        """Запись состояния и целевой стратегии в хранилище опыта"""
+        if self.experience_store is None:
+            raise ValueError("Хранилище опыта не настроено")
+
+        if valid_actions is None:
+            valid_actions = self.action_space.get_valid_actions(state)
+
+        mask = np.zeros(ACTION_SIZE, dtype=np.uint8)
+        target = np.zeros(ACTION_SIZE, dtype=np.float32)
+        for action, prob in zip(valid_actions, strategy):
+            idx = self.action_space.action_to_index(action)
+            mask[idx] = 1
+            target[idx] += prob
+
+        self.experience_store.append(state.to_numpy(), mask, target, weight)
+
+    def train_policy_network(self, epochs: int = 1, batch_size: int = 256,
+                             num_workers: int = 2) -> List[float]:
+        """Обучение сети по эпохам на минибатчах из хранилища опыта"""
+        if self.experience_store is None:
+            raise ValueError("Хранилище опыта не настроено")
+
+        self.experience_store.flush()
+        loader = make_experience_loader(
+            self.experience_store.directory,
+            batch_size=batch_size,
+            num_workers=num_workers
+        )
+        trainer = PolicyTrainer(self.policy_network, self.optimizer, self.device)
+        return trainer.fit(loader, epochs)
+
     def save_state(self) -> bool:
         """Сохранение состояния агента"""
         try:
@@ -257,20 +363,13 @@ class MCCFRAgent:
             bottom_line=state.bottom_line.copy(),
             opponent_visible=state.opponent_visible.copy(),
             street=state.street,
-            is_fantasy=state.is_fantasy
+            is_fantasy=state.is_fantasy,
+            zobrist_key=state.zobrist_key
         )
 
         if action['type'] == 'place_card':
-            card = action['card']
-            position = action['position']
-            index = action['index']
-            
-            # Удаляем карту из руки
-            new_state.hand_cards.remove(card)
-            
-            # Добавляем карту в соответствующую линию
-            target_line = getattr(new_state, f"{position}_line")
-            target_line.insert(index, card)
+            # Перенос карты из руки в линию с обновлением хеша
+            new_state.place_card(action['card'], action['position'], action['index'])
 
         return new_state
 
@@ -280,6 +379,7 @@ class MCCFRAgent:
         self.strategy_sum = {}
         self.iterations = 0
         self.exploration_factor = 0.4
+        self.transpositions.clear()
         
         # Реинициализация нейронной сети
         self.policy_network = PolicyNetwork().to(self.device)
@@ -0,0 +1,128 @@
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+import multiprocessing
+import os
+import time
+import numpy as np
+from .state import GameStateInfo, ActionSpace
+from .strategy import Strategy, MCTSStrategy, RuleBasedStrategy
+from .endgame import EndgameSolver
+
+# Стратегия процесса-воркера: дерево сохраняется между задачами
+_worker_strategy: Optional[MCTSStrategy] = None
+
+def _init_worker(params: Dict) -> None:
+    global _worker_strategy
+    _worker_strategy = MCTSStrategy(**params)
+
+def _search_task(state: GameStateInfo, deadline: float,
+                 seed: int) -> Tuple[Dict[Tuple[int, str], Tuple[int, float]], int]:
+    """Поиск в воркере до дедлайна, возвращает статистику детей корня"""
+    np.random.seed(seed)
+    _worker_strategy.rollout_engine.rng = np.random.default_rng(seed)
+
+    root = _worker_strategy.search(state, deadline)
+    _worker_strategy.root = root
+    children = {key: (child.visits, child.value_sum) for key, child in root.children.items()}
+    return children, _worker_strategy.last_stats.simulations
+
+@dataclass
+class ParallelSearchResult:
+    """Итог параллельного поиска"""
+    simulations: int = 0
+    workers_reported: int = 0
+    elapsed: float = 0.0
+    visits: Dict[Tuple[int, str], int] = field(default_factory=dict)
+
+class ParallelMCTSStrategy(Strategy):
+    """Параллельный поиск от корня в пуле процессов с дедлайном
+
+    Каждый воркер строит свое дерево до дедлайна, статистика детей
+    корня суммируется, выбирается наиболее посещаемое действие. Если
+    к дедлайну не ответил ни один воркер, действие выбирает быстрая
+    стратегия на правилах. Улицы 4-5 решает EndgameSolver в основном
+    процессе.
+    """
+    def __init__(self, workers: Optional[int] = None, think_time: float = 1.0,
+                 safety_margin: float = 0.05, mp_context: Optional[str] = None,
+                 **mcts_params):
+        self.workers = workers or os.cpu_count() or 1
+        self.think_time = think_time
+        self.safety_margin = safety_margin
+        self.mp_context = mp_context
+        self.mcts_params = mcts_params
+        self.action_space = ActionSpace()
+        self.fallback = RuleBasedStrategy()
+        self.endgame_solver = EndgameSolver() if mcts_params.get('exact_endgame', True) else None
+        self.last_result = ParallelSearchResult()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._seed = np.random.SeedSequence()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            context = multiprocessing.get_context(self.mp_context) if self.mp_context else None
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self.mcts_params,)
+            )
+        return self._pool
+
+    def get_action(self, state: GameStateInfo, deadline: Optional[float] = None) -> Dict:
+        placements = self.action_space.get_placements(state)
+        if not placements:
+            return {}
+
+        # Последние улицы решаются точно без пула
+        if self.endgame_solver is not None:
+            solution = self.endgame_solver.solve(state)
+            if solution is not None:
+                self.last_result = ParallelSearchResult(elapsed=solution.elapsed)
+                return solution.actions[0]
+
+        started = time.monotonic()
+        if deadline is None:
+            deadline = started + self.think_time
+
+        # Воркеры заканчивают чуть раньше, чтобы успеть вернуть результат
+        worker_deadline = deadline - self.safety_margin
+        seeds = self._seed.spawn(self.workers)
+        pool = self._get_pool()
+        futures = [
+            pool.submit(_search_task, state, worker_deadline, int(seed.generate_state(1)[0]))
+            for seed in seeds
+        ]
+        done, not_done = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+        for future in not_done:
+            future.cancel()
+
+        merged: Dict[Tuple[int, str], List[float]] = {}
+        result = ParallelSearchResult()
+        for future in done:
+            if future.exception() is not None:
+                continue
+            children, simulations = future.result()
+            result.simulations += simulations
+            result.workers_reported += 1
+            for key, (visits, value_sum) in children.items():
+                totals = merged.setdefault(key, [0, 0.0])
+                totals[0] += visits
+                totals[1] += value_sum
+
+        result.visits = {key: int(totals[0]) for key, totals in merged.items()}
+        result.elapsed = time.monotonic() - started
+        self.last_result = result
+
+        if not merged:
+            return self.fallback.get_action(state)
+
+        best_key = MCTSStrategy.best_action_key(merged)
+        return MCTSStrategy.placement_for_key(placements, best_key)
+
+    def close(self) -> None:
+        """Остановка пула процессов"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
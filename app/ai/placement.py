@@ -0,0 +1,180 @@
+from typing import Dict, List, Optional, Tuple
+from functools import lru_cache
+from itertools import product
+import time
+import numpy as np
+from .state import GameStateInfo
+from .batch_eval import (EMPTY, LINE_WEIGHTS, FOUL_PENALTY, MIDDLE_ROYALTIES,
+                         BOTTOM_ROYALTIES, TOP_PAIR_ROYALTIES, line_categories,
+                         rank_counts, settle_boards)
+from .rollout import LINE_ORDER, CAPACITY, DISCARD
+from .fantasy import FantasySolver
+
+DEAD_PENALTY = 100.0           # Доска, которая гарантированно станет мертвой
+INVERSION_PENALTY = 4.0        # За каждую категорию нарушения порядка линий
+FLUSH_DRAW_BONUS = 0.3         # За карту одномастного незаконченного дро
+STRAIGHT_DRAW_BONUS = 0.2      # За карту связного незаконченного дро
+HIGH_CARD_PENALTY = 0.1        # За ранг старшей карты верха выше середины
+
+@lru_cache(maxsize=64)
+def street_assignments(card_count: int, place_count: int,
+                       free: Tuple[int, int, int]) -> np.ndarray:
+    """Все распределения карт улицы по линиям: (M, card_count)
+
+    Значения - номер линии (0 - top, 1 - middle, 2 - bottom) или DISCARD.
+    Ровно place_count карт размещаются, линии не переполняются.
+    """
+    rows = []
+    for row in product((0, 1, 2, DISCARD), repeat=card_count):
+        if sum(line != DISCARD for line in row) != place_count:
+            continue
+        if all(row.count(line) <= free[line] for line in range(3)):
+            rows.append(row)
+    result = np.array(rows, dtype=np.int8).reshape(len(rows), card_count)
+    result.setflags(write=False)
+    return result
+
+def build_boards(board: np.ndarray, line_len: np.ndarray, cards: np.ndarray,
+                 assignments: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Доски (M, 3, 5) после размещения карт по распределениям"""
+    count = len(assignments)
+    lines = np.tile(board, (count, 1, 1))
+    lengths = np.tile(line_len, (count, 1))
+    rows = np.arange(count)
+    for column, card in enumerate(cards):
+        line = assignments[:, column]
+        placed = line != DISCARD
+        target_rows, target_lines = rows[placed], line[placed].astype(np.intp)
+        lines[target_rows, target_lines, lengths[target_rows, target_lines]] = card
+        lengths[target_rows, target_lines] += 1
+    return lines, lengths
+
+def score_boards(lines: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Эвристическая оценка частично заполненных досок (M,)
+
+    Законченные доски оцениваются как в settle_boards. Для остальных -
+    взвешенные категории линий, роялти, бонусы за дро и штрафы за
+    нарушение порядка линий; доска, которая уже не может избежать
+    мертвой руки, получает DEAD_PENALTY.
+    """
+    top, middle, bottom = lines[:, 0, :3], lines[:, 1], lines[:, 2]
+    categories = np.stack([line_categories(top), line_categories(middle),
+                           line_categories(bottom)], axis=1)
+    complete = lengths == CAPACITY
+
+    # Законченная линия больше не растет: нарушение над ней окончательно
+    dead = (complete[:, 1] & (categories[:, 0] > categories[:, 1])) | \
+        (complete[:, 2] & (categories[:, 1] > categories[:, 2])) | \
+        (complete[:, 2] & (categories[:, 0] > categories[:, 2]))
+    inversion = np.maximum(categories[:, 0] - categories[:, 1], 0) + \
+        np.maximum(categories[:, 1] - categories[:, 2], 0)
+
+    top_counts = rank_counts(top)
+    top_pair_rank = np.where(top_counts.max(axis=1) == 2, top_counts.argmax(axis=1), 0)
+    royalties = np.where(top_counts.max(axis=1) == 3, top_counts.argmax(axis=1) + 10,
+                         TOP_PAIR_ROYALTIES[top_pair_rank]) + \
+        MIDDLE_ROYALTIES[categories[:, 1]] + BOTTOM_ROYALTIES[categories[:, 2]]
+
+    draws = np.zeros(len(lines))
+    for line in (1, 2):
+        cards = lines[:, line]
+        placed = cards != EMPTY
+        count = placed.sum(axis=1)
+        open_draw = (count >= 2) & ~complete[:, line]
+        suits = np.where(placed, cards % 4, EMPTY)
+        first_suit = suits.max(axis=1)
+        one_suit = ((suits == first_suit[:, None]) | ~placed).all(axis=1)
+        ranks = np.where(placed, cards // 4, EMPTY)
+        low = np.where(placed, ranks, 13).min(axis=1)
+        distinct = (rank_counts(cards) > 0).sum(axis=1) == count
+        connected = distinct & (ranks.max(axis=1) - low <= 4)
+        draws += open_draw * count * (FLUSH_DRAW_BONUS * one_suit +
+                                      STRAIGHT_DRAW_BONUS * connected)
+
+    # Старшие карты без пары не должны уходить наверх выше середины
+    top_high = np.where(top >= 0, top // 4, EMPTY).max(axis=1)
+    middle_high = np.where(middle >= 0, middle // 4, EMPTY).max(axis=1)
+    high_card = (categories[:, 0] == 0) & (lengths[:, 1] > 0)
+    high_card_penalty = HIGH_CARD_PENALTY * high_card * np.maximum(top_high - middle_high, 0)
+
+    score = categories @ LINE_WEIGHTS + royalties + draws - \
+        INVERSION_PENALTY * inversion - high_card_penalty - DEAD_PENALTY * dead
+
+    finished = complete.all(axis=1)
+    if finished.any():
+        value, _, _ = settle_boards(top[finished], middle[finished], bottom[finished])
+        score[finished] = np.where(value == -FOUL_PENALTY, -DEAD_PENALTY, value)
+    return score
+
+class AutoPlacer:
+    """Быстрая расстановка карт улицы при таймауте или отключении игрока
+
+    Перебирает все распределения карт улицы по линиям (на первой улице
+    не больше 3^5), оценивает их пачкой эвристикой score_boards и
+    возвращает лучшее. Если бюджет времени исчерпан до оценки,
+    используется жадная расстановка с проверкой порядка линий.
+    Руку фантазии расставляет FantasySolver.
+    """
+    def __init__(self, time_budget: float = 0.005,
+                 fantasy_solver: Optional[FantasySolver] = None):
+        self.time_budget = time_budget
+        self.fantasy_solver = fantasy_solver or FantasySolver()
+        self.last_elapsed = 0.0
+
+    def place_street(self, state: GameStateInfo,
+                     deadline: Optional[float] = None) -> List[Dict]:
+        """Действия place_card для оставшихся карт текущей улицы"""
+        started = time.monotonic()
+        if deadline is None:
+            deadline = started + self.time_budget
+
+        hand = list(state.hand_cards)
+        if len(hand) >= 13 and not (state.top_line or state.middle_line or state.bottom_line):
+            actions = self.fantasy_solver.solve(hand).to_actions()
+            self.last_elapsed = time.monotonic() - started
+            return actions
+
+        ids = np.array([GameStateInfo._card_to_index(card) for card in hand], dtype=np.int16)
+        board = np.full((3, 5), EMPTY, dtype=np.int16)
+        line_len = np.zeros(3, dtype=np.int8)
+        for i, position in enumerate(LINE_ORDER):
+            placed = [GameStateInfo._card_to_index(card)
+                      for card in getattr(state, f"{position}_line")]
+            board[i, :len(placed)] = placed
+            line_len[i] = len(placed)
+
+        free = CAPACITY - line_len
+        discards = 1 if state.street > 1 or state.is_fantasy else 0
+        place_count = min(max(len(hand) - discards, 0), int(free.sum()))
+        if place_count == 0:
+            return []
+
+        assignments = street_assignments(len(hand), place_count, tuple(int(f) for f in free))
+        if time.monotonic() < deadline:
+            lines, lengths = build_boards(board, line_len, ids, assignments)
+            best = assignments[int(np.argmax(score_boards(lines, lengths)))]
+        else:
+            best = self._greedy(board, line_len, ids, assignments)
+
+        actions = []
+        lengths = line_len.astype(int).tolist()
+        for card, line in zip(hand, best.tolist()):
+            if line == DISCARD:
+                continue
+            actions.append({'type': 'place_card', 'card': card,
+                            'position': LINE_ORDER[line], 'index': lengths[line]})
+            lengths[line] += 1
+
+        self.last_elapsed = time.monotonic() - started
+        return actions
+
+    @staticmethod
+    def _greedy(board: np.ndarray, line_len: np.ndarray, ids: np.ndarray,
+                assignments: np.ndarray) -> np.ndarray:
+        """Первое распределение, не нарушающее порядок категорий линий"""
+        for row in assignments[:16]:
+            lines, lengths = build_boards(board, line_len, ids, row[None])
+            categories = [line_categories(lines[:, i])[0] for i in range(3)]
+            if categories[0] <= categories[1] <= categories[2]:
+                return row
+        return assignments[0]
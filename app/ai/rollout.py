@@ -0,0 +1,205 @@
+from typing import List, Optional
+import numpy as np
+from .state import GameStateInfo, LINE_CAPACITY
+from .batch_eval import EMPTY, line_categories, settle_boards
+
+LINE_ORDER = ('top', 'middle', 'bottom')
+CAPACITY = np.array([LINE_CAPACITY[position] for position in LINE_ORDER], dtype=np.int8)
+DISCARD = -1
+# Штраф линии, в которой карта ведет к мертвой руке (больше разброса оценок)
+FOUL_GUARD = 100.0
+
+class RolloutPolicy:
+    """Быстрая политика размещения карт внутри пачки симуляций
+
+    Получает текущие линии (N, 3, 5), их заполненность (N, 3) и сданные
+    карты (N, k). Возвращает для каждой карты номер линии (0 - top,
+    1 - middle, 2 - bottom) или DISCARD. Ровно place_count карт в каждой
+    строке должны получить линию, при этом линии не переполняются.
+    """
+    def assign(self, lines: np.ndarray, line_len: np.ndarray, cards: np.ndarray,
+               place_count: int, rng: np.random.Generator) -> np.ndarray:
+        raise NotImplementedError
+
+    @staticmethod
+    def _place_in_order(order: np.ndarray, line_scores: np.ndarray, line_len: np.ndarray,
+                        place_count: int, lines: Optional[np.ndarray] = None,
+                        cards: Optional[np.ndarray] = None) -> np.ndarray:
+        """Размещение карт по очереди в лучшую линию со свободным местом
+
+        order - (N, k) порядок карт, line_scores - (N, k, 3) предпочтения.
+        Карты, не попавшие в первые place_count, сбрасываются. С линиями
+        и картами линия, которую карта подняла бы выше линии под ней,
+        выбирается, только если других свободных мест нет.
+        """
+        rows = np.arange(len(order))
+        free = (CAPACITY - line_len).astype(np.int16)
+        assignment = np.full(order.shape, DISCARD, dtype=np.int8)
+        if lines is not None:
+            lines, line_len = lines.copy(), line_len.astype(np.intp)
+
+        for step in range(place_count):
+            card = order[:, step]
+            scores = line_scores[rows, card]
+            if lines is not None:
+                scores = scores - FOUL_GUARD * RolloutPolicy._outranks(
+                    lines, line_len, cards[rows, card])
+            scores = np.where(free > 0, scores, -np.inf)
+            line = scores.argmax(axis=1)
+            assignment[rows, card] = line
+            free[rows, line] -= 1
+            if lines is not None:
+                lines[rows, line, np.minimum(line_len[rows, line], 4)] = cards[rows, card]
+                line_len[rows, line] += 1
+
+        return assignment
+
+    @staticmethod
+    def _outranks(lines: np.ndarray, line_len: np.ndarray, card: np.ndarray) -> np.ndarray:
+        """(N, 3): карта в линии подняла бы ее комбинацию выше линии под
+        ней (мертвая рука); нижняя линия выше других не поднимается"""
+        rows = np.arange(len(lines))
+        outranks = np.zeros((len(lines), 3), dtype=bool)
+        for line in range(2):
+            candidate = lines[:, line].copy()
+            candidate[rows, np.minimum(line_len[:, line], 4)] = card
+            outranks[:, line] = line_categories(candidate) > line_categories(lines[:, line + 1])
+        return outranks
+
+class RandomRolloutPolicy(RolloutPolicy):
+    """Случайная расстановка: случайные карты в случайные свободные линии"""
+    def assign(self, lines, line_len, cards, place_count, rng):
+        order = rng.random(cards.shape).argsort(axis=1)
+        line_scores = rng.random(cards.shape + (3,))
+        return self._place_in_order(order, line_scores, line_len, place_count)
+
+class HeuristicRolloutPolicy(RolloutPolicy):
+    """Простая эвристика: пары к парам, масти к мастям, старшие карты вниз
+
+    Сбрасывается карта с наименьшей оценкой лучшей линии, остальные
+    размещаются жадно. Шум сохраняет разнообразие симуляций.
+    """
+    LINE_BIAS = np.array([-0.2, 0.1, 0.3])
+
+    def __init__(self, noise: float = 0.3):
+        self.noise = noise
+
+    def assign(self, lines, line_len, cards, place_count, rng):
+        line_ranks = np.where(lines >= 0, lines // 4, EMPTY)
+        line_suits = np.where(lines >= 0, lines % 4, EMPTY)
+        ranks = cards // 4
+        suits = cards % 4
+
+        # (N, k, 3): совпадения ранга и масти с картами в каждой линии
+        rank_matches = (line_ranks[:, None, :, :] == ranks[:, :, None, None]).sum(axis=3)
+        suit_matches = (line_suits[:, None, :, :] == suits[:, :, None, None]).sum(axis=3)
+
+        line_scores = 2.0 * rank_matches + self.LINE_BIAS
+        line_scores[:, :, 1:] += 0.4 * suit_matches[:, :, 1:]
+        line_scores[:, :, 2] += ranks / 12.0
+        line_scores[:, :, 0] -= (rank_matches[:, :, 0] == 0) * ranks / 12.0
+        line_scores += self.noise * rng.random(line_scores.shape)
+
+        order = (-line_scores.max(axis=2)).argsort(axis=1)
+        return self._place_in_order(order, line_scores, line_len, place_count, lines, cards)
+
+class RolloutEngine:
+    """Пакетные симуляции до конца раздачи
+
+    Будущие улицы сдаются из оставшейся колоды, карты размещаются
+    заданной политикой, все доски оцениваются векторно.
+    """
+    def __init__(self, policy: Optional[RolloutPolicy] = None,
+                 seed: Optional[int] = None):
+        self.policy = policy or RandomRolloutPolicy()
+        self.rng = np.random.default_rng(seed)
+
+    def run(self, state: GameStateInfo, count: int) -> np.ndarray:
+        """Значения count симуляций из состояния"""
+        board = np.full((3, 5), EMPTY, dtype=np.int16)
+        for i, position in enumerate(LINE_ORDER):
+            placed = [GameStateInfo._card_to_index(card)
+                      for card in getattr(state, f"{position}_line")]
+            board[i, :len(placed)] = placed
+
+        hand = [GameStateInfo._card_to_index(card) for card in state.hand_cards]
+        deck = [GameStateInfo._card_to_index(card) for card in state.remaining_deck()]
+        discards = 1 if state.street > 1 or state.is_fantasy else 0
+        return self.run_board(board, hand, deck, discards, count)
+
+    def run_board(self, board: np.ndarray, hand: List[int], deck: List[int],
+                  discards: int, count: int) -> np.ndarray:
+        """Значения count симуляций из доски (3, 5), руки и оставшейся колоды
+
+        discards - сколько карт руки сбрасывается на текущей улице.
+        """
+        lines = np.tile(np.asarray(board, dtype=np.int16), (count, 1, 1))
+        line_len = np.broadcast_to((lines[0] != EMPTY).sum(axis=1).astype(np.int8),
+                                   (count, 3)).copy()
+        free = int((CAPACITY - line_len[0]).sum())
+        hand = np.array(hand, dtype=np.int16)
+        deck = np.array(deck, dtype=np.int16)
+
+        # Текущая улица: оставшиеся карты руки
+        if len(hand) and free > 0 and len(hand) > discards:
+            place_count = min(len(hand) - discards, free)
+            self._place(lines, line_len, np.broadcast_to(hand, (count, len(hand))), place_count)
+            free -= place_count
+
+        # Следующие улицы по три карты, две из них размещаются
+        streets: List[int] = []
+        remaining_free, remaining_deck = free, len(deck)
+        while remaining_free > 0 and remaining_deck > 0:
+            dealt = min(3, remaining_deck)
+            streets.append(dealt)
+            remaining_free -= min(2, dealt, remaining_free)
+            remaining_deck -= dealt
+
+        if streets:
+            draws = self._sample_deck(deck, sum(streets), count)
+            offset = 0
+            for dealt in streets:
+                place_count = min(2, dealt, free)
+                self._place(lines, line_len, draws[:, offset:offset + dealt], place_count)
+                free -= place_count
+                offset += dealt
+
+        value, _, _ = settle_boards(lines[:, 0, :3], lines[:, 1], lines[:, 2])
+        return value
+
+    def evaluate(self, state: GameStateInfo, count: int) -> float:
+        """Средняя оценка состояния по count симуляциям"""
+        return float(self.run(state, count).mean())
+
+    def evaluate_board(self, board: np.ndarray, hand: List[int], deck: List[int],
+                       discards: int, count: int) -> float:
+        return float(self.run_board(board, hand, deck, discards, count).mean())
+
+    def _sample_deck(self, deck: np.ndarray, needed: int, count: int) -> np.ndarray:
+        """needed карт без возвращения из колоды для каждой симуляции
+
+        Частичная перетасовка Фишера-Йетса: первые needed позиций
+        каждой строки получают равномерно случайные карты.
+        """
+        cards = np.tile(deck, (count, 1))
+        rows = np.arange(count)
+        for position in range(needed):
+            swap = position + (self.rng.random(count) * (len(deck) - position)).astype(np.intp)
+            chosen = cards[rows, swap]
+            cards[rows, swap] = cards[:, position]
+            cards[:, position] = chosen
+        return cards[:, :needed]
+
+    def _place(self, lines: np.ndarray, line_len: np.ndarray, cards: np.ndarray,
+               place_count: int) -> None:
+        if place_count <= 0:
+            return
+        assignment = self.policy.assign(lines, line_len, cards, place_count, self.rng)
+        rows = np.arange(len(cards))
+        for column in range(cards.shape[1]):
+            line = assignment[:, column]
+            placed = line != DISCARD
+            target_rows, target_lines = rows[placed], line[placed]
+            lines[target_rows, target_lines, line_len[target_rows, target_lines]] = \
+                cards[placed, column]
+            line_len[target_rows, target_lines] += 1
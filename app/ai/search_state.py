@@ -0,0 +1,195 @@
+from typing import List, Sequence, Tuple
+import numpy as np
+from .state import GameStateInfo, LINE_CAPACITY
+from .transposition import ZOBRIST
+from ..game.deck import Card, Deck
+
+LINES = ('top', 'middle', 'bottom')
+LINE_INDEX = {position: i for i, position in enumerate(LINES)}
+CAPACITY = tuple(LINE_CAPACITY[position] for position in LINES)
+EMPTY = -1
+MAX_DEPTH = 64                 # Глубина стека отмены: 13 размещений и раздачи
+
+_DEAL = -1
+
+def _build_cards() -> List[Card]:
+    cards = [Card(rank, suit) for suit in Deck.SUITS for rank in Deck.RANKS]
+    return sorted(cards, key=GameStateInfo._card_to_index)
+
+# Объекты карт по индексу 0-51 (ранг * 4 + масть)
+CARDS: List[Card] = _build_cards()
+
+def card_mask(cards: Sequence[int]) -> int:
+    """Битовая маска набора индексов карт"""
+    mask = 0
+    for card in cards:
+        mask |= 1 << card
+    return mask
+
+def mask_cards(mask: int) -> List[int]:
+    """Индексы карт битовой маски по возрастанию"""
+    cards = []
+    while mask:
+        low = mask & -mask
+        cards.append(low.bit_length() - 1)
+        mask ^= low
+    return cards
+
+class SearchState:
+    """Изменяемое состояние для поиска с операциями apply/undo
+
+    Линии хранятся в массивах фиксированной длины, рука и оставшаяся
+    колода - битовыми масками, хеш Зобриста обновляется на месте.
+    Каждое изменение записывается в заранее выделенный стек отмены,
+    поэтому рекурсия поиска не копирует состояние на каждом шаге.
+    """
+    __slots__ = ('lines', 'line_len', 'hand', 'deck', 'street', 'is_fantasy',
+                 'key', 'depth', '_moves', '_saved')
+
+    def __init__(self, lines: Sequence[Sequence[int]], hand: Sequence[int],
+                 deck: Sequence[int], street: int, is_fantasy: bool = False):
+        self.lines = [[EMPTY] * 5 for _ in LINES]
+        self.line_len = [0, 0, 0]
+        for i, cards in enumerate(lines):
+            self.lines[i][:len(cards)] = cards
+            self.line_len[i] = len(cards)
+        self.hand = card_mask(hand)
+        self.deck = card_mask(deck) & ~self.hand
+        self.street = street
+        self.is_fantasy = is_fantasy
+
+        key = ZOBRIST.street(street)
+        for card in hand:
+            key ^= ZOBRIST.card(card, 'hand')
+        for i, cards in enumerate(lines):
+            for card in cards:
+                key ^= ZOBRIST.card(card, LINES[i])
+        self.key = key
+
+        self.depth = 0
+        self._moves = [0] * MAX_DEPTH
+        self._saved = [0] * MAX_DEPTH
+
+    @classmethod
+    def from_state(cls, state: GameStateInfo) -> 'SearchState':
+        def indices(cards: List[Card]) -> List[int]:
+            return [GameStateInfo._card_to_index(card) for card in cards]
+
+        return cls(
+            lines=[indices(getattr(state, f"{position}_line")) for position in LINES],
+            hand=indices(state.hand_cards),
+            deck=indices(state.remaining_deck()),
+            street=state.street,
+            is_fantasy=state.is_fantasy
+        )
+
+    def to_state(self) -> GameStateInfo:
+        """Обратное преобразование (для оценщиков, работающих с картами)"""
+        def cards(indices: Sequence[int]) -> List[Card]:
+            return [CARDS[card] for card in indices]
+
+        return GameStateInfo(
+            available_cards=cards(mask_cards(self.deck)),
+            hand_cards=cards(mask_cards(self.hand)),
+            top_line=cards(self.line(0)),
+            middle_line=cards(self.line(1)),
+            bottom_line=cards(self.line(2)),
+            opponent_visible={},
+            street=self.street,
+            is_fantasy=self.is_fantasy,
+            zobrist_key=self.key
+        )
+
+    def line(self, line: int) -> List[int]:
+        return self.lines[line][:self.line_len[line]]
+
+    def hand_cards(self) -> List[int]:
+        return mask_cards(self.hand)
+
+    def remaining_deck(self) -> List[int]:
+        return mask_cards(self.deck)
+
+    def free_slots(self) -> int:
+        line_len = self.line_len
+        return 13 - line_len[0] - line_len[1] - line_len[2]
+
+    def is_street_complete(self) -> bool:
+        """Те же правила, что у GameStateInfo.is_street_complete"""
+        if self.free_slots() == 0 or not self.hand:
+            return True
+        discards = 1 if self.street > 1 or self.is_fantasy else 0
+        return bin(self.hand).count('1') <= discards
+
+    def is_terminal(self) -> bool:
+        return self.free_slots() == 0
+
+    def placements(self) -> List[Tuple[int, int]]:
+        """Пары (карта, линия): карта кладется в конец линии"""
+        open_lines = [i for i in range(3) if self.line_len[i] < CAPACITY[i]]
+        return [(card, line) for card in mask_cards(self.hand) for line in open_lines]
+
+    def apply(self, card: int, line: int, index: int = -1) -> None:
+        """Перенос карты из руки в линию (по умолчанию в конец)"""
+        cards = self.lines[line]
+        length = self.line_len[line]
+        if index < 0:
+            index = length
+        elif index < length:
+            cards[index + 1:length + 1] = cards[index:length]
+
+        cards[index] = card
+        self.line_len[line] = length + 1
+        self.hand ^= 1 << card
+        self.key = ZOBRIST.move(self.key, card, 'hand', LINES[line])
+
+        self._moves[self.depth] = (card << 6) | (line << 3) | index
+        self.depth += 1
+
+    def deal(self, cards: Sequence[int]) -> None:
+        """Сброс оставшихся карт руки и раздача следующей улицы"""
+        dealt = card_mask(cards)
+        key = ZOBRIST.change_street(self.key, self.street, self.street + 1)
+        for card in mask_cards(self.hand ^ dealt):
+            key = ZOBRIST.toggle(key, card, 'hand')
+        self.key = key
+
+        self._moves[self.depth] = _DEAL
+        self._saved[self.depth] = self.hand
+        self.depth += 1
+
+        self.hand = dealt
+        self.deck &= ~dealt
+        self.street += 1
+
+    def undo(self) -> None:
+        """Отмена последнего apply или deal"""
+        self.depth -= 1
+        move = self._moves[self.depth]
+
+        if move == _DEAL:
+            previous = self._saved[self.depth]
+            key = ZOBRIST.change_street(self.key, self.street, self.street - 1)
+            for card in mask_cards(self.hand ^ previous):
+                key = ZOBRIST.toggle(key, card, 'hand')
+            self.key = key
+            self.deck |= self.hand
+            self.hand = previous
+            self.street -= 1
+            return
+
+        card, line, index = move >> 6, (move >> 3) & 7, move & 7
+        cards = self.lines[line]
+        length = self.line_len[line] - 1
+        cards[index:length] = cards[index + 1:length + 1]
+        cards[length] = EMPTY
+        self.line_len[line] = length
+        self.hand |= 1 << card
+        self.key = ZOBRIST.move(self.key, card, LINES[line], 'hand')
+
+    def undo_to(self, depth: int) -> None:
+        while self.depth > depth:
+            self.undo()
+
+    def board(self) -> np.ndarray:
+        """Линии в виде массива (3, 5) для пакетных оценщиков"""
+        return np.array(self.lines, dtype=np.int16)
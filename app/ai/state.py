@@ -1,8 +1,11 @@
 from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from ..game.deck import Card
+from .transposition import ZOBRIST
 import numpy as np
 
+LINE_CAPACITY = {'top': 3, 'middle': 5, 'bottom': 5}
+
 @dataclass
 class GameStateInfo:
     """Информационное состояние игры для ИИ"""
@@ -14,6 +17,7 @@ class GameStateInfo:
     opponent_visible: Dict[str, List[Card]]  # Видимые карты оппонента
     street: int                 # Текущая улица
     is_fantasy: bool           # Режим фантазии
+    zobrist_key: Optional[int] = field(default=None, compare=False, repr=False)
 
     def to_numpy(self) -> np.ndarray:
         """Преобразование состояния в числовой вектор для ИИ"""
@@ -42,6 +46,71 @@ class GameStateInfo:
 
         return state_vector
 
+    def zobrist(self) -> int:
+        """Хеш Зобриста руки, линий и улицы (вычисляется один раз)"""
+        if self.zobrist_key is None:
+            key = ZOBRIST.street(self.street)
+            for location, cards in (('hand', self.hand_cards), ('top', self.top_line),
+                                    ('middle', self.middle_line), ('bottom', self.bottom_line)):
+                for card in cards:
+                    key ^= ZOBRIST.card(self._card_to_index(card), location)
+            self.zobrist_key = key
+        return self.zobrist_key
+
+    def place_card(self, card: Card, position: str, index: int) -> None:
+        """Перенос карты из руки в линию с обновлением хеша"""
+        self.hand_cards.remove(card)
+        getattr(self, f"{position}_line").insert(index, card)
+        if self.zobrist_key is not None:
+            self.zobrist_key = ZOBRIST.move(self.zobrist_key, self._card_to_index(card),
+                                            'hand', position)
+
+    def deal_street(self, cards: List[Card]) -> None:
+        """Сброс оставшихся карт руки и раздача следующей улицы"""
+        discarded = {self._card_to_index(card) for card in self.hand_cards}
+        self.available_cards = [
+            card for card in self.available_cards
+            if self._card_to_index(card) not in discarded
+        ]
+        if self.zobrist_key is not None:
+            key = ZOBRIST.change_street(self.zobrist_key, self.street, self.street + 1)
+            for card_index in discarded:
+                key = ZOBRIST.toggle(key, card_index, 'hand')
+            for card in cards:
+                key = ZOBRIST.toggle(key, self._card_to_index(card), 'hand')
+            self.zobrist_key = key
+        self.hand_cards = list(cards)
+        self.street += 1
+
+    def free_slots(self) -> int:
+        """Количество свободных мест во всех линиях"""
+        return sum(
+            capacity - len(getattr(self, f"{position}_line"))
+            for position, capacity in LINE_CAPACITY.items()
+        )
+
+    def is_street_complete(self) -> bool:
+        """Завершена ли расстановка карт текущей улицы
+
+        На первой улице размещаются все карты, на остальных улицах и
+        в фантазии одна карта сбрасывается.
+        """
+        if self.free_slots() == 0 or not self.hand_cards:
+            return True
+        discards = 1 if self.street > 1 or self.is_fantasy else 0
+        return len(self.hand_cards) <= discards
+
+    def remaining_deck(self) -> List[Card]:
+        """Карты, которые еще могут прийти на следующих улицах"""
+        known = {
+            self._card_to_index(card)
+            for cards in (self.hand_cards, self.top_line, self.middle_line,
+                          self.bottom_line, *self.opponent_visible.values())
+            for card in cards
+        }
+        return [card for card in self.available_cards
+                if self._card_to_index(card) not in known]
+
     @staticmethod
     def _card_to_index(card: Card) -> int:
         """Преобразование карты в индекс (0-51)"""
@@ -80,6 +149,25 @@ class ActionSpace:
 
         return valid_actions
 
+    def get_placements(self, state: GameStateInfo) -> List[Dict]:
+        """Действия без учета индекса внутри линии: карта в конец линии
+
+        Порядок карт в линии не влияет на ее силу, поэтому для поиска
+        достаточно одного действия на пару (карта, линия).
+        """
+        placements = []
+        for card in state.hand_cards:
+            for position in self.positions:
+                current_line = getattr(state, f"{position}_line")
+                if len(current_line) < self.max_indices[position]:
+                    placements.append({
+                        'type': 'place_card',
+                        'card': card,
+                        'position': position,
+                        'index': len(current_line)
+                    })
+        return placements
+
     def action_to_vector(self, action: Dict) -> np.ndarray:
         """Преобразование действия в вектор"""
         # Размер вектора: 52 карты * 13 позиций (3+5+5 индексов)
@@ -87,18 +175,21 @@ class ActionSpace:
         vector = np.zeros(vector_size)
         
         if action['type'] == 'place_card':
-            card_idx = GameStateInfo._card_to_index(action['card'])
-            position_offset = {
-                'top': 0,
-                'middle': 3,
-                'bottom': 8
-            }[action['position']]
-            
-            idx = card_idx * 13 + position_offset + action['index']
-            vector[idx] = 1
+            vector[self.action_to_index(action)] = 1
             
         return vector
 
+    @staticmethod
+    def action_to_index(action: Dict) -> int:
+        """Индекс действия в векторе размера 52 * 13"""
+        card_idx = GameStateInfo._card_to_index(action['card'])
+        position_offset = {
+            'top': 0,
+            'middle': 3,
+            'bottom': 8
+        }[action['position']]
+        return card_idx * 13 + position_offset + action['index']
+
     def vector_to_action(self, vector: np.ndarray) -> Dict:
         """Преобразование вектора в действие"""
         idx = np.argmax(vector)
@@ -1,11 +1,23 @@
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
+from functools import lru_cache
+import time
 import numpy as np
 from .state import GameStateInfo, ActionSpace
-from ..game.evaluator import HandEvaluator
+from .tree import NodeKind, SearchNode, SearchStats, MinMaxStats, select_child, find_descendant
+from .rollout import RolloutEngine, RolloutPolicy, DISCARD
+from .batch_eval import settle_board
+from .transposition import TranspositionTable
+from .search_state import SearchState, LINES, LINE_INDEX, CAPACITY
+from .placement import street_assignments
+from .endgame import EndgameSolver, EndgameSolution
 
 class Strategy:
-    """Базовый класс для стратегий ИИ"""
-    def get_action(self, state: GameStateInfo) -> Dict:
+    """Базовый класс для стратегий ИИ
+
+    deadline - момент time.monotonic(), к которому нужно вернуть действие.
+    Стратегии с фиксированной стоимостью решения его игнорируют.
+    """
+    def get_action(self, state: GameStateInfo, deadline: Optional[float] = None) -> Dict:
         raise NotImplementedError
 
 class RandomStrategy(Strategy):
@@ -13,209 +25,335 @@ class RandomStrategy(Strategy):
     def __init__(self):
         self.action_space = ActionSpace()
 
-    def get_action(self, state: GameStateInfo) -> Dict:
+    def get_action(self, state: GameStateInfo, deadline: Optional[float] = None) -> Dict:
         valid_actions = self.action_space.get_valid_actions(state)
         if not valid_actions:
             return {}
         return np.random.choice(valid_actions)
 
+_RANK_ONE_HOT = np.eye(13, dtype=np.int16)
+_SUIT_ONE_HOT = np.eye(4, dtype=np.int16)
+
+@lru_cache(maxsize=128)
+def _line_subsets(card_count: int, place_count: int,
+                  free: Tuple[int, int, int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Распределения карт улицы, подмножества руки и номера подмножеств,
+    попавших в каждую линию: (M, k), (S, k), (3, M)
+
+    При place_count == 0 распределения состоят из одной карты: каждая
+    пара (карта, линия) встречается один раз, а подмножества - пустое
+    и одиночные карты.
+    """
+    if place_count > 0:
+        assignments = street_assignments(card_count, place_count, free)
+        subsets = (np.arange(1 << card_count)[:, None] >> np.arange(card_count)) & 1
+        bits = 1 << np.arange(card_count)
+        masks = np.stack([((assignments == line) * bits).sum(axis=1) for line in range(3)])
+    else:
+        pairs = [(card, line) for card in range(card_count)
+                 for line in range(3) if free[line] > 0]
+        assignments = np.full((len(pairs), card_count), DISCARD, dtype=np.int8)
+        masks = np.zeros((3, len(pairs)), dtype=np.intp)
+        for row, (card, line) in enumerate(pairs):
+            assignments[row, card] = line
+            masks[line, row] = card + 1
+        subsets = np.vstack([np.zeros(card_count), np.eye(card_count)])
+    return assignments, subsets.astype(np.int16), masks
+
 class RuleBasedStrategy(Strategy):
-    """Стратегия на основе правил"""
-    def __init__(self):
-        self.action_space = ActionSpace()
-        self.evaluator = HandEvaluator()
+    """Стратегия на основе правил
 
-    def get_action(self, state: GameStateInfo) -> Dict:
-        valid_actions = self.action_space.get_valid_actions(state)
-        if not valid_actions:
+    Линии описываются массивами количеств рангов и мастей. Карты улицы
+    распределяются совместно: каждая линия оценивается один раз для
+    каждого подмножества карт руки, оценка распределения (не больше 3^5)
+    - сумма оценок его линий. Возвращается первое действие лучшего
+    распределения. Для больших рук (фантазия) перебираются пары
+    (карта, линия), каждая оценивается один раз.
+    """
+    TOP_PAIR_SCORE = 10.0       # За каждую карту пары или тройки наверху
+    MIDDLE_DRAW_SCORE = 5.0     # Потенциал стрита или флеша в середине
+    BOTTOM_DRAW_SCORE = 3.0     # Потенциал стрита или флеша внизу
+    FULL_HOUSE_SCORE = 5.0      # Тройка или две пары внизу
+    ORDER_PENALTY = 35.0        # За повтор ранга в линии сверх линии ниже
+    ORDER_PENALTY_FLOOR = 0.5   # Доля штрафа при пустой линии ниже
+    MAX_JOINT_CARDS = 5
+
+    def get_action(self, state: GameStateInfo, deadline: Optional[float] = None) -> Dict:
+        hand = state.hand_cards
+        line_len = [len(getattr(state, f"{position}_line")) for position in LINES]
+        free = tuple(CAPACITY[line] - line_len[line] for line in range(3))
+        if not hand or not any(free):
             return {}
 
-        # Оцениваем каждое действие
-        action_scores = []
-        for action in valid_actions:
-            score = self._evaluate_action(state, action)
-            action_scores.append((score, action))
-
-        # Выбираем действие с наивысшей оценкой
-        return max(action_scores, key=lambda x: x[0])[1]
-
-    def _evaluate_action(self, state: GameStateInfo, action: Dict) -> float:
-        """Оценка действия на основе правил"""
-        position = action['position']
-        card = action['card']
-        
-        # Базовая оценка
-        score = 0.0
-        
-        # Оцениваем карту относительно позиции
-        if position == 'top':
-            # Для верхней линии предпочитаем пары и тройки
-            score += self._evaluate_top_line(state, card)
-        elif position == 'middle':
-            # Для средней линии предпочитаем стриты и флеши
-            score += self._evaluate_middle_line(state, card)
-        else:  # bottom
-            # Для нижней линии предпочитаем сильные комбинации
-            score += self._evaluate_bottom_line(state, card)
-
-        return score
-
-    def _evaluate_top_line(self, state: GameStateInfo, card) -> float:
-        current_cards = state.top_line + [card]
-        rank_counts = self._count_ranks(current_cards)
-        
-        # Высокие оценки для пар и троек
-        if max(rank_counts.values()) > 1:
-            return 10.0 * max(rank_counts.values())
-        return float(HandEvaluator.RANK_VALUES[card.rank]) / 14.0
-
-    def _evaluate_middle_line(self, state: GameStateInfo, card) -> float:
-        current_cards = state.middle_line + [card]
-        score = 0.0
-        
-        # Проверяем потенциал для стрита
-        if self._has_straight_potential(current_cards):
-            score += 5.0
-            
-        # Проверяем потенциал для флеша
-        if self._has_flush_potential(current_cards):
-            score += 5.0
-            
-        return score
-
-    def _evaluate_bottom_line(self, state: GameStateInfo, card) -> float:
-        current_cards = state.bottom_line + [card]
-        score = 0.0
-        
-        # Предпочитаем высокие карты
-        score += HandEvaluator.RANK_VALUES[card.rank] / 14.0
-        
-        # Проверяем потенциал для сильных комбинаций
-        if self._has_straight_potential(current_cards):
-            score += 3.0
-        if self._has_flush_potential(current_cards):
-            score += 3.0
-        if self._has_full_house_potential(current_cards):
-            score += 5.0
-            
-        return score
+        discards = 1 if state.street > 1 or state.is_fantasy else 0
+        place_count = min(len(hand) - discards, sum(free))
+        if len(hand) > self.MAX_JOINT_CARDS:
+            place_count = 0
+        assignments, subsets, masks = _line_subsets(len(hand), max(place_count, 0), free)
 
-    @staticmethod
-    def _count_ranks(cards: List) -> Dict[str, int]:
-        return {rank: sum(1 for c in cards if c.rank == rank) 
-                for rank in set(c.rank for c in cards)}
+        line_scores, counts, sizes = self._score_line_subsets(state, hand, subsets)
+        scores = line_scores[0, masks[0]] + line_scores[1, masks[1]] + line_scores[2, masks[2]]
+        # Пара наверху без пары в середине (и так далее) ведет к мертвой руке
+        # тем вернее, чем меньше мест осталось в линии ниже
+        top, middle, bottom = (counts[line, masks[line]] for line in range(3))
+        floor = self.ORDER_PENALTY_FLOOR
+        middle_risk = floor + (1 - floor) * sizes[1, masks[1]] / CAPACITY[1]
+        bottom_risk = floor + (1 - floor) * sizes[2, masks[2]] / CAPACITY[2]
+        scores = scores - self.ORDER_PENALTY * (
+            np.maximum(top - np.maximum(middle, 1), 0) * middle_risk +
+            np.maximum(middle - np.maximum(bottom, 1), 0) * bottom_risk)
+        best = assignments[int(np.argmax(scores))]
+        card_index = int(np.flatnonzero(best != DISCARD)[0])
+        line = int(best[card_index])
+        return {
+            'type': 'place_card',
+            'card': hand[card_index],
+            'position': LINES[line],
+            'index': line_len[line]
+        }
 
-    @staticmethod
-    def _has_straight_potential(cards: List) -> bool:
-        if len(cards) < 3:
-            return False
-        values = sorted([HandEvaluator.RANK_VALUES[c.rank] for c in cards])
-        return max(values) - min(values) <= 4
+    def _score_line_subsets(self, state: GameStateInfo, hand: List,
+                            subsets: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Оценки (3, S) каждой линии после добавления подмножеств руки,
+        наибольшее число карт одного ранга и число карт в линии (3, S)"""
+        ids = np.array([GameStateInfo._card_to_index(card) for card in hand])
 
-    @staticmethod
-    def _has_flush_potential(cards: List) -> bool:
-        if len(cards) < 3:
-            return False
-        suits = [c.suit for c in cards]
-        return max(suits.count(s) for s in set(suits)) >= 3
+        base_ranks = np.zeros((3, 1, 13), dtype=np.int16)
+        base_suits = np.zeros((3, 1, 4), dtype=np.int16)
+        for line, position in enumerate(LINES):
+            for card in getattr(state, f"{position}_line"):
+                card_id = GameStateInfo._card_to_index(card)
+                base_ranks[line, 0, card_id >> 2] += 1
+                base_suits[line, 0, card_id & 3] += 1
 
-    @staticmethod
-    def _has_full_house_potential(cards: List) -> bool:
-        rank_counts = {}
-        for card in cards:
-            rank_counts[card.rank] = rank_counts.get(card.rank, 0) + 1
-        return 3 in rank_counts.values() or list(rank_counts.values()).count(2) >= 2
+        ranks = base_ranks + subsets @ _RANK_ONE_HOT[ids >> 2]
+        suits = base_suits + subsets @ _SUIT_ONE_HOT[ids & 3]
+        added_rank_sum = subsets @ ((ids >> 2) + 2)
+
+        sizes = ranks.sum(axis=2)
+        present = ranks > 0
+        low = present.argmax(axis=2)
+        high = 12 - present[:, :, ::-1].argmax(axis=2)
+        straight = (sizes >= 3) & (high - low <= 4)
+        flush = suits.max(axis=2) >= 3
+        max_count = ranks.max(axis=2)
+
+        # Верх: пары и тройки, иначе старшая карта
+        top_high = np.where(sizes[0] > 0, high[0] + 2, 0)
+        top = np.where(max_count[0] > 1, self.TOP_PAIR_SCORE * max_count[0], top_high / 14.0)
+        # Середина: стриты и флеши
+        middle = self.MIDDLE_DRAW_SCORE * (straight[1].astype(float) + flush[1])
+        # Низ: старшие карты и сильные комбинации
+        full_house = (max_count[2] >= 3) | ((ranks[2] == 2).sum(axis=1) >= 2)
+        bottom = added_rank_sum / 14.0 + \
+            self.BOTTOM_DRAW_SCORE * (straight[2].astype(float) + flush[2]) + \
+            self.FULL_HOUSE_SCORE * full_house
+
+        return np.stack([top, middle, bottom]), max_count, sizes
 
 class MCTSStrategy(Strategy):
-    """Стратегия на основе Monte Carlo Tree Search"""
-    def __init__(self, simulation_count: int = 100):
+    """Стратегия на основе Monte Carlo Tree Search
+
+    Дерево содержит узлы решений (куда положить карту) и узлы случая
+    (раздача следующей улицы). Выбор действий - UCT, либо PUCT при
+    заданной функции априорных вероятностей. Дерево сохраняется между
+    ходами: поддерево фактически сыгранного действия и фактической
+    раздачи становится новым корнем. Новые листья оцениваются пачкой
+    симуляций RolloutEngine до конца раздачи.
+
+    Узлы индексируются хешем Зобриста в таблице транспозиций: позиция,
+    полученная другим порядком размещения карт, использует уже
+    накопленную статистику, и дерево становится графом. Симуляции
+    применяют ходы к одному SearchState и откатывают их, не копируя
+    состояние.
+
+    На улицах 4-5 действие выбирает точный EndgameSolver, если он не
+    отключен параметром exact_endgame.
+    """
+    def __init__(self, simulation_count: int = 100, exploration: float = 1.4,
+                 prior_fn: Optional[Callable[[GameStateInfo, List[Dict]], np.ndarray]] = None,
+                 reuse_tree: bool = True, rollout_policy: Optional[RolloutPolicy] = None,
+                 rollouts_per_leaf: int = 16,
+                 transposition_table: Optional[TranspositionTable] = None,
+                 endgame_solver: Optional[EndgameSolver] = None, exact_endgame: bool = True):
         self.action_space = ActionSpace()
         self.simulation_count = simulation_count
+        self.rollout_engine = RolloutEngine(rollout_policy)
+        self.rollouts_per_leaf = rollouts_per_leaf
+        self.exploration = exploration
+        self.prior_fn = prior_fn
+        self.reuse_tree = reuse_tree
+        self.transpositions = transposition_table if transposition_table is not None \
+            else TranspositionTable()
+        self.endgame_solver = (endgame_solver or EndgameSolver()) if exact_endgame else None
+        self.root: Optional[SearchNode] = None
+        self.stats = MinMaxStats()
+        self.last_stats = SearchStats(0, 0.0)
+        self.last_endgame: Optional[EndgameSolution] = None
 
-    def get_action(self, state: GameStateInfo) -> Dict:
-        valid_actions = self.action_space.get_valid_actions(state)
-        if not valid_actions:
+    def get_action(self, state: GameStateInfo, deadline: Optional[float] = None) -> Dict:
+        """Лучшее действие; при заданном дедлайне (time.monotonic()) поиск
+        идет до дедлайна вместо фиксированного числа симуляций"""
+        placements = self.action_space.get_placements(state)
+        if not placements:
             return {}
 
-        # Выполняем симуляции для каждого действия
-        action_scores = []
-        for action in valid_actions:
-            score = self._simulate_action(state, action)
-            action_scores.append((score, action))
-
-        # Выбираем действие с наилучшим результатом
-        return max(action_scores, key=lambda x: x[0])[1]
-
-    def _simulate_action(self, state: GameStateInfo, action: Dict) -> float:
-        """Симуляция результата действия"""
-        total_score = 0.0
-        
-        for _ in range(self.simulation_count):
-            # Создаем копию состояния
-            sim_state = self._copy_state(state)
-            
-            # Применяем действие
-            self._apply_action(sim_state, action)
-            
-            # Проводим случайную симуляцию до конца игры
-            score = self._random_playout(sim_state)
-            total_score += score
-
-        return total_score / self.simulation_count
-
-    def _random_playout(self, state: GameStateInfo) -> float:
-        """Случайная симуляция до конца игры"""
-        while not self._is_terminal(state):
-            valid_actions = self.action_space.get_valid_actions(state)
-            if not valid_actions:
+        # На последних улицах дерево мало: точное решение вместо симуляций
+        self.last_endgame = self.endgame_solver.solve(state) if self.endgame_solver else None
+        if self.last_endgame is not None:
+            self.root = None
+            self.last_stats = SearchStats(0, self.last_endgame.elapsed)
+            return self.last_endgame.actions[0]
+
+        root = self.search(state, deadline)
+        best_key = self.best_action_key(root.children)
+        self.root = root.children.get(best_key) if self.reuse_tree else None
+        return self.placement_for_key(placements, best_key)
+
+    def search(self, state: GameStateInfo, deadline: Optional[float] = None) -> SearchNode:
+        """Поиск из состояния, возвращает корень с накопленной статистикой"""
+        self.transpositions.new_generation()
+        root = self._get_root(state)
+        search_state = SearchState.from_state(state)
+        started = time.monotonic()
+        simulations = 0
+
+        while True:
+            if deadline is None:
+                if simulations >= self.simulation_count:
+                    break
+            elif simulations > 0 and time.monotonic() >= deadline:
                 break
-            action = np.random.choice(valid_actions)
-            self._apply_action(state, action)
+            self._simulate(root, search_state)
+            search_state.undo_to(0)
+            simulations += 1
 
-        return self._evaluate_state(state)
+        self.last_stats = SearchStats(simulations, time.monotonic() - started)
+        return root
 
     @staticmethod
-    def _copy_state(state: GameStateInfo) -> GameStateInfo:
-        """Создание копии состояния"""
-        return GameStateInfo(
-            available_cards=state.available_cards.copy(),
-            hand_cards=state.hand_cards.copy(),
-            top_line=state.top_line.copy(),
-            middle_line=state.middle_line.copy(),
-            bottom_line=state.bottom_line.copy(),
-            opponent_visible=state.opponent_visible.copy(),
-            street=state.street,
-            is_fantasy=state.is_fantasy
-        )
+    def best_action_key(children: Dict[Tuple[int, str], object]) -> Tuple[int, str]:
+        """Наиболее посещаемое действие (дети - узлы или пары (visits, value_sum))"""
+        def visits(key):
+            child = children[key]
+            return child.visits if isinstance(child, SearchNode) else child[0]
+
+        return max(children, key=visits)
 
     @staticmethod
-    def _apply_action(state: GameStateInfo, action: Dict) -> None:
-        """Применение действия к состоянию"""
-        if action['type'] == 'place_card':
-            card = action['card']
-            position = action['position']
-            target_line = getattr(state, f"{position}_line")
-            
-            state.hand_cards.remove(card)
-            target_line.insert(action['index'], card)
+    def placement_for_key(placements: List[Dict], key: Tuple[int, str]) -> Dict:
+        card_index, position = key
+        return next(
+            action for action in placements
+            if action['position'] == position and
+            GameStateInfo._card_to_index(action['card']) == card_index
+        )
+
+    def reset(self) -> None:
+        """Сброс сохраненного дерева (например, перед новой раздачей)"""
+        self.root = None
+        self.stats = MinMaxStats()
+        self.transpositions.clear()
+
+    def _get_root(self, state: GameStateInfo) -> SearchNode:
+        """Корень поиска: узел из таблицы транспозиций, сохраненное
+        поддерево или новый узел"""
+        key = state.zobrist()
+        node = self.transpositions.get(key)
+        if node is None and self.root is not None:
+            node = find_descendant(self.root, key)
+        if node is not None and node.kind == NodeKind.DECISION:
+            return node
+
+        self.stats = MinMaxStats()
+        node = SearchNode(NodeKind.DECISION, key)
+        self.transpositions.store(key, node)
+        return node
+
+    def _simulate(self, root: SearchNode, state: SearchState) -> None:
+        """Одна итерация: выбор, расширение, симуляция и обратное распространение
+
+        Ходы применяются к state, откат выполняет вызывающий код.
+        """
+        node = root
+        path = [node]
+
+        while True:
+            if node.kind == NodeKind.TERMINAL:
+                value = self._evaluate_state(state)
+                break
+
+            if node.kind == NodeKind.CHANCE:
+                child_key = self._deal_next_street(state)
+            else:
+                if not node.is_expanded:
+                    self._expand(node, state)
+                child_key = select_child(node, self.stats, self.exploration)
+                state.apply(child_key[0], LINE_INDEX[child_key[1]])
+
+            child = node.children.get(child_key)
+            if child is None:
+                # Позиция могла встретиться при другом порядке размещения
+                child = self.transpositions.get(state.key)
+                if child is not None:
+                    node.children[child_key] = child
+                    node = child
+                    path.append(node)
+                    continue
+
+                child = SearchNode(self._node_kind(state), state.key)
+                node.children[child_key] = child
+                self.transpositions.store(child.key, child)
+                path.append(child)
+                value = self._evaluate_state(state) if child.kind == NodeKind.TERMINAL \
+                    else self._rollout(state)
+                break
+
+            node = child
+            path.append(node)
+
+        self.stats.update(value)
+        for visited in path:
+            visited.update(value)
+
+    def _expand(self, node: SearchNode, state: SearchState) -> None:
+        """Заполнение списка действий узла решения"""
+        node.actions = [(card, LINES[line]) for card, line in state.placements()]
+        if self.prior_fn is not None:
+            # Порядок совпадает: рука в to_state() упорядочена по индексу карты
+            game_state = state.to_state()
+            placements = self.action_space.get_placements(game_state)
+            priors = np.asarray(self.prior_fn(game_state, placements), dtype=np.float64)
+            total = priors.sum()
+            node.priors = priors / total if total > 0 else \
+                np.full(len(placements), 1.0 / len(placements))
+
+    def _node_kind(self, state: SearchState) -> str:
+        if state.free_slots() == 0:
+            return NodeKind.TERMINAL
+        if state.is_street_complete():
+            return NodeKind.CHANCE if state.remaining_deck() else NodeKind.TERMINAL
+        return NodeKind.DECISION
 
     @staticmethod
-    def _is_terminal(state: GameStateInfo) -> bool:
-        """Проверка завершения игры"""
-        return (len(state.hand_cards) == 0 and 
-                len(state.top_line) == 3 and 
-                len(state.middle_line) == 5 and 
-                len(state.bottom_line) == 5)
+    def _deal_next_street(state: SearchState) -> Tuple[int, ...]:
+        """Сброс оставшихся карт и раздача следующей улицы"""
+        deck = state.remaining_deck()
+        deal_count = min(3, len(deck))
+        dealt = tuple(sorted(deck[i] for i in
+                             np.random.choice(len(deck), deal_count, replace=False)))
+        state.deal(dealt)
+        return dealt
+
+    def _rollout(self, state: SearchState) -> float:
+        """Оценка нового листа пачкой симуляций до конца раздачи"""
+        discards = 1 if state.street > 1 or state.is_fantasy else 0
+        return self.rollout_engine.evaluate_board(
+            state.board(), state.hand_cards(), state.remaining_deck(),
+            discards, self.rollouts_per_leaf
+        )
 
     @staticmethod
-    def _evaluate_state(state: GameStateInfo) -> float:
+    def _evaluate_state(state: SearchState) -> float:
         """Оценка конечного состояния"""
-        evaluator = HandEvaluator()
-        score = 0.0
-        
-        # Оцениваем каждую линию
-        score += evaluator.evaluate_line(state.top_line)[0] * 1.0
-        score += evaluator.evaluate_line(state.middle_line)[0] * 1.5
-        score += evaluator.evaluate_line(state.bottom_line)[0] * 2.0
-        
-        return score
+        return settle_board(state.line(0), state.line(1), state.line(2))
@@ -0,0 +1,120 @@
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+
+class ZobristHasher:
+    """Хеши Зобриста для пар (карта, расположение) и номера улицы
+
+    Хеш состояния - XOR ключей всех карт руки и линий и ключа улицы,
+    поэтому он не зависит от порядка размещения и обновляется за O(1)
+    при перемещении карты.
+    """
+    LOCATIONS = {'hand': 0, 'top': 1, 'middle': 2, 'bottom': 3}
+    MAX_STREET = 16
+
+    def __init__(self, seed: int = 20240101):
+        rng = np.random.default_rng(seed)
+        keys = rng.integers(1, 2 ** 63, size=(52, len(self.LOCATIONS)), dtype=np.int64)
+        self.card_keys: List[List[int]] = keys.tolist()
+        self.street_keys: List[int] = rng.integers(
+            1, 2 ** 63, size=self.MAX_STREET + 1, dtype=np.int64
+        ).tolist()
+
+    def card(self, card_index: int, location: str) -> int:
+        return self.card_keys[card_index][self.LOCATIONS[location]]
+
+    def street(self, street: int) -> int:
+        return self.street_keys[min(street, self.MAX_STREET)]
+
+    def move(self, key: int, card_index: int, source: str, target: str) -> int:
+        """Перемещение карты между расположениями"""
+        keys = self.card_keys[card_index]
+        return key ^ keys[self.LOCATIONS[source]] ^ keys[self.LOCATIONS[target]]
+
+    def toggle(self, key: int, card_index: int, location: str) -> int:
+        """Добавление или удаление карты в расположении"""
+        return key ^ self.card_keys[card_index][self.LOCATIONS[location]]
+
+    def change_street(self, key: int, old_street: int, new_street: int) -> int:
+        return key ^ self.street(old_street) ^ self.street(new_street)
+
+ZOBRIST = ZobristHasher()
+
+class TranspositionTable:
+    """Ограниченная таблица транспозиций с политикой замещения
+
+    Записи лежат в массиве фиксированного размера, слот определяется
+    младшими битами хеша. При коллизии запись из прошлого поколения
+    (предыдущего поиска) замещается всегда, а запись текущего поколения -
+    только записью не меньшего приоритета (по умолчанию число посещений).
+    """
+    def __init__(self, capacity: int = 1 << 16,
+                 priority: Optional[Callable[[Any], float]] = None):
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self.size = size
+        self.mask = size - 1
+        self.priority = priority or (lambda value: getattr(value, 'visits', 0))
+        self.generation = 0
+        self._keys: List[Optional[int]] = [None] * size
+        self._values: List[Any] = [None] * size
+        self._generations: List[int] = [0] * size
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.replacements = 0
+        self.rejections = 0
+
+    def new_generation(self) -> None:
+        """Начало нового поиска: старые записи становятся кандидатами на замену"""
+        self.generation += 1
+
+    def get(self, key: int) -> Optional[Any]:
+        slot = key & self.mask
+        if self._keys[slot] == key:
+            self.hits += 1
+            self._generations[slot] = self.generation
+            return self._values[slot]
+        self.misses += 1
+        return None
+
+    def store(self, key: int, value: Any) -> bool:
+        """Сохранение записи, возвращает False, если слот остался за старой"""
+        slot = key & self.mask
+        existing_key = self._keys[slot]
+
+        if existing_key is not None and existing_key != key:
+            fresh = self._generations[slot] == self.generation
+            if fresh and self.priority(value) < self.priority(self._values[slot]):
+                self.rejections += 1
+                return False
+            self.replacements += 1
+
+        self._keys[slot] = key
+        self._values[slot] = value
+        self._generations[slot] = self.generation
+        self.stores += 1
+        return True
+
+    def clear(self) -> None:
+        self._keys = [None] * self.size
+        self._values = [None] * self.size
+        self._generations = [0] * self.size
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        """Счетчики использования таблицы"""
+        return {
+            'size': self.size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate,
+            'stores': self.stores,
+            'replacements': self.replacements,
+            'rejections': self.rejections
+        }
@@ -0,0 +1,93 @@
+from typing import Dict, Hashable, List, Optional
+from dataclasses import dataclass
+import math
+import numpy as np
+
+class NodeKind:
+    DECISION = "decision"   # Игрок выбирает, куда положить карту
+    CHANCE = "chance"       # Раздача карт следующей улицы
+    TERMINAL = "terminal"   # Расстановка завершена
+
+class SearchNode:
+    """Узел дерева поиска MCTS"""
+    __slots__ = ('kind', 'key', 'children', 'visits', 'value_sum',
+                 'actions', 'priors')
+
+    def __init__(self, kind: str, key: Hashable = None):
+        self.kind = kind
+        self.key = key                     # Ключ состояния для переиспользования
+        self.children: Dict[Hashable, 'SearchNode'] = {}
+        self.visits = 0
+        self.value_sum = 0.0
+        self.actions: Optional[List[Hashable]] = None   # Ключи действий узла решения
+        self.priors: Optional[np.ndarray] = None        # Априорные вероятности (PUCT)
+
+    @property
+    def value(self) -> float:
+        return self.value_sum / self.visits if self.visits else 0.0
+
+    @property
+    def is_expanded(self) -> bool:
+        return self.actions is not None
+
+    def update(self, value: float) -> None:
+        self.visits += 1
+        self.value_sum += value
+
+@dataclass
+class SearchStats:
+    """Статистика последнего поиска"""
+    simulations: int
+    elapsed: float
+
+class MinMaxStats:
+    """Нормализация оценок узлов в диапазон [0, 1] для формулы UCB"""
+    def __init__(self):
+        self.minimum = math.inf
+        self.maximum = -math.inf
+
+    def update(self, value: float) -> None:
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+
+    def normalize(self, value: float) -> float:
+        if self.maximum > self.minimum:
+            return (value - self.minimum) / (self.maximum - self.minimum)
+        return 0.5
+
+def select_child(node: SearchNode, stats: MinMaxStats, exploration: float) -> Hashable:
+    """Выбор действия по UCT, либо по PUCT, если заданы априорные вероятности"""
+    best_key, best_score = None, -math.inf
+    parent_visits = max(node.visits, 1)
+    log_visits = math.log(parent_visits)
+    sqrt_visits = math.sqrt(parent_visits)
+
+    for i, key in enumerate(node.actions):
+        child = node.children.get(key)
+        child_visits = child.visits if child else 0
+
+        if node.priors is not None:
+            q = stats.normalize(child.value) if child_visits else 0.0
+            score = q + exploration * node.priors[i] * sqrt_visits / (1 + child_visits)
+        elif child_visits == 0:
+            return key
+        else:
+            score = stats.normalize(child.value) + \
+                exploration * math.sqrt(log_visits / child_visits)
+
+        if score > best_score:
+            best_key, best_score = key, score
+
+    return best_key
+
+def find_descendant(root: SearchNode, key: Hashable, max_depth: int = 4) -> Optional[SearchNode]:
+    """Поиск узла с заданным ключом в поддереве (для переиспользования дерева)"""
+    frontier = [root]
+    for _ in range(max_depth + 1):
+        next_frontier = []
+        for node in frontier:
+            if node.key == key:
+                return node
+            next_frontier.extend(node.children.values())
+        frontier = next_frontier
+    return None
@@ -0,0 +1,42 @@
+"""ASGI-режим: Socket.IO на socketio.AsyncServer в цикле ASGI-сервера
+
+Столы (ходы, таймеры, ходы ИИ) работают в том же цикле, что и
+обработчики событий, без eventlet и его monkey patching; страницы и
+HTTP API отдает то же приложение Flask через WsgiToAsgi.
+
+Запуск: uvicorn --factory app.asgi:create_asgi_app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import logging
+import socketio
+from asgiref.wsgi import WsgiToAsgi
+from . import create_app, registry
+from .web.async_socket import AsyncSocketServer
+from .web.fanout import async_client_manager
+
+logger = logging.getLogger(__name__)
+
+def create_asgi_app(test_config=None) -> socketio.ASGIApp:
+    """ASGI-приложение: Socket.IO столов и страницы Flask"""
+    flask_app = create_app(test_config, asgi=True)
+    server = socketio.AsyncServer(
+        async_mode='asgi', cors_allowed_origins='*',
+        client_manager=async_client_manager(flask_app.config.get('SOCKETIO_MESSAGE_QUEUE')))
+    tables = AsyncSocketServer(server, registry,
+                               flask_app.config.get('SOCKETIO_BATCH_INTERVAL', 0.0))
+
+    async def startup() -> None:
+        # Цикл столов - цикл сервера; восстановление из журнала блокирует
+        # поток до конца, поэтому идет вне цикла
+        registry.runner.attach(asyncio.get_running_loop())
+        rooms = await asyncio.to_thread(registry.recover)
+        if rooms:
+            logger.info("Восстановлено столов: %d", len(rooms))
+        registry.start_gc()
+
+    async def shutdown() -> None:
+        await tables.batcher.flush()
+        registry.close()
+
+    return socketio.ASGIApp(server, other_asgi_app=WsgiToAsgi(flask_app),
+                            on_startup=startup, on_shutdown=shutdown)
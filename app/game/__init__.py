@@ -1,10 +1,13 @@
 from .game import Game
+from .core import GameCore, GameState
 from .player import Player, PlayerManager
 from .deck import Deck, Card
 from .hand import Hand
 
 __all__ = [
     'Game',
+    'GameCore',
+    'GameState',
     'Player',
     'PlayerManager',
     'Deck',
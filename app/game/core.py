@@ -0,0 +1,447 @@
+from typing import Any, Callable, Dict, List, Optional, Protocol
+from dataclasses import dataclass, field
+import functools
+import random
+import time
+from .deck import Deck, Card, CARD_IDS
+from .player import Player, PlayerManager
+from ..utils.scorer import ScoreCalculator
+from ..ai.state import GameStateInfo, ActionSpace
+
+class GameState:
+    WAITING = "waiting"
+    DEALING = "dealing"
+    PLAYING = "playing"
+    FANTASY = "fantasy"
+    SCORING = "scoring"
+    FINISHED = "finished"
+
+# Состояния, в которых игроки расставляют карты
+IN_PROGRESS = (GameState.DEALING, GameState.PLAYING, GameState.FANTASY)
+
+LINES = ('top', 'middle', 'bottom')
+LINE_SIZES = {'top': 3, 'middle': 5, 'bottom': 5}
+FIRST_STREET_CARDS = 5
+STREET_CARDS = 3
+FANTASY_CARDS = 14
+LAST_STREET = 5
+
+class Agent(Protocol):
+    def get_action(self, state: GameStateInfo, deadline: Optional[float] = None) -> Dict:
+        ...
+
+class Journal(Protocol):
+    def record(self, kind: str, core: 'GameCore', args: tuple) -> None:
+        ...
+
+def journaled(kind: str, success_only: bool = False) -> Callable:
+    """Запись вызова метода ядра в журнал стола (GameCore.journal)
+
+    Пишутся только внешние вызовы: переходы, которые метод делает сам
+    (например, next_street внутри apply_action), повторяются при
+    воспроизведении. С success_only вызов, вернувший False, не пишется.
+    """
+    def decorate(method: Callable) -> Callable:
+        @functools.wraps(method)
+        def wrapper(self: 'GameCore', *args: Any) -> Any:
+            if self.journal is None or self._journal_depth:
+                return method(self, *args)
+            self._journal_depth += 1
+            try:
+                result = method(self, *args)
+            finally:
+                self._journal_depth -= 1
+            if not (success_only and result is False):
+                self.journal.record(kind, self, args)
+            return result
+        return wrapper
+    return decorate
+
+@dataclass
+class HandResult:
+    """Итог одной раздачи"""
+    scores: Dict[str, int]                 # Изменение счета игроков
+    fantasy_players: List[str]             # Игроки с фантазией в следующей раздаче
+    decisions: int = 0
+    errors: Dict[str, int] = field(default_factory=dict)   # Недопустимые действия агентов
+
+class GameCore:
+    """Синхронное ядро игры без таймеров и event loop
+
+    Хранит колоду, игроков, улицу и очередь хода, применяет действия и
+    сам переходит к следующему игроку, улице, подсчету очков и фантазии.
+    Game добавляет к ядру таймеры и асинхронный интерфейс, а симуляции
+    (обучение, арена, нагрузочные тесты) вызывают play_hand в цикле.
+    """
+    def __init__(self, player_manager: Optional[PlayerManager] = None,
+                 rng: Optional[random.Random] = None):
+        self.deck = Deck(rng)
+        self.player_manager = player_manager or PlayerManager()
+        self.state = GameState.WAITING
+        self.current_street = 0
+        self.current_player_id: Optional[str] = None
+        self.fantasy_players: List[str] = []
+        # Отключившиеся игроки: их улицы расставляются без ожидания таймера
+        self.away: List[str] = []
+        self.last_result: Optional[HandResult] = None
+        # Растет при каждом изменении состояния; по нему устаревают кэши
+        self.version = 0
+        # Журнал событий стола (app.game.journal); None - без записи
+        self.journal: Optional[Journal] = None
+        self._journal_depth = 0
+        # Порядок колоды последней раздачи (для журнала)
+        self.deal_order: List[Card] = []
+        self.action_space = ActionSpace()
+        # Ключи карт колоды вычисляются один раз для get_state_info
+        self._deck_keys = [((card.rank, card.suit), card) for card in self.deck.all_cards]
+
+    @property
+    def players(self) -> Dict[str, Player]:
+        return self.player_manager.players
+
+    def mark_changed(self) -> None:
+        """Новая версия состояния (изменения в обход методов ядра тоже
+        должны вызывать его)"""
+        self.version += 1
+
+    def note(self, kind: str, *args: Any) -> None:
+        """Справочная запись журнала, не меняющая состояние (таймаут, итог раздачи)"""
+        if self.journal is not None:
+            self.journal.record(kind, self, args)
+
+    @journaled('set')
+    def set_attribute(self, name: str, value: Any) -> None:
+        """Прямая запись атрибута состояния (state, улица, ход, фантазия)"""
+        setattr(self, name, value)
+        self.mark_changed()
+
+    @journaled('join')
+    def add_player(self, player: Player) -> None:
+        self.player_manager.add_player(player)
+        self.mark_changed()
+
+    @journaled('leave')
+    def remove_player(self, player_id: str) -> None:
+        self.player_manager.remove_player(player_id)
+        if player_id in self.away:
+            self.away.remove(player_id)
+        self.mark_changed()
+
+    @journaled('away', success_only=True)
+    def set_away(self, player_id: str, away: bool) -> bool:
+        """Отметка отключения игрока (away=False - игрок вернулся)"""
+        if player_id not in self.players or (player_id in self.away) == away:
+            return False
+        if away:
+            self.away.append(player_id)
+        else:
+            self.away.remove(player_id)
+        self.mark_changed()
+        return True
+
+    @journaled('ready', success_only=True)
+    def set_ready(self, player_id: str) -> bool:
+        player = self.players.get(player_id)
+        if player is None:
+            return False
+        player.is_ready = True
+        self.mark_changed()
+        return True
+
+    @journaled('time_bank', success_only=True)
+    def set_time_bank(self, player_id: str, time_bank: float) -> bool:
+        player = self.players.get(player_id)
+        if player is None:
+            return False
+        player.time_bank = time_bank
+        self.mark_changed()
+        return True
+
+    def start_game(self) -> None:
+        """Новая игра: фантазия прошлых раздач не переносится"""
+        self.fantasy_players = []
+        self.start_hand()
+
+    @journaled('deal')
+    def start_hand(self, order: Optional[List[Dict]] = None) -> None:
+        """Раздача: игрокам с фантазией 14 карт, остальным 5
+
+        order - заданный порядок колоды (воспроизведение журнала), иначе
+        колода перемешивается.
+        """
+        if len(self.players) < 2:
+            raise ValueError("Недостаточно игроков для начала игры")
+
+        if order is None:
+            self.deck.reset()
+        else:
+            self.deck.arrange(order)
+        self.deal_order = list(self.deck.cards)
+        self.player_manager.reset_all()
+        for player_id, player in self.players.items():
+            count = FANTASY_CARDS if player_id in self.fantasy_players else FIRST_STREET_CARDS
+            player.add_cards(self.deck.draw(count))
+            if player_id in self.fantasy_players:
+                player.fantasy_count += 1
+
+        self.state = GameState.FANTASY if self.fantasy_players else GameState.DEALING
+        self.current_street = 1
+        self.current_player_id = None
+        self._advance()
+        self.mark_changed()
+
+    def can_player_move(self, player_id: str) -> bool:
+        return self.state in IN_PROGRESS and self.current_player_id == player_id
+
+    @journaled('action', success_only=True)
+    def apply_action(self, player_id: str, action: Dict) -> bool:
+        """Действие игрока; после завершения улицы ход переходит дальше"""
+        if not self.can_player_move(player_id):
+            return False
+
+        player = self.players.get(player_id)
+        if not player:
+            return False
+
+        action_type = action.get('type')
+        if action_type == 'place_card':
+            success = self.place_card(player, action['card'], action['position'],
+                                      action['index'])
+        elif action_type == 'remove_card':
+            if action['position'] not in LINES:
+                return False
+            success = bool(player.remove_card(action['position'], action['index']))
+        else:
+            return False
+
+        if success:
+            if self.is_street_completed(player):
+                self._advance()
+            self.mark_changed()
+        return success
+
+    @journaled('street', success_only=True)
+    def submit_street(self, player_id: str, placements: List[Dict]) -> bool:
+        """Расстановка всей улицы одним действием
+
+        placements - список {card, position, index}; проверяется целиком до
+        изменения руки и применяется, только если завершает улицу игрока.
+        """
+        if not self.can_player_move(player_id):
+            return False
+        player = self.players.get(player_id)
+        if player is None or not isinstance(placements, list) \
+                or not self.is_street_placement(player, placements):
+            return False
+
+        for placement in placements:
+            self.place_card(player, placement['card'], placement['position'],
+                            placement['index'])
+        self._advance()
+        self.mark_changed()
+        return True
+
+    def is_street_placement(self, player: Player, placements: List[Dict]) -> bool:
+        """Проверка расстановки улицы без изменения руки: карты (битовые
+        маски номеров) из руки и без повторов, места на линиях, улица завершена"""
+        hand = player.hand
+        in_hand = 0
+        for card in hand.current_cards:
+            in_hand |= 1 << CARD_IDS[(card.rank, card.suit)]
+
+        placed = 0
+        sizes = {line: len(getattr(hand, line)) for line in LINES}
+        for placement in placements:
+            try:
+                card, position, index = \
+                    placement['card'], placement['position'], placement['index']
+                bit = 1 << CARD_IDS[(card['rank'], card['suit'])]
+            except (KeyError, TypeError):
+                return False
+            if not in_hand & bit or placed & bit or position not in LINES:
+                return False
+            if not isinstance(index, int) or not 0 <= index <= sizes[position] \
+                    or sizes[position] >= LINE_SIZES[position]:
+                return False
+            placed |= bit
+            sizes[position] += 1
+
+        complete = sizes == LINE_SIZES
+        return self._street_done(player.id, complete, len(hand.current_cards) - len(placements))
+
+    @journaled('place', success_only=True)
+    def place(self, player_id: str, card, position: str, index: int) -> bool:
+        """Размещение карты без передачи хода (автоматическая расстановка, ИИ)"""
+        player = self.players.get(player_id)
+        if player is None or not self.place_card(player, card, position, index):
+            return False
+        self.mark_changed()
+        return True
+
+    @staticmethod
+    def place_card(player: Player, card, position: str, index: int) -> bool:
+        """Размещение карты руки (объект Card или словарь rank/suit)"""
+        if position not in LINES:
+            return False
+        if isinstance(card, Card):
+            if any(c is card for c in player.hand.current_cards):
+                return player.hand.place_card(card, position, index)
+            card = card.to_dict()
+        return player.place_card(card, position, index)
+
+    def is_street_completed(self, player: Player) -> bool:
+        """Проверка завершения текущей улицы игроком"""
+        return self._street_done(player.id, player.hand.is_complete(),
+                                 len(player.hand.current_cards))
+
+    def _street_done(self, player_id: str, complete: bool, in_hand: int) -> bool:
+        if complete:
+            # Лишние карты последней улицы и фантазии сбрасываются
+            return True
+        if player_id in self.fantasy_players:
+            return False
+        if self.current_street == 1:
+            return in_hand == 0
+        return in_hand == 1  # Одна карта должна быть сброшена
+
+    @journaled('next_turn')
+    def next_turn(self) -> None:
+        """Ход следующего игрока, который еще не закончил улицу"""
+        self._advance()
+        self.mark_changed()
+
+    def _advance(self) -> None:
+        player_ids = list(self.players)
+        start = player_ids.index(self.current_player_id) + 1 \
+            if self.current_player_id in self.players else 0
+
+        for offset in range(len(player_ids)):
+            player_id = player_ids[(start + offset) % len(player_ids)]
+            if not self.is_street_completed(self.players[player_id]):
+                self.current_player_id = player_id
+                return
+        self.next_street()
+
+    @journaled('next_street')
+    def next_street(self) -> None:
+        """Раздача следующей улицы или подсчет очков после последней"""
+        self.current_street += 1
+        if self.current_street > LAST_STREET:
+            self.finish_hand()
+            return
+
+        if self.state == GameState.DEALING:
+            self.state = GameState.PLAYING
+        for player_id, player in self.players.items():
+            if player_id not in self.fantasy_players:
+                player.add_cards(self.deck.draw(STREET_CARDS))
+
+        self.current_player_id = None
+        self._advance()
+        self.mark_changed()
+
+    @journaled('check_fantasy')
+    def check_fantasy(self) -> bool:
+        """Игроки, заработавшие фантазию на следующую раздачу"""
+        self.fantasy_players = [
+            player_id for player_id, player in self.players.items()
+            if ScoreCalculator.is_fantasy_qualified(player.hand)
+        ]
+        self.mark_changed()
+        return bool(self.fantasy_players)
+
+    @journaled('settle')
+    def settle(self) -> Dict[str, int]:
+        """Подсчет очков каждой пары игроков"""
+        scores = {player_id: 0 for player_id in self.players}
+        player_ids = list(self.players)
+        for i in range(len(player_ids)):
+            for j in range(i + 1, len(player_ids)):
+                score = ScoreCalculator.calculate_hand_score(
+                    self.players[player_ids[i]].hand, self.players[player_ids[j]].hand
+                )
+                scores[player_ids[i]] += score
+                scores[player_ids[j]] -= score
+
+        for player_id, score in scores.items():
+            self.players[player_id].score += score
+        self.mark_changed()
+        return scores
+
+    @journaled('finish_hand')
+    def finish_hand(self) -> HandResult:
+        """Подсчет очков и определение фантазии на следующую раздачу"""
+        self.state = GameState.SCORING
+        scores = self.settle()
+        self.check_fantasy()
+        self.state = GameState.FINISHED
+        self.current_player_id = None
+        self.last_result = HandResult(scores=scores, fantasy_players=list(self.fantasy_players))
+        self.mark_changed()
+        self.note('result', scores)
+        return self.last_result
+
+    def get_state_info(self, player_id: str) -> GameStateInfo:
+        """Информационное состояние игры с точки зрения игрока"""
+        player = self.players[player_id]
+        hand = player.hand
+
+        opponent_visible = {
+            other_id: other.hand.top + other.hand.middle + other.hand.bottom
+            for other_id, other in self.players.items()
+            if other_id != player_id
+        }
+        known = {
+            (card.rank, card.suit)
+            for cards in (hand.current_cards, hand.top, hand.middle, hand.bottom,
+                          *opponent_visible.values())
+            for card in cards
+        }
+        unseen = [card for key, card in self._deck_keys if key not in known]
+
+        return GameStateInfo(
+            available_cards=unseen,
+            hand_cards=list(hand.current_cards),
+            top_line=list(hand.top),
+            middle_line=list(hand.middle),
+            bottom_line=list(hand.bottom),
+            opponent_visible=opponent_visible,
+            street=self.current_street,
+            is_fantasy=player_id in self.fantasy_players
+        )
+
+    def play_hand(self, agents: Dict[str, Agent],
+                  think_time: Optional[float] = None) -> HandResult:
+        """Раздача от начала до подсчета очков
+
+        think_time - время на каждое решение агента (дедлайн по
+        time.monotonic()). Недопустимое действие агента (или исключение)
+        заменяется первым допустимым размещением и учитывается в
+        HandResult.errors.
+        """
+        self.start_hand()
+        errors = {player_id: 0 for player_id in self.players}
+        decisions = 0
+
+        while self.state in IN_PROGRESS:
+            player_id = self.current_player_id
+            state = self.get_state_info(player_id)
+            deadline = time.monotonic() + think_time if think_time else None
+            try:
+                action = agents[player_id].get_action(state, deadline)
+            except Exception:
+                action = {}
+
+            decisions += 1
+            try:
+                applied = bool(action) and self.apply_action(player_id, action)
+            except (KeyError, TypeError, AttributeError):
+                applied = False
+            if not applied:
+                errors[player_id] += 1
+                self.apply_action(player_id, self.action_space.get_placements(state)[0])
+
+        result = self.last_result
+        result.decisions = decisions
+        result.errors = errors
+        return result
@@ -1,4 +1,4 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 import random
 
 class Card:
@@ -19,16 +19,24 @@ class Deck:
     SUITS = ['♥', '♦', '♣', '♠']
     RANKS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
 
-    def __init__(self):
+    def __init__(self, rng: Optional[random.Random] = None):
+        self.rng = rng or random
+        # Карты создаются один раз, reset только перемешивает их заново
+        self.all_cards: List[Card] = [Card(rank, suit) for suit in self.SUITS for rank in self.RANKS]
         self.cards: List[Card] = []
         self.reset()
 
     def reset(self) -> None:
-        self.cards = [Card(rank, suit) for suit in self.SUITS for rank in self.RANKS]
+        self.cards = self.all_cards.copy()
         self.shuffle()
 
+    def arrange(self, cards: List[Dict]) -> None:
+        """Полная колода в заданном порядке (словари rank/suit)"""
+        by_key = {(card.rank, card.suit): card for card in self.all_cards}
+        self.cards = [by_key[(card['rank'], card['suit'])] for card in cards]
+
     def shuffle(self) -> None:
-        random.shuffle(self.cards)
+        self.rng.shuffle(self.cards)
 
     def draw(self, count: int = 1) -> List[Card]:
         if len(self.cards) < count:
@@ -50,3 +58,7 @@ class Deck:
                 self.cards.remove(card)
                 result.append(card)
         return result
+
+# Номера карт 0-51 (ранг * 4 + масть) для компактных форматов: журнал, протокол
+CARD_KEYS = [(rank, suit) for rank in Deck.RANKS for suit in Deck.SUITS]
+CARD_IDS = {key: card_id for card_id, key in enumerate(CARD_KEYS)}
@@ -0,0 +1,123 @@
+from typing import Any, Dict, List, Optional, Tuple
+from collections import deque
+import copy
+
+ZONES = ('current', 'top', 'middle', 'bottom')
+# Операции - короткие списки: [SET, путь, значение], [DELETE, путь],
+# [MOVE, путь к руке, карта, из зоны, в зону, индекс]
+SET, DELETE, MOVE = 's', 'd', 'm'
+_MISSING = object()
+
+def _card_key(card: Dict) -> Tuple[str, str]:
+    return card['rank'], card['suit']
+
+def diff_states(old: Dict, new: Dict) -> List[List]:
+    """Операции, переводящие состояние old (Game.get_game_state) в new
+
+    SET/DELETE - значение по пути ключей; MOVE - карта, перешедшая из одной
+    зоны руки игрока (current, top, middle, bottom) в другую. Одинаковые
+    поддеревья пропускаются, поэтому ход одной картой дает пару операций:
+    перемещение карты и новую версию.
+    """
+    ops: List[List] = []
+    _diff(old, new, [], ops)
+    return ops
+
+def _diff(old: Dict, new: Dict, path: List[str], ops: List[List]) -> None:
+    for key in old:
+        if key not in new:
+            ops.append([DELETE, path + [key]])
+    for key, value in new.items():
+        previous = old.get(key, _MISSING)
+        if previous == value:
+            continue
+        if key == 'hand' and isinstance(previous, dict):
+            _diff_hand(previous, value, path + [key], ops)
+        elif isinstance(value, dict) and isinstance(previous, dict):
+            _diff(previous, value, path + [key], ops)
+        else:
+            ops.append([SET, path + [key], value])
+
+def _diff_hand(old: Dict, new: Dict, path: List[str], ops: List[List]) -> None:
+    """Перемещения карт между зонами руки; остальное - замена зоны"""
+    _diff({key: value for key, value in old.items() if key not in ZONES},
+          {key: value for key, value in new.items() if key not in ZONES}, path, ops)
+    location = {_card_key(card): zone for zone in ZONES for card in old.get(zone, [])}
+    moves = []
+    for zone in ZONES:
+        before = {_card_key(card) for card in old.get(zone, [])}
+        for index, card in enumerate(new.get(zone, [])):
+            source = location.get(_card_key(card))
+            if _card_key(card) not in before and source is not None and source != zone:
+                moves.append([MOVE, path, card, source, zone, index])
+
+    # Проверка: после перемещений зоны должны совпасть с новыми
+    result = apply_ops({zone: list(old.get(zone, [])) for zone in ZONES},
+                       [[MOVE, []] + move[2:] for move in moves])
+    ops.extend(moves)
+    for zone in ZONES:
+        if result.get(zone, []) != new.get(zone, []):
+            ops.append([SET, path + [zone], new.get(zone, [])])
+
+def apply_ops(state: Dict, ops: List[List]) -> Dict:
+    """Применение операций diff_states к копии состояния (как на клиенте)"""
+    state = copy.deepcopy(state)
+    for op in ops:
+        kind, path = op[0], op[1]
+        if kind == SET and not path:
+            state = copy.deepcopy(op[2])
+            continue
+
+        target = state
+        for key in path if kind == MOVE else path[:-1]:
+            target = target[key]
+        if kind == SET:
+            target[path[-1]] = copy.deepcopy(op[2])
+        elif kind == DELETE:
+            target.pop(path[-1], None)
+        elif kind == MOVE:
+            card, source, zone, index = op[2:]
+            key = _card_key(card)
+            target[source] = [other for other in target[source] if _card_key(other) != key]
+            target[zone].insert(index, dict(card))
+    return state
+
+class StateStream:
+    """Последовательность дельт состояния одного стола
+
+    publish сравнивает новое состояние с последним опубликованным и
+    выдает сообщение {seq, ops}; клиент, заметивший пропуск
+    номера, догоняет по истории (since) или берет снимок (snapshot).
+    """
+    def __init__(self, history: int = 64):
+        self.seq = 0
+        self.state: Optional[Dict] = None
+        self.history: deque = deque(maxlen=history)
+
+    def publish(self, state: Dict) -> Optional[Dict]:
+        """Дельта с прошлой публикации или None, если ничего не изменилось"""
+        if state is self.state:
+            return None
+        if self.state is None:
+            ops = [[SET, [], state]]
+        else:
+            ops = diff_states(self.state, state)
+        self.state = state
+        if not ops:
+            return None
+
+        self.seq += 1
+        message = {'seq': self.seq, 'ops': ops}
+        self.history.append(message)
+        return message
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {'seq': self.seq, 'state': self.state}
+
+    def since(self, seq: int) -> Optional[List[Dict]]:
+        """Дельты после seq или None, если история их уже не хранит"""
+        if seq >= self.seq:
+            return []
+        if not self.history or self.history[0]['seq'] > seq + 1:
+            return None
+        return [message for message in self.history if message['seq'] > seq]
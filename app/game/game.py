@@ -1,101 +1,256 @@
-from typing import Dict, List, Optional
-from .deck import Deck, Card
-from .player import Player, PlayerManager
-from .hand import Hand
-from ..utils.scorer import ScoreCalculator
+from typing import Awaitable, Callable, Dict, Optional
+from .player import Player
+from .core import GameCore, GameState, IN_PROGRESS
+from .timers import TimerWheel, TimerHandle
 from ..ai.mccfr import MCCFRAgent
+from ..ai.decisions import DecisionPool
+from ..ai.state import GameStateInfo
+from ..ai.fantasy import FantasySolver
+from ..ai.placement import AutoPlacer
 import asyncio
+import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
-class GameState:
-    WAITING = "waiting"
-    DEALING = "dealing"
-    PLAYING = "playing"
-    FANTASY = "fantasy"
-    SCORING = "scoring"
-    FINISHED = "finished"
+_FULL = object()   # Роль кэша состояния со всеми картами
+
+def _hide_hand(player: Dict) -> Dict:
+    """Словарь игрока с картами руки, замененными их числом"""
+    hand = player['hand']
+    return dict(player, hand=dict(hand, current=[], hidden=len(hand['current'])))
+
+def _core_attribute(name: str, writable: bool = True) -> property:
+    """Свойство Game, читающее и записывающее атрибут ядра (запись
+    меняет версию состояния и попадает в журнал стола)"""
+    def set_attribute(game: 'Game', value) -> None:
+        game.core.set_attribute(name, value)
+    return property(lambda game: getattr(game.core, name), set_attribute if writable else None)
 
 class Game:
-    def __init__(self):
-        self.deck = Deck()
-        self.player_manager = PlayerManager()
-        self.state = GameState.WAITING
-        self.current_street = 0
-        self.ai_agent = MCCFRAgent(player_id="ai_player")
-        self.current_player_id: Optional[str] = None
-        self.timer_task: Optional[asyncio.Task] = None
-        self.fantasy_players: List[str] = []
+    """Асинхронная обертка над GameCore: таймеры хода и ходы ИИ
+
+    Правила (раздача, улицы, фантазия, подсчет очков) живут в GameCore,
+    Game запускает и отменяет таймеры при смене хода.
+    """
+    AI_TURN_TIME_LIMIT = 10.0  # Максимум секунд на ход ИИ
+    AI_TIME_MARGIN = 0.5       # Запас на применение хода и рассылку состояния
+    REFANTASY_BONUS = 8.0      # Ценность повторной фантазии для решателя ИИ
+    TURN_TIME = 30.0           # Секунд на ход без расхода банка времени
+
+    def __init__(self, ai_agent: Optional[MCCFRAgent] = None,
+                 timers: Optional[TimerWheel] = None,
+                 decisions: Optional[DecisionPool] = None):
+        self.core = GameCore()
+        # Реестр столов передает одного агента и один пул решений всем
+        # играм процесса
+        self.ai_agent = ai_agent or MCCFRAgent(player_id="ai_player")
+        self.decisions = decisions or DecisionPool(workers=1)
+        self.fantasy_solver = FantasySolver(refantasy_bonus=self.REFANTASY_BONUS)
+        self.auto_placer = AutoPlacer(fantasy_solver=self.fantasy_solver)
+        # Таймеры хода всех столов процесса обслуживает одно колесо
+        self.timers = timers
+        self.turn_timer: Optional[TimerHandle] = None
+        self._turn_serial = 0
+        self._timeout_task: Optional[asyncio.Task] = None
+        # Корутина после изменений вне запросов игроков (таймаут хода)
+        self.on_update: Optional[Callable[[], Awaitable[None]]] = None
+        # Корутина под блокировкой перед обработкой таймаута: загрузка
+        # состояния, измененного другим процессом (общее хранилище столов)
+        self.on_sync: Optional[Callable[[], Awaitable[None]]] = None
+        # Состояние для клиентов по ролям (_FULL, игрок, None - наблюдатель)
+        # и его JSON; сбрасываются при смене версии
+        self._views: Dict = {}
+        self._views_json: Dict = {}
+        self._views_version = -1
+        # Блокировка стола: действия игроков и таймаут хода не перемежаются
+        self.lock = asyncio.Lock()
+
+    # Состояние хранится в ядре
+    deck = _core_attribute('deck', writable=False)
+    player_manager = _core_attribute('player_manager', writable=False)
+    state = _core_attribute('state')
+    current_street = _core_attribute('current_street')
+    current_player_id = _core_attribute('current_player_id')
+    fantasy_players = _core_attribute('fantasy_players')
+
+    @property
+    def version(self) -> int:
+        return self.core.version
+
+    def mark_changed(self) -> None:
+        """Отметка изменения игроков или рук в обход методов игры"""
+        self.core.mark_changed()
+
+    def replace_core(self, core: GameCore) -> None:
+        """Замена ядра (восстановление из журнала, состояние другого процесса)
+
+        Журнал стола переходит к новому ядру; таймер хода, который больше
+        не относится к текущему ходу, отменяется без списания банка времени,
+        а уже сработавший таймаут этого хода отбрасывается (номер хода).
+        """
+        core.journal = self.core.journal
+        turn = (self.state, self.current_street, self.current_player_id)
+        self.core = core
+        self._views_version = -1
+        if turn != (core.state, core.current_street, core.current_player_id):
+            self._turn_serial += 1
+            if self.turn_timer:
+                self.turn_timer.cancel()
+                self.turn_timer = None
 
     async def start_game(self) -> None:
         """Начало новой игры"""
-        if len(self.player_manager.players) < 2:
-            raise ValueError("Недостаточно игроков для начала игры")
-
-        self.deck.reset()
-        self.player_manager.reset_all()
-        self.state = GameState.DEALING
-        self.current_street = 1
-        
-        # Раздача начальных карт
-        for player in self.player_manager.players.values():
-            initial_cards = self.deck.draw(5)
-            player.add_cards(initial_cards)
-
-        self.current_player_id = next(iter(self.player_manager.players))
+        self.core.start_game()
         await self.start_turn_timer()
 
     async def start_turn_timer(self) -> None:
-        """Запуск таймера хода"""
-        if self.timer_task:
-            self.timer_task.cancel()
+        """Запуск таймера хода: ход + банк времени текущего игрока; улица
+        отключившегося игрока расставляется сразу, и ход переходит дальше"""
+        self.stop_turn_timer()
 
         player = self.player_manager.get_player(self.current_player_id)
-        if player:
-            self.timer_task = asyncio.create_task(self.handle_turn_timeout(player))
-
-    async def handle_turn_timeout(self, player: Player) -> None:
+        if player and self.state in IN_PROGRESS:
+            if player.id in self.core.away and self.auto_place(player):
+                await self.next_turn()
+                return
+            timers = self.timers if self.timers is not None else TimerWheel.for_loop()
+            self._turn_serial += 1
+            self.turn_timer = timers.schedule(self.TURN_TIME + player.time_bank,
+                                              self._on_turn_timeout, player, self._turn_serial)
+
+    def stop_turn_timer(self) -> None:
+        """Остановка таймера со списанием из банка времени сверх TURN_TIME"""
+        timer, self.turn_timer = self.turn_timer, None
+        if timer is None:
+            return
+        timer.cancel()
+        player = timer.args[0]
+        overtime = timer.elapsed() - self.TURN_TIME
+        if overtime > 0:
+            self.core.set_time_bank(player.id, max(round(player.time_bank - overtime, 1), 0))
+
+    def pause_turn_timer(self) -> None:
+        """Пауза хода: отсчет и расход банка времени останавливаются"""
+        if self.turn_timer:
+            self.turn_timer.pause()
+
+    def resume_turn_timer(self) -> None:
+        if self.turn_timer:
+            self.turn_timer.resume()
+
+    def _on_turn_timeout(self, player: Player, serial: int) -> None:
+        """Срабатывание таймера в колесе: обработка в задаче под блокировкой стола"""
+        self._timeout_task = asyncio.get_running_loop().create_task(
+            self.handle_turn_timeout(player, serial))
+
+    async def handle_turn_timeout(self, player: Player, serial: int) -> None:
         """Обработка таймаута хода"""
-        try:
-            await asyncio.sleep(player.time_bank)
+        async with self.lock:
+            if self.on_sync:
+                await self.on_sync()
+            # Пока таймаут ждал блокировку, ход мог смениться
+            if serial != self._turn_serial or self.current_player_id != player.id:
+                return
+            self.stop_turn_timer()
+            self.core.note('timeout', player.id)
             await self.auto_complete_turn(player)
-        except asyncio.CancelledError:
-            pass
+            if self.on_update:
+                await self.on_update()
+
+    async def handle_disconnect(self, player_id: str) -> bool:
+        """Отключение игрока: его улицы расставляются автоматически, не
+        дожидаясь таймаута, а если сейчас его ход - ход сразу переходит дальше"""
+        if not self.core.set_away(player_id, True):
+            return False
+        if self.can_player_move(player_id):
+            await self.start_turn_timer()
+        return True
 
     async def auto_complete_turn(self, player: Player) -> None:
         """Автоматическое завершение хода при таймауте"""
         if player.is_ai:
             await self.handle_ai_turn(player)
         else:
-            # Автоматическая расстановка карт
-            current_cards = player.hand.current_cards
-            for card in current_cards[:]:
-                if len(player.hand.bottom) < 5:
-                    player.hand.place_card(card, 'bottom', len(player.hand.bottom))
-                elif len(player.hand.middle) < 5:
-                    player.hand.place_card(card, 'middle', len(player.hand.middle))
-                elif len(player.hand.top) < 3:
-                    player.hand.place_card(card, 'top', len(player.hand.top))
+            self.auto_place(player)
 
         await self.next_turn()
 
+    def auto_place(self, player: Player) -> bool:
+        """Быстрая расстановка оставшихся карт улицы (таймаут, отключение)"""
+        if self.is_street_completed(player):
+            return False
+
+        actions = self.auto_placer.place_street(self.get_state_info(player.id))
+        for action in actions:
+            placed = self.core.place(player.id, action['card'], action['position'],
+                                     action['index'])
+            if not placed:
+                logger.warning("Не удалось автоматически расставить карты игрока %s",
+                               player.id)
+                return False
+        return True
+
     async def handle_ai_turn(self, player: Player) -> None:
         """Обработка хода ИИ"""
         if not player.is_ai:
             return
 
-        # Получаем решение от ИИ
-        game_state = self.get_game_state_for_ai()
-        action = self.ai_agent.get_action(game_state)
-        
-        # Применяем решение ИИ
-        await self.apply_ai_action(player, action)
+        if player.id in self.fantasy_players and len(player.hand.current_cards) >= 13:
+            await self.handle_ai_fantasy_turn(player)
+            return
 
-    async def apply_ai_action(self, player: Player, action: Dict) -> None:
+        # Ход ИИ ограничен банком времени игрока
+        think_time = min(self.TURN_TIME + player.time_bank,
+                         self.AI_TURN_TIME_LIMIT) - self.AI_TIME_MARGIN
+        turn_deadline = time.monotonic() + max(think_time, 0.0)
+
+        while not self.is_street_completed(player):
+            state = self.get_state_info(player.id)
+            cards_to_place = len(player.hand.current_cards) - (0 if self.current_street == 1 else 1)
+
+            # Оставшееся время делится поровну между картами улицы
+            now = time.monotonic()
+            deadline = now + max(turn_deadline - now, 0.0) / max(cards_to_place, 1)
+
+            # Агент думает в пуле, цикл столов в это время свободен
+            action = await self.decisions.decide(self.ai_agent, state, deadline)
+            if action is None:
+                # Не успел к дедлайну: остаток улицы - быстрой эвристикой
+                self.auto_place(player)
+                break
+            if not action or not await self.apply_ai_action(player, action):
+                logger.warning("ИИ не смог выполнить ход игрока %s", player.id)
+                break
+
+    async def handle_ai_fantasy_turn(self, player: Player) -> None:
+        """Расстановка всех карт фантазии ИИ за один ход"""
+        solution = await self.decisions.run(self.fantasy_solver.solve,
+                                            list(player.hand.current_cards))
+        logger.info("Фантазия игрока %s: роялти %d за %.3f с", player.id,
+                    solution.royalties, solution.elapsed)
+
+        for action in solution.to_actions():
+            if not await self.apply_ai_action(player, action):
+                logger.warning("ИИ не смог расставить фантазию игрока %s", player.id)
+                break
+
+    def cancel_ai_turn(self) -> None:
+        """Отмена хода ИИ, ожидающего решения пула (стол закрывается)"""
+        if self._timeout_task and not self._timeout_task.done():
+            self._timeout_task.cancel()
+
+    async def apply_ai_action(self, player: Player, action: Dict) -> bool:
         """Применение действия ИИ"""
-        # Реализация применения действия ИИ
-        pass
+        if action.get('type') != 'place_card':
+            return False
+        return self.core.place(player.id, action['card'], action['position'],
+                               action['index'])
+
+    def get_state_info(self, player_id: str) -> GameStateInfo:
+        """Информационное состояние игры с точки зрения игрока"""
+        return self.core.get_state_info(player_id)
 
     def get_game_state_for_ai(self) -> Dict:
         """Получение состояния игры для ИИ"""
@@ -111,153 +266,118 @@ class Game:
 
     async def next_turn(self) -> None:
         """Переход к следующему ходу"""
-        if self.timer_task:
-            self.timer_task.cancel()
-
-        # Определяем следующего игрока
-        player_ids = list(self.player_manager.players.keys())
-        current_index = player_ids.index(self.current_player_id)
-        next_index = (current_index + 1) % len(player_ids)
-        self.current_player_id = player_ids[next_index]
-
-        # Проверяем, нужно ли переходить к следующей улице
-        all_players_completed = all(
-            self.is_street_completed(player) 
-            for player in self.player_manager.players.values()
-        )
-
-        if all_players_completed:
-            await self.next_street()
-        else:
-            await self.start_turn_timer()
+        self.core.next_turn()
+        await self._on_transition()
 
     def is_street_completed(self, player: Player) -> bool:
         """Проверка завершения текущей улицы игроком"""
-        if self.current_street == 1:
-            return len(player.hand.current_cards) == 0
-        else:
-            return len(player.hand.current_cards) == 1  # Одна карта должна быть сброшена
+        return self.core.is_street_completed(player)
 
     async def next_street(self) -> None:
         """Переход к следующей улице"""
-        self.current_street += 1
-        
-        if self.current_street > 5:
-            await self.check_fantasy()
-        else:
-            # Раздача карт для следующей улицы
-            for player in self.player_manager.players.values():
-                if not player.is_ready:
-                    continue
-                new_cards = self.deck.draw(3)
-                player.add_cards(new_cards)
-
-            self.current_player_id = next(iter(self.player_manager.players))
-            await self.start_turn_timer()
+        self.core.next_street()
+        await self._on_transition()
 
-    async def check_fantasy(self) -> None:
+    async def check_fantasy(self) -> bool:
         """Проверка на возможность фантазии"""
-        self.fantasy_players = []
-        
-        for player_id, player in self.player_manager.players.items():
-            if ScoreCalculator.is_fantasy_qualified(player.hand):
-                self.fantasy_players.append(player_id)
-
-        if self.fantasy_players:
-            self.state = GameState.FANTASY
+        if self.core.check_fantasy():
             await self.start_fantasy()
-        else:
-            await self.end_game()
+            return True
+        await self.end_game()
+        return False
 
     async def start_fantasy(self) -> None:
         """Начало фазы фантазии"""
-        # Раздача карт для фантазии
-        for player_id in self.fantasy_players:
-            player = self.player_manager.get_player(player_id)
-            if player:
-                player.reset()
-                fantasy_cards = self.deck.draw(14)
-                player.add_cards(fantasy_cards)
-                player.fantasy_count += 1
-
-        # Остальные игроки получают обычную раздачу
-        non_fantasy_players = set(self.player_manager.players.keys()) - set(self.fantasy_players)
-        for player_id in non_fantasy_players:
-            player = self.player_manager.get_player(player_id)
-            if player:
-                player.reset()
-                initial_cards = self.deck.draw(5)
-                player.add_cards(initial_cards)
-
-        self.current_street = 1
-        self.current_player_id = next(iter(non_fantasy_players), next(iter(self.fantasy_players)))
+        self.core.start_hand()
         await self.start_turn_timer()
 
     async def end_game(self) -> None:
         """Завершение игры и подсчет очков"""
         self.state = GameState.SCORING
-        
-        # Подсчет очков для каждой пары игроков
-        player_ids = list(self.player_manager.players.keys())
-        for i in range(len(player_ids)):
-            for j in range(i + 1, len(player_ids)):
-                player1 = self.player_manager.get_player(player_ids[i])
-                player2 = self.player_manager.get_player(player_ids[j])
-                
-                if player1 and player2:
-                    score = ScoreCalculator.calculate_hand_score(
-                        player1.hand, player2.hand
-                    )
-                    player1.score += score
-                    player2.score -= score
-
+        self.core.settle()
         self.state = GameState.FINISHED
+        await self._on_transition()
+
+    async def _on_transition(self) -> None:
+        """После смены хода: раздача фантазии, если раздача закончилась
+        с квалификацией, и перезапуск таймера"""
+        if self.state == GameState.FINISHED and self.fantasy_players:
+            self.core.start_hand()
+        await self.start_turn_timer()
 
     def get_game_state(self) -> Dict:
-        """Получение полного состояния игры"""
-        return {
-            'state': self.state,
-            'current_street': self.current_street,
-            'current_player': self.current_player_id,
-            'fantasy_players': self.fantasy_players,
-            'players': {
-                player_id: player.to_dict()
-                for player_id, player in self.player_manager.players.items()
-            }
-        }
+        """Полное состояние игры (все карты всех игроков)
+
+        Между изменениями возвращается один и тот же закэшированный
+        словарь - его нельзя изменять.
+        """
+        return self._view(_FULL)
+
+    def get_game_state_json(self) -> str:
+        """Полное состояние игры, сериализованное в JSON один раз на версию"""
+        return self._view_json(_FULL)
+
+    def get_view(self, viewer_id: Optional[str] = None) -> Dict:
+        """Состояние, видимое участнику стола
+
+        Игрок видит карты своей руки, карты в руке (current) остальных
+        скрыты, остается их число (hidden). Наблюдатель (None или не
+        игрок стола) не видит ничьей руки. Проекция строится один раз на
+        версию и роль и общая для всех зрителей этой роли.
+        """
+        return self._view(self._role(viewer_id))
+
+    def get_view_json(self, viewer_id: Optional[str] = None) -> str:
+        return self._view_json(self._role(viewer_id))
+
+    def _role(self, viewer_id: Optional[str]) -> Optional[str]:
+        return viewer_id if viewer_id in self.player_manager.players else None
+
+    def _view(self, role) -> Dict:
+        if self._views_version != self.version:
+            self._views, self._views_json = {}, {}
+            self._views_version = self.version
+
+        view = self._views.get(role)
+        if view is None:
+            if role is _FULL:
+                view = {
+                    'version': self.version,
+                    'state': self.state,
+                    'current_street': self.current_street,
+                    'current_player': self.current_player_id,
+                    'fantasy_players': list(self.fantasy_players),
+                    'players': {
+                        player_id: player.to_dict()
+                        for player_id, player in self.player_manager.players.items()
+                    }
+                }
+            else:
+                state = self._view(_FULL)
+                view = dict(state, players={
+                    player_id: player if player_id == role else _hide_hand(player)
+                    for player_id, player in state['players'].items()
+                })
+            self._views[role] = view
+        return view
+
+    def _view_json(self, role) -> str:
+        view = self._view(role)
+        if role not in self._views_json:
+            self._views_json[role] = json.dumps(view)
+        return self._views_json[role]
 
     def can_player_move(self, player_id: str) -> bool:
         """Проверка возможности хода игрока"""
-        return (
-            self.state in [GameState.PLAYING, GameState.FANTASY] and
-            self.current_player_id == player_id
-        )
+        return self.core.can_player_move(player_id)
 
     async def handle_player_action(self, player_id: str, action: Dict) -> bool:
-        """Обработка действия игрока"""
-        if not self.can_player_move(player_id):
-            return False
-
-        player = self.player_manager.get_player(player_id)
-        if not player:
-            return False
-
-        action_type = action.get('type')
-        if action_type == 'place_card':
-            success = player.place_card(
-                action['card'],
-                action['position'],
-                action['index']
-            )
-        elif action_type == 'remove_card':
-            success = bool(player.remove_card(
-                action['position'],
-                action['index']
-            ))
+        """Обработка действия игрока (submit_street - вся улица сразу)"""
+        turn = (self.current_player_id, self.current_street, self.state)
+        if action.get('type') == 'submit_street':
+            success = self.core.submit_street(player_id, action.get('placements'))
         else:
-            return False
-
-        if success and self.is_street_completed(player):
-            await self.next_turn()
-
+            success = self.core.apply_action(player_id, action)
+        if success and turn != (self.current_player_id, self.current_street, self.state):
+            await self._on_transition()
         return success
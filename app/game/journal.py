@@ -0,0 +1,537 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote, unquote
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from .core import GameCore, LINES
+from .deck import Card, CARD_IDS, CARD_KEYS
+from .player import Player
+
+logger = logging.getLogger(__name__)
+
+# Кадр журнала: длина тела, crc32 тела, тело (код события и поля)
+_FRAME = struct.Struct('<II')
+_STRING = struct.Struct('<H')
+_INDEX = struct.Struct('<h')
+_FLOAT = struct.Struct('<d')
+_SCORE = struct.Struct('<i')
+_NO_CARD = 255
+
+class _Writer:
+    def __init__(self, code: int):
+        self.data = bytearray([code])
+
+    def byte(self, value: int) -> None:
+        self.data.append(value)
+
+    def string(self, value: str) -> None:
+        encoded = value.encode()
+        self.data += _STRING.pack(len(encoded)) + encoded
+
+    def strings(self, values: List[str]) -> None:
+        self.byte(len(values))
+        for value in values:
+            self.string(value)
+
+    def card(self, card) -> None:
+        if card is None:
+            self.byte(_NO_CARD)
+        elif isinstance(card, Card):
+            self.byte(CARD_IDS[(card.rank, card.suit)])
+        else:
+            self.byte(CARD_IDS[(card['rank'], card['suit'])])
+
+    def line(self, position: str) -> None:
+        self.byte(LINES.index(position))
+
+    def pack(self, fmt: struct.Struct, value) -> None:
+        self.data += fmt.pack(value)
+
+class _Reader:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pos = 1
+
+    def byte(self) -> int:
+        self.pos += 1
+        return self.data[self.pos - 1]
+
+    def string(self) -> str:
+        size = self.unpack(_STRING)
+        self.pos += size
+        return self.data[self.pos - size:self.pos].decode()
+
+    def strings(self) -> List[str]:
+        return [self.string() for _ in range(self.byte())]
+
+    def card(self) -> Optional[Dict]:
+        card_id = self.byte()
+        if card_id == _NO_CARD:
+            return None
+        rank, suit = CARD_KEYS[card_id]
+        return {'rank': rank, 'suit': suit}
+
+    def line(self) -> str:
+        return LINES[self.byte()]
+
+    def unpack(self, fmt: struct.Struct):
+        self.pos += fmt.size
+        return fmt.unpack_from(self.data, self.pos - fmt.size)[0]
+
+# Кодирование событий: аргументы вызова метода ядра <-> поля записи.
+# Поля - аргументы того же метода при воспроизведении (apply_record).
+def _encode_player(writer: _Writer, core: GameCore, args: tuple) -> None:
+    writer.string(args[0])
+
+def _decode_player(reader: _Reader) -> tuple:
+    return reader.string(),
+
+def _encode_join(writer: _Writer, core: GameCore, args: tuple) -> None:
+    player = args[0]
+    writer.string(player.id)
+    writer.string(player.name)
+    writer.byte(int(player.is_ai))
+
+def _decode_join(reader: _Reader) -> tuple:
+    return reader.string(), reader.string(), bool(reader.byte())
+
+def _encode_time_bank(writer: _Writer, core: GameCore, args: tuple) -> None:
+    writer.string(args[0])
+    writer.pack(_FLOAT, args[1])
+
+def _decode_time_bank(reader: _Reader) -> tuple:
+    return reader.string(), reader.unpack(_FLOAT)
+
+def _encode_away(writer: _Writer, core: GameCore, args: tuple) -> None:
+    writer.string(args[0])
+    writer.byte(int(args[1]))
+
+def _decode_away(reader: _Reader) -> tuple:
+    return reader.string(), bool(reader.byte())
+
+def _encode_deal(writer: _Writer, core: GameCore, args: tuple) -> None:
+    # Порядок всей колоды вместо seed: воспроизведение не зависит от
+    # генератора случайных чисел и версии Python
+    writer.strings(core.fantasy_players)
+    writer.byte(len(core.deal_order))
+    for card in core.deal_order:
+        writer.card(card)
+
+def _decode_deal(reader: _Reader) -> tuple:
+    fantasy_players = reader.strings()
+    return fantasy_players, [reader.card() for _ in range(reader.byte())]
+
+def _encode_action(writer: _Writer, core: GameCore, args: tuple) -> None:
+    player_id, action = args
+    writer.string(player_id)
+    remove = action['type'] == 'remove_card'
+    writer.byte(int(remove))
+    writer.card(None if remove else action['card'])
+    writer.line(action['position'])
+    writer.pack(_INDEX, action['index'])
+
+def _decode_action(reader: _Reader) -> tuple:
+    player_id = reader.string()
+    remove, card, position, index = reader.byte(), reader.card(), reader.line(), \
+        reader.unpack(_INDEX)
+    if remove:
+        return player_id, {'type': 'remove_card', 'position': position, 'index': index}
+    return player_id, {'type': 'place_card', 'card': card, 'position': position,
+                       'index': index}
+
+def _encode_place(writer: _Writer, core: GameCore, args: tuple) -> None:
+    player_id, card, position, index = args
+    writer.string(player_id)
+    writer.card(card)
+    writer.line(position)
+    writer.pack(_INDEX, index)
+
+def _decode_place(reader: _Reader) -> tuple:
+    return reader.string(), reader.card(), reader.line(), reader.unpack(_INDEX)
+
+def _encode_street(writer: _Writer, core: GameCore, args: tuple) -> None:
+    player_id, placements = args
+    writer.string(player_id)
+    writer.byte(len(placements))
+    for placement in placements:
+        writer.card(placement['card'])
+        writer.line(placement['position'])
+        writer.pack(_INDEX, placement['index'])
+
+def _decode_street(reader: _Reader) -> tuple:
+    player_id = reader.string()
+    return player_id, [{'card': reader.card(), 'position': reader.line(),
+                        'index': reader.unpack(_INDEX)} for _ in range(reader.byte())]
+
+def _encode_set(writer: _Writer, core: GameCore, args: tuple) -> None:
+    writer.string(args[0])
+    writer.string(json.dumps(args[1]))
+
+def _decode_set(reader: _Reader) -> tuple:
+    return reader.string(), json.loads(reader.string())
+
+def _encode_result(writer: _Writer, core: GameCore, args: tuple) -> None:
+    scores = args[0]
+    writer.byte(len(scores))
+    for player_id, score in scores.items():
+        writer.string(player_id)
+        writer.pack(_SCORE, score)
+
+def _decode_result(reader: _Reader) -> tuple:
+    return {reader.string(): reader.unpack(_SCORE) for _ in range(reader.byte())},
+
+def _encode_empty(writer: _Writer, core: GameCore, args: tuple) -> None:
+    pass
+
+def _decode_empty(reader: _Reader) -> tuple:
+    return ()
+
+# Событие: код, кодирование, декодирование
+_EVENTS: Dict[str, Tuple[int, Callable, Callable]] = {
+    'join': (1, _encode_join, _decode_join),
+    'leave': (2, _encode_player, _decode_player),
+    'ready': (3, _encode_player, _decode_player),
+    'time_bank': (4, _encode_time_bank, _decode_time_bank),
+    'deal': (5, _encode_deal, _decode_deal),
+    'action': (6, _encode_action, _decode_action),
+    'place': (7, _encode_place, _decode_place),
+    'next_turn': (8, _encode_empty, _decode_empty),
+    'next_street': (9, _encode_empty, _decode_empty),
+    'check_fantasy': (10, _encode_empty, _decode_empty),
+    'settle': (11, _encode_empty, _decode_empty),
+    'finish_hand': (12, _encode_empty, _decode_empty),
+    'set': (13, _encode_set, _decode_set),
+    'timeout': (14, _encode_player, _decode_player),
+    'result': (15, _encode_result, _decode_result),
+    'street': (16, _encode_street, _decode_street),
+    'away': (17, _encode_away, _decode_away),
+}
+_KINDS = {code: (kind, decode) for kind, (code, _, decode) in _EVENTS.items()}
+# Справочные записи: при воспроизведении пропускаются
+NOTES = ('timeout', 'result')
+# Методы ядра событий, чье имя не совпадает с методом
+_METHODS = {'leave': 'remove_player', 'ready': 'set_ready', 'time_bank': 'set_time_bank',
+            'action': 'apply_action', 'set': 'set_attribute', 'street': 'submit_street',
+            'away': 'set_away'}
+
+def encode_record(kind: str, core: GameCore, args: tuple) -> bytes:
+    """Кадр события: вызов метода ядра kind с аргументами args"""
+    code, encode, _ = _EVENTS[kind]
+    writer = _Writer(code)
+    encode(writer, core, args)
+    body = bytes(writer.data)
+    return _FRAME.pack(len(body), zlib.crc32(body)) + body
+
+def decode_records(data: bytes, start: int = 0) -> Tuple[List[Tuple[str, tuple]], int]:
+    """События кадров data с позиции start и конец последнего целого кадра
+
+    Чтение останавливается на неполном или поврежденном кадре (хвост,
+    недописанный при падении процесса).
+    """
+    records = []
+    pos = start
+    while pos + _FRAME.size <= len(data):
+        size, crc = _FRAME.unpack_from(data, pos)
+        body = data[pos + _FRAME.size:pos + _FRAME.size + size]
+        if len(body) < size or zlib.crc32(body) != crc or body[0] not in _KINDS:
+            break
+        kind, decode = _KINDS[body[0]]
+        records.append((kind, decode(_Reader(body))))
+        pos += _FRAME.size + size
+    return records, pos
+
+def apply_record(core: GameCore, kind: str, fields: tuple) -> None:
+    """Повтор события журнала на ядре"""
+    if kind in NOTES:
+        return
+    if kind == 'join':
+        player_id, name, is_ai = fields
+        core.add_player(Player(player_id, name, is_ai))
+    elif kind == 'deal':
+        core.fantasy_players = list(fields[0])
+        core.start_hand(fields[1])
+    else:
+        getattr(core, _METHODS.get(kind, kind))(*fields)
+
+def read_log(path: str) -> Iterator[Tuple[str, tuple]]:
+    """События файла журнала по порядку"""
+    with open(path, 'rb') as f:
+        records, _ = decode_records(f.read())
+    yield from records
+
+def hand_histories(path: str) -> Iterator[Dict[str, Any]]:
+    """Раздачи журнала стола для аналитики
+
+    Каждая раздача: порядок колоды, игроки с фантазией, ходы (действия
+    игроков, автоматические и ИИ-размещения, таймауты) и итог по игрокам.
+    """
+    players: Dict[str, Dict] = {}
+    hand: Optional[Dict[str, Any]] = None
+    for kind, fields in read_log(path):
+        if kind == 'join':
+            players[fields[0]] = {'name': fields[1], 'is_ai': fields[2]}
+        elif kind == 'deal':
+            hand = {'players': dict(players), 'fantasy_players': fields[0],
+                    'deck': fields[1], 'moves': []}
+        elif hand is None:
+            continue
+        elif kind in ('action', 'street', 'place', 'timeout'):
+            hand['moves'].append((kind,) + fields)
+        elif kind == 'result':
+            hand['scores'] = fields[0]
+            yield hand
+            hand = None
+
+def snapshot_core(core: GameCore) -> Dict[str, Any]:
+    """Состояние ядра для снимка журнала (карты - номерами)"""
+    def cards(items: List[Card]) -> List[int]:
+        return [CARD_IDS[(card.rank, card.suit)] for card in items]
+
+    return {
+        'version': core.version,
+        'state': core.state,
+        'current_street': core.current_street,
+        'current_player_id': core.current_player_id,
+        'fantasy_players': list(core.fantasy_players),
+        'away': list(core.away),
+        'deck': cards(core.deck.cards),
+        'players': [{
+            'id': player.id,
+            'name': player.name,
+            'is_ai': player.is_ai,
+            'score': player.score,
+            'fantasy_count': player.fantasy_count,
+            'time_bank': player.time_bank,
+            'is_ready': player.is_ready,
+            'hand': {line: cards(getattr(player.hand, line)) for line in LINES},
+            'current': cards(player.hand.current_cards),
+        } for player in core.players.values()],
+    }
+
+def restore_core(data: Dict[str, Any]) -> GameCore:
+    """Ядро из снимка snapshot_core"""
+    core = GameCore()
+    by_id = {CARD_IDS[(card.rank, card.suit)]: card for card in core.deck.all_cards}
+    for item in data['players']:
+        player = Player(item['id'], item['name'], item['is_ai'])
+        player.score = item['score']
+        player.fantasy_count = item['fantasy_count']
+        player.time_bank = item['time_bank']
+        player.is_ready = item['is_ready']
+        for line in LINES:
+            getattr(player.hand, line).extend(by_id[card] for card in item['hand'][line])
+        player.hand.current_cards.extend(by_id[card] for card in item['current'])
+        core.player_manager.add_player(player)
+
+    core.deck.cards = [by_id[card] for card in data['deck']]
+    core.state = data['state']
+    core.current_street = data['current_street']
+    core.current_player_id = data['current_player_id']
+    core.fantasy_players = list(data['fantasy_players'])
+    core.away = list(data.get('away', []))     # Снимки до отметки отключения
+    core.version = data['version']
+    return core
+
+class TableLog:
+    """Журнал одного стола: файл кадров событий и снимок состояния
+
+    Кадры пишутся в порядке вызовов ядра (в цикле столов, под блокировкой
+    игры); на диск их переносит поток Journal.
+    """
+    def __init__(self, journal: 'Journal', room_id: str):
+        self.journal = journal
+        self.room_id = room_id
+        self.path = journal.path(room_id, '.log')
+        self.snapshot_path = journal.path(room_id, '.snap')
+        self.fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self.offset = os.fstat(self.fd).st_size   # Конец журнала с неподтвержденными кадрами
+        self.since_snapshot = 0
+        self.archive = False
+
+    def record(self, kind: str, core: GameCore, args: tuple) -> None:
+        frame = encode_record(kind, core, args)
+        self.offset += len(frame)
+        self.since_snapshot += 1
+        self.journal._submit(self, frame=frame)
+
+    @property
+    def snapshot_due(self) -> bool:
+        return self.since_snapshot >= self.journal.snapshot_every
+
+    def snapshot(self, core: GameCore) -> None:
+        """Снимок ядра: воспроизведение начнется с текущего конца журнала"""
+        data = json.dumps({'offset': self.offset, 'core': snapshot_core(core)})
+        self.since_snapshot = 0
+        self.journal._submit(self, snapshot=data.encode())
+
+    def close(self, archive: bool = False) -> None:
+        """Закрытие после записи ожидающих кадров; archive - перенос файлов
+        в history/ (стол удален и не восстанавливается)"""
+        self.archive = archive
+        self.journal._submit(self, close=True)
+
+class Journal:
+    """Журналы событий столов в каталоге и их восстановление
+
+    Каждый стол пишет в свой файл <комната>.log кадры длиной и crc32:
+    раздачи (порядок колоды), действия и размещения карт, переходы хода,
+    таймауты и итоги раздач. Один поток переносит кадры на диск группами:
+    все кадры, накопленные за время предыдущего fsync, записываются одним
+    write и одним fsync на файл (group commit). wait() дожидается записи
+    всего, что было передано до вызова.
+
+    Снимок <комната>.snap (раз в snapshot_every событий) ограничивает
+    воспроизведение при восстановлении хвостом журнала после снимка.
+    """
+    HISTORY_DIR = 'history'
+
+    def __init__(self, directory: str, snapshot_every: int = 500):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        os.makedirs(os.path.join(directory, self.HISTORY_DIR), exist_ok=True)
+        self.commits = 0                  # Групп, записанных на диск
+        self._cond = threading.Condition()
+        self._frames: Dict[TableLog, List[bytes]] = {}
+        self._snapshots: Dict[TableLog, bytes] = {}
+        self._closing: List[TableLog] = []
+        self._submitted = 0
+        self._durable = 0
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    def path(self, room_id: str, suffix: str) -> str:
+        return os.path.join(self.directory, quote(room_id, safe='') + suffix)
+
+    def open(self, room_id: str) -> TableLog:
+        return TableLog(self, room_id)
+
+    def _submit(self, log: TableLog, frame: Optional[bytes] = None,
+                snapshot: Optional[bytes] = None, close: bool = False) -> None:
+        with self._cond:
+            if frame is not None:
+                self._frames.setdefault(log, []).append(frame)
+            if snapshot is not None:
+                self._snapshots[log] = snapshot
+            if close:
+                self._closing.append(log)
+            self._submitted += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='journal', daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Ожидание записи на диск всего переданного до вызова"""
+        with self._cond:
+            target = self._submitted
+            return self._cond.wait_for(lambda: self._durable >= target, timeout)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._submitted > self._durable or self._stopped)
+                if self._submitted == self._durable:
+                    return
+                frames, self._frames = self._frames, {}
+                snapshots, self._snapshots = self._snapshots, {}
+                closing, self._closing = self._closing, []
+                target = self._submitted
+
+            try:
+                self._commit(frames, snapshots, closing)
+            except Exception:
+                logger.exception("Ошибка записи журнала столов")
+            with self._cond:
+                self._durable = target
+                self.commits += 1
+                self._cond.notify_all()
+
+    def _commit(self, frames: Dict[TableLog, List[bytes]], snapshots: Dict[TableLog, bytes],
+                closing: List[TableLog]) -> None:
+        # Снимок пишется после кадров, которые он покрывает
+        for log, chunks in frames.items():
+            data = memoryview(b''.join(chunks))
+            while data:
+                data = data[os.write(log.fd, data):]
+            os.fsync(log.fd)
+        for log, data in snapshots.items():
+            temporary = log.snapshot_path + '.tmp'
+            with open(temporary, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, log.snapshot_path)
+        for log in closing:
+            os.close(log.fd)
+            if log.archive:
+                self._archive(log)
+
+    def _archive(self, log: TableLog) -> None:
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        target = os.path.join(self.directory, self.HISTORY_DIR,
+                              f"{quote(log.room_id, safe='')}@{stamp}.log")
+        os.replace(log.path, target)
+        if os.path.exists(log.snapshot_path):
+            os.remove(log.snapshot_path)
+
+    def recover(self) -> Dict[str, GameCore]:
+        """Ядра всех столов каталога: снимок и события журнала после него"""
+        cores = {}
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith('.log'):
+                room_id = unquote(name[:-len('.log')])
+                cores[room_id] = self._recover_table(room_id)
+        return cores
+
+    def _recover_table(self, room_id: str) -> GameCore:
+        started = time.perf_counter()
+        with open(self.path(room_id, '.log'), 'rb') as f:
+            data = f.read()
+
+        core, start = GameCore(), 0
+        try:
+            with open(self.path(room_id, '.snap'), 'rb') as f:
+                snapshot = json.loads(f.read())
+            if snapshot['offset'] <= len(data):
+                core, start = restore_core(snapshot['core']), snapshot['offset']
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError):
+            logger.warning("Поврежден снимок стола %s, журнал воспроизводится с начала",
+                           room_id)
+
+        records, end = decode_records(data, start)
+        for kind, fields in records:
+            apply_record(core, kind, fields)
+        if end < len(data):
+            logger.warning("Журнал стола %s: отброшено %d байт недописанного хвоста",
+                           room_id, len(data) - end)
+            os.truncate(self.path(room_id, '.log'), end)
+        logger.info("Восстановлен стол %s: %d событий за %.1f мс", room_id, len(records),
+                    (time.perf_counter() - started) * 1000)
+        return core
+
+    def histories(self) -> Iterator[Dict[str, Any]]:
+        """Раздачи всех журналов каталога, включая удаленные столы (history/)"""
+        history = os.path.join(self.directory, self.HISTORY_DIR)
+        paths = [os.path.join(history, name) for name in sorted(os.listdir(history))] + \
+            [os.path.join(self.directory, name) for name in sorted(os.listdir(self.directory))]
+        for path in paths:
+            if path.endswith('.log'):
+                for hand in hand_histories(path):
+                    name = os.path.basename(path)[:-len('.log')]
+                    hand['room_id'] = unquote(name.split('@')[0])
+                    yield hand
+
+    def close(self) -> None:
+        """Запись ожидающих кадров и остановка потока"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
@@ -0,0 +1,589 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from dataclasses import dataclass, field
+import asyncio
+import logging
+import threading
+import time
+import uuid
+import zlib
+from .game import Game
+from .core import IN_PROGRESS
+from .player import Player
+from .delta import StateStream
+from .journal import Journal, restore_core, snapshot_core
+from .store import RedisStore
+from ..ai.decisions import DecisionPool
+
+logger = logging.getLogger(__name__)
+
+class LoopThread:
+    """Event loop в отдельном потоке для асинхронных методов столов
+
+    Обработчики Flask синхронны, а Game - асинхронный: корутины всех
+    столов (ходы, таймеры, ходы ИИ) выполняются в одном цикле этого потока.
+    """
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread: Optional[threading.Thread] = None
+        self._attached = False
+        self._lock = threading.Lock()
+
+    def attach(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Работа в уже запущенном цикле (ASGI-сервер) вместо своего потока"""
+        with self._lock:
+            if self._thread is not None:
+                raise RuntimeError("Цикл столов уже запущен в своем потоке")
+            if not self._attached:
+                self.loop.close()
+            self.loop = loop
+            self._attached = True
+
+    @property
+    def in_loop(self) -> bool:
+        """Вызов из корутины цикла столов"""
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None and not self._attached:
+                self._thread = threading.Thread(target=self.loop.run_forever,
+                                                name='game-tables', daemon=True)
+                self._thread.start()
+
+    def run(self, coroutine, timeout: Optional[float] = None) -> Any:
+        """Выполнение корутины в цикле и ожидание результата (из других
+        потоков; корутины цикла используют await)"""
+        if self.in_loop:
+            coroutine.close()
+            raise RuntimeError("Блокирующий вызов из цикла столов")
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+    def call_soon(self, callback: Callable, *args) -> None:
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None or self._attached
+
+    def stop(self) -> None:
+        """Отмена оставшихся задач и остановка цикла (повторный запуск невозможен);
+        чужой цикл останавливает его сервер"""
+        if self._attached:
+            return
+        if self.is_running:
+            self.run(self._cancel_tasks())
+        with self._lock:
+            if self._thread is not None:
+                self.loop.call_soon_threadsafe(self.loop.stop)
+                self._thread.join()
+                self._thread = None
+        self.loop.close()
+
+    @staticmethod
+    async def _cancel_tasks() -> None:
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+@dataclass
+class Table:
+    """Стол: игра комнаты, потоки дельт ее состояния по ролям зрителей
+    (игрок или None - наблюдатель) и время последнего действия игроков"""
+    room_id: str
+    game: Game
+    max_players: int
+    streams: Dict[Optional[str], StateStream] = field(default_factory=dict)
+    # Версия записи стола в общем хранилище и версия ядра, записанная в нем
+    stored_version: int = 0
+    saved_version: int = 0
+    created_at: float = field(default_factory=time.monotonic)
+    last_active: float = field(default_factory=time.monotonic)
+
+    def touch(self) -> None:
+        self.last_active = time.monotonic()
+
+    def publish(self) -> Dict[Optional[str], Dict]:
+        """Дельты всех ролей с прошлой публикации (под блокировкой игры)"""
+        roles = [None] + list(self.game.player_manager.players)
+        for role in list(self.streams):
+            if role not in roles:
+                del self.streams[role]
+
+        messages = {}
+        for role in roles:
+            stream = self.streams.setdefault(role, StateStream())
+            message = stream.publish(self.game.get_view(role))
+            if message:
+                messages[role] = message
+        return messages
+
+    def role(self, viewer_id: Optional[str]) -> Optional[str]:
+        return viewer_id if viewer_id in self.game.player_manager.players else None
+
+    @property
+    def player_count(self) -> int:
+        return len(self.game.player_manager.players)
+
+    @property
+    def is_full(self) -> bool:
+        return self.player_count >= self.max_players
+
+    def to_dict(self) -> Dict:
+        return {
+            'room_id': self.room_id,
+            'players': self.player_count,
+            'max_players': self.max_players,
+            'state': self.game.state
+        }
+
+class _Shard:
+    """Часть столов со своей блокировкой словаря"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tables: Dict[str, Table] = {}
+
+class GameRegistry:
+    """Столы процесса по идентификатору комнаты
+
+    Столы разбиты на шарды по crc32 идентификатора комнаты: создание,
+    поиск и удаление блокируют только свой шард. Действия со столом
+    выполняются через call под блокировкой игры (Game.lock), той же, что
+    берет таймаут хода, поэтому действия игроков, ИИ и таймеров одного
+    стола не перемежаются, а разные столы не ждут друг друга.
+
+    Все столы используют одного агента ИИ: модель загружается один раз
+    на процесс, при создании первого стола.
+
+    С журналом (journal) каждый стол пишет события в свой файл, call
+    возвращает результат после записи событий на диск, а recover после
+    перезапуска процесса восстанавливает столы из журналов.
+
+    С общим хранилищем (store) столы видны всем процессам: call
+    подгружает состояние, измененное другим процессом, и записывает
+    свое условно по версии; при конфликте действие повторяется на
+    свежем состоянии. Обращения к хранилищу из цикла столов идут в
+    потоках (asyncio.to_thread), чтобы ответ Redis не останавливал
+    остальные столы.
+    """
+    DEFAULT_ROOM = 'main'
+    STORE_RETRIES = 3
+
+    def __init__(self, max_tables: int = 500, max_players: int = 4,
+                 idle_timeout: float = 1800.0, empty_timeout: float = 120.0,
+                 call_timeout: float = 30.0, shard_count: int = 16,
+                 game_factory: Optional[Callable[[], Game]] = None,
+                 journal: Optional[Journal] = None,
+                 store: Optional[RedisStore] = None,
+                 ai_workers: int = 2):
+        self.max_tables = max_tables
+        self.max_players = max_players
+        self.idle_timeout = idle_timeout      # Стол без действий игроков
+        self.empty_timeout = empty_timeout    # Стол без игроков
+        self.call_timeout = call_timeout
+        self.game_factory = game_factory or self._default_game
+        self.journal = journal
+        self.store = store
+        self.runner = LoopThread()
+        self._shards = [_Shard() for _ in range(shard_count)]
+        self._count_lock = threading.Lock()
+        self._count = 0
+        self._player_rooms: Dict[str, str] = {}
+        self._ai_agent = None
+        # Решения ИИ всех столов считаются в общем пуле, вне цикла столов
+        self.decisions = DecisionPool(workers=ai_workers)
+        self._agent_lock = threading.Lock()
+        self._gc_task: Optional[asyncio.Task] = None
+        # Получатель дельт, возникших вне запросов (таймаут хода):
+        # (комната, дельты по ролям)
+        self.on_publish: Optional[Callable[[str, Dict[Optional[str], Dict]], None]] = None
+
+    def _default_game(self) -> Game:
+        with self._agent_lock:
+            if self._ai_agent is None:
+                from ..ai.mccfr import MCCFRAgent
+                self._ai_agent = MCCFRAgent(player_id="ai_player")
+        return Game(ai_agent=self._ai_agent, decisions=self.decisions)
+
+    def _shard(self, room_id: str) -> _Shard:
+        return self._shards[zlib.crc32(room_id.encode()) % len(self._shards)]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, room_id: str) -> bool:
+        return self.get(room_id) is not None
+
+    def __iter__(self) -> Iterator[Table]:
+        for shard in self._shards:
+            with shard.lock:
+                tables = list(shard.tables.values())
+            yield from tables
+
+    async def _offload(self, function: Callable, *args) -> Any:
+        """Синхронный метод реестра из корутины: с общим хранилищем - в
+        потоке, не блокируя цикл столов"""
+        if self.store is None:
+            return function(*args)
+        return await asyncio.to_thread(function, *args)
+
+    def get(self, room_id: str) -> Optional[Table]:
+        """Стол комнаты; стол другого процесса из общего хранилища
+        появляется в этом процессе при первом обращении"""
+        shard = self._shard(room_id)
+        with shard.lock:
+            table = shard.tables.get(room_id)
+        if table is None and self.store is not None and self.store.exists(room_id):
+            try:
+                return self.create(room_id)
+            except ValueError:
+                with shard.lock:
+                    return shard.tables.get(room_id)
+        return table
+
+    def create(self, room_id: Optional[str] = None) -> Table:
+        """Новый стол; без room_id идентификатор генерируется"""
+        room_id = room_id or uuid.uuid4().hex[:8]
+        shard = self._shard(room_id)
+        with shard.lock:
+            if room_id in shard.tables:
+                raise ValueError(f"Стол {room_id} уже существует")
+            with self._count_lock:
+                if self._count >= self.max_tables:
+                    raise ValueError("Достигнут предел числа столов")
+                self._count += 1
+            try:
+                table = Table(room_id, self.game_factory(), self.max_players)
+                table.game.on_update = lambda: self._on_game_update(table)
+                if self.journal is not None:
+                    table.game.core.journal = self.journal.open(room_id)
+                if self.store is not None:
+                    table.game.on_sync = lambda: self._load(table)
+            except Exception:
+                with self._count_lock:
+                    self._count -= 1
+                raise
+            shard.tables[room_id] = table
+        logger.info("Создан стол %s", room_id)
+        return table
+
+    async def aget(self, room_id: str) -> Optional[Table]:
+        return await self._offload(self.get, room_id)
+
+    def get_or_create(self, room_id: str) -> Table:
+        table = self.get(room_id)
+        if table:
+            return table
+        try:
+            return self.create(room_id)
+        except ValueError:
+            # Стол мог создать параллельный запрос
+            table = self.get(room_id)
+            if table is None:
+                raise
+            return table
+
+    async def aget_or_create(self, room_id: str) -> Table:
+        return await self._offload(self.get_or_create, room_id)
+
+    def table(self, room_id: str) -> Table:
+        """Существующий стол или ValueError"""
+        table = self.get(room_id)
+        if table is None:
+            raise ValueError(f"Стол {room_id} не найден")
+        return table
+
+    def room_of(self, player_id: str) -> Optional[str]:
+        """Комната, за которой сидит игрок"""
+        room_id = self._player_rooms.get(player_id)
+        if room_id is None and self.store is not None:
+            room_id = self.store.room_of(player_id)
+        return room_id
+
+    async def aroom_of(self, player_id: str) -> Optional[str]:
+        return await self._offload(self.room_of, player_id)
+
+    def join(self, room_id: str, player: Player) -> Table:
+        """Посадка игрока за стол (стол создается при необходимости)"""
+        previous = self.room_of(player.id)
+        if previous is not None and previous != room_id:
+            self.leave(player.id)
+
+        table = self.get_or_create(room_id)
+        self.call(room_id, self._seat(table, player))
+        self._player_rooms[player.id] = room_id
+        return table
+
+    async def ajoin(self, room_id: str, player: Player) -> Table:
+        previous = await self.aroom_of(player.id)
+        if previous is not None and previous != room_id:
+            await self.aleave(player.id)
+
+        table = await self.aget_or_create(room_id)
+        await self.acall(room_id, self._seat(table, player))
+        self._player_rooms[player.id] = room_id
+        return table
+
+    @staticmethod
+    def _seat(table: Table, player: Player) -> Callable[[Game], None]:
+        def seat(game: Game) -> None:
+            if player.id in game.player_manager.players:
+                # Вернувшийся игрок снова ходит сам
+                game.core.set_away(player.id, False)
+                return
+            if table.is_full:
+                raise ValueError("Стол заполнен")
+            game.core.add_player(player)
+        return seat
+
+    def leave(self, player_id: str) -> Optional[Table]:
+        """Игрок покидает стол; в идущей раздаче он остается до ее конца"""
+        table = self._vacate(player_id)
+        if table is not None:
+            self.call(table.room_id, self._unseat(player_id))
+        return table
+
+    async def aleave(self, player_id: str) -> Optional[Table]:
+        table = await self._offload(self._vacate, player_id)
+        if table is not None:
+            await self.acall(table.room_id, self._unseat(player_id))
+        return table
+
+    def _vacate(self, player_id: str) -> Optional[Table]:
+        """Снятие игрока с учета комнат; стол, за которым он сидел"""
+        room_id = self.room_of(player_id)
+        self._player_rooms.pop(player_id, None)
+        if self.store is not None:
+            self.store.clear_room(player_id)
+        return self.get(room_id) if room_id else None
+
+    @staticmethod
+    def _unseat(player_id: str) -> Callable[[Game], None]:
+        def unseat(game: Game) -> None:
+            if game.state not in IN_PROGRESS:
+                game.core.remove_player(player_id)
+        return unseat
+
+    def call(self, room_id: str, action: Callable[[Game], Any]) -> Any:
+        """Действие со столом под его блокировкой в цикле столов
+
+        action получает Game; если он возвращает корутину, она дожидается.
+        """
+        table = self.table(room_id)
+        table.touch()
+        result = self.runner.run(self._locked(table, action), self.call_timeout)
+        if self.journal is not None and not self.journal.wait(self.call_timeout):
+            logger.error("Журнал стола %s не записан за %.0f с", room_id, self.call_timeout)
+        return result
+
+    async def acall(self, room_id: str, action: Callable[[Game], Any]) -> Any:
+        """call для корутин (ASGI-сервер): ожидание не блокирует цикл"""
+        table = await self._offload(self.table, room_id)
+        table.touch()
+        if self.runner.in_loop:
+            result = await asyncio.wait_for(self._locked(table, action), self.call_timeout)
+        else:
+            future = asyncio.run_coroutine_threadsafe(self._locked(table, action),
+                                                      self.runner.loop)
+            result = await asyncio.wait_for(asyncio.wrap_future(future), self.call_timeout)
+        if self.journal is not None and \
+                not await asyncio.to_thread(self.journal.wait, self.call_timeout):
+            logger.error("Журнал стола %s не записан за %.0f с", room_id, self.call_timeout)
+        return result
+
+    async def _locked(self, table: Table, action: Callable[[Game], Any]) -> Any:
+        async with table.game.lock:
+            for _ in range(self.STORE_RETRIES):
+                await self._load(table)
+                result = action(table.game)
+                if asyncio.iscoroutine(result):
+                    result = await result
+                if await self._save(table):
+                    break
+                logger.info("Стол %s изменен другим процессом, действие повторяется",
+                            table.room_id)
+            else:
+                raise ValueError("Стол занят, повторите действие")
+            log = table.game.core.journal
+            if log is not None and log.snapshot_due:
+                log.snapshot(table.game.core)
+            return result
+
+    async def _load(self, table: Table) -> None:
+        """Состояние стола из общего хранилища, если его изменил другой процесс"""
+        if self.store is None:
+            return
+        stored = await asyncio.to_thread(self.store.load, table.room_id, table.stored_version)
+        if stored is None:
+            return
+        table.stored_version, state = stored
+        if state is not None:
+            table.game.replace_core(restore_core(state))
+        table.saved_version = table.game.version if state is not None else -1
+
+    async def _save(self, table: Table) -> bool:
+        """Запись измененного стола в общее хранилище; False - конфликт версий"""
+        if self.store is None or table.saved_version == table.game.version:
+            return True
+        core = table.game.core
+        version = await asyncio.to_thread(self.store.save, table.room_id, table.stored_version,
+                                          snapshot_core(core), list(core.players))
+        if version is None:
+            table.stored_version = -1     # Следующая загрузка берет состояние заново
+            return False
+        table.stored_version, table.saved_version = version, core.version
+        return True
+
+    def publish(self, room_id: str) -> Dict[Optional[str], Dict]:
+        """Дельты состояния стола по ролям с прошлой публикации"""
+        table = self.table(room_id)
+        return self.call(room_id, lambda game: table.publish())
+
+    async def apublish(self, room_id: str) -> Dict[Optional[str], Dict]:
+        table = await self._offload(self.table, room_id)
+        return await self.acall(room_id, lambda game: table.publish())
+
+    def snapshot(self, room_id: str, viewer_id: Optional[str] = None
+                 ) -> Tuple[Dict[Optional[str], Dict], Dict]:
+        """Неразосланные дельты и снимок {seq, state} роли зрителя после них"""
+        return self.call(room_id, self._take_snapshot(self.table(room_id), viewer_id))
+
+    async def asnapshot(self, room_id: str, viewer_id: Optional[str] = None
+                        ) -> Tuple[Dict[Optional[str], Dict], Dict]:
+        table = await self._offload(self.table, room_id)
+        return await self.acall(room_id, self._take_snapshot(table, viewer_id))
+
+    @staticmethod
+    def _take_snapshot(table: Table, viewer_id: Optional[str]) -> Callable[[Game], Tuple]:
+        def take(game: Game) -> Tuple[Dict[Optional[str], Dict], Dict]:
+            messages = table.publish()
+            return messages, table.streams[table.role(viewer_id)].snapshot()
+        return take
+
+    def since(self, room_id: str, seq: int,
+              viewer_id: Optional[str] = None) -> Optional[List[Dict]]:
+        """Дельты роли зрителя после seq для догоняющего клиента"""
+        return self.call(room_id, self._replay(self.table(room_id), seq, viewer_id))
+
+    async def asince(self, room_id: str, seq: int,
+                     viewer_id: Optional[str] = None) -> Optional[List[Dict]]:
+        table = await self._offload(self.table, room_id)
+        return await self.acall(room_id, self._replay(table, seq, viewer_id))
+
+    @staticmethod
+    def _replay(table: Table, seq: int,
+                viewer_id: Optional[str]) -> Callable[[Game], Optional[List[Dict]]]:
+        def replay(game: Game) -> Optional[List[Dict]]:
+            stream = table.streams.get(table.role(viewer_id))
+            return stream.since(seq) if stream else None
+        return replay
+
+    async def _on_game_update(self, table: Table) -> None:
+        """Изменение стола вне запроса (в цикле столов, под блокировкой игры)"""
+        if not await self._save(table):
+            # Ход успел обработать другой процесс
+            await self._load(table)
+        messages = table.publish()
+        if messages and self.on_publish:
+            try:
+                self.on_publish(table.room_id, messages)
+            except Exception:
+                logger.exception("Ошибка рассылки состояния стола %s", table.room_id)
+
+    def recover(self) -> List[str]:
+        """Восстановление столов из журнала после перезапуска процесса
+
+        Ядро каждого стола собирается из снимка и событий после него,
+        новый снимок ограничивает следующее восстановление, таймер хода
+        идущей раздачи запускается заново.
+        """
+        if self.journal is None:
+            return []
+        rooms = []
+        for room_id, core in self.journal.recover().items():
+            table = self.get_or_create(room_id)
+
+            def restore(game: Game):
+                game.replace_core(core)
+                core.journal.snapshot(core)
+                return game.start_turn_timer()
+
+            self.call(room_id, restore)
+            for player_id in table.game.player_manager.players:
+                self._player_rooms[player_id] = room_id
+            rooms.append(room_id)
+        return rooms
+
+    def evict(self, room_id: str, archive: bool = True) -> bool:
+        """Удаление стола с отменой его таймера; журнал стола переносится
+        в историю раздач (archive=False - остается для восстановления)"""
+        shard = self._shard(room_id)
+        with shard.lock:
+            table = shard.tables.pop(room_id, None)
+        if table is None:
+            return False
+
+        with self._count_lock:
+            self._count -= 1
+        for player_id in list(table.game.player_manager.players):
+            if self._player_rooms.get(player_id) == room_id:
+                del self._player_rooms[player_id]
+        if table.game.turn_timer:
+            self.runner.call_soon(table.game.stop_turn_timer)
+        if self.runner.is_running:
+            self.runner.call_soon(table.game.cancel_ai_turn)
+        if table.game.core.journal is not None:
+            self.runner.call_soon(self._close_log, table.game, archive)
+        logger.info("Удален стол %s", room_id)
+        return True
+
+    @staticmethod
+    def _close_log(game: Game, archive: bool) -> None:
+        log, game.core.journal = game.core.journal, None
+        if log is not None:
+            log.close(archive)
+
+    def collect_garbage(self, now: Optional[float] = None) -> List[str]:
+        """Удаление пустых и заброшенных столов, возвращает их комнаты"""
+        now = time.monotonic() if now is None else now
+        evicted = []
+        for table in list(self):
+            idle = now - table.last_active
+            if idle >= self.idle_timeout or \
+                    (table.player_count == 0 and idle >= self.empty_timeout):
+                if self.evict(table.room_id):
+                    evicted.append(table.room_id)
+        return evicted
+
+    def start_gc(self, interval: float = 60.0) -> None:
+        """Периодическая сборка столов в цикле столов"""
+        async def collect() -> None:
+            while True:
+                await asyncio.sleep(interval)
+                evicted = self.collect_garbage()
+                if evicted:
+                    logger.info("Сборка столов: удалено %d", len(evicted))
+
+        async def start() -> None:
+            if self._gc_task is None:
+                self._gc_task = asyncio.create_task(collect())
+
+        if self.runner.in_loop:
+            self._gc_task = self._gc_task or asyncio.get_running_loop().create_task(collect())
+        else:
+            self.runner.run(start(), self.call_timeout)
+
+    def close(self) -> None:
+        """Удаление всех столов и остановка цикла; журналы столов остаются
+        для восстановления"""
+        for table in list(self):
+            self.evict(table.room_id, archive=False)
+        self._gc_task = None
+        self.runner.stop()
+        self.decisions.close()
+        if self.journal is not None:
+            self.journal.close()
@@ -0,0 +1,92 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+import json
+import redis
+
+def _text(value) -> Optional[str]:
+    return value.decode() if isinstance(value, bytes) else value
+
+class RedisStore:
+    """Состояние столов в Redis, общее для процессов (воркеров gunicorn)
+
+    Стол - хеш <prefix>table:<комната> с полями version (номер записи) и
+    state (JSON снимка ядра, journal.snapshot_core). Запись условная:
+    save проходит, только если version не изменилась с последнего чтения
+    этим процессом (WATCH/MULTI), иначе стол успел изменить другой процесс.
+    Ключ стола живет ttl секунд после последней записи; комнаты игроков
+    хранятся в общем хеше <prefix>players.
+    """
+    def __init__(self, client: redis.Redis, prefix: str = 'ofc:', ttl: int = 1800):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self._players_key = f'{prefix}players'
+
+    @classmethod
+    def from_url(cls, url: str, max_connections: int = 50, **kwargs) -> 'RedisStore':
+        """Хранилище с пулом соединений, общим для потоков процесса"""
+        pool = redis.ConnectionPool.from_url(url, max_connections=max_connections)
+        return cls(redis.Redis(connection_pool=pool), **kwargs)
+
+    def _key(self, room_id: str) -> str:
+        return f'{self.prefix}table:{room_id}'
+
+    def exists(self, room_id: str) -> bool:
+        return bool(self.client.exists(self._key(room_id)))
+
+    def load(self, room_id: str,
+             known_version: int = 0) -> Optional[Tuple[int, Optional[Dict]]]:
+        """(version, state) стола, если его версия отличается от known_version;
+        (0, None) - стола в Redis нет (истек ttl)
+
+        Совпадающая версия проверяется одним коротким запросом, без
+        передачи состояния.
+        """
+        key = self._key(room_id)
+        if int(self.client.hget(key, 'version') or 0) == known_version:
+            return None
+        version, state = self.client.hmget(key, 'version', 'state')
+        if state is None:
+            return 0, None
+        return int(version), json.loads(state)
+
+    def load_many(self, room_ids: Iterable[str]) -> Dict[str, Tuple[int, Dict]]:
+        """Состояния нескольких столов за один обмен (конвейер)"""
+        room_ids = list(room_ids)
+        with self.client.pipeline(transaction=False) as pipe:
+            for room_id in room_ids:
+                pipe.hmget(self._key(room_id), 'version', 'state')
+            replies = pipe.execute()
+        return {room_id: (int(version), json.loads(state))
+                for room_id, (version, state) in zip(room_ids, replies) if state is not None}
+
+    def save(self, room_id: str, version: int, state: Dict,
+             player_ids: List[str] = ()) -> Optional[int]:
+        """Запись состояния поверх версии version; новая версия или None,
+        если стол изменил другой процесс"""
+        key = self._key(room_id)
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                if int(pipe.hget(key, 'version') or 0) != version:
+                    return None
+                pipe.multi()
+                pipe.hset(key, mapping={'version': version + 1, 'state': json.dumps(state)})
+                pipe.expire(key, self.ttl)
+                if player_ids:
+                    pipe.hset(self._players_key, mapping={pid: room_id for pid in player_ids})
+                pipe.execute()
+            except redis.WatchError:
+                return None
+        return version + 1
+
+    def delete(self, room_id: str) -> None:
+        self.client.delete(self._key(room_id))
+
+    def room_of(self, player_id: str) -> Optional[str]:
+        return _text(self.client.hget(self._players_key, player_id))
+
+    def set_room(self, player_id: str, room_id: str) -> None:
+        self.client.hset(self._players_key, player_id, room_id)
+
+    def clear_room(self, player_id: str) -> None:
+        self.client.hdel(self._players_key, player_id)
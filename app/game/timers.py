@@ -0,0 +1,220 @@
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import logging
+import math
+import time
+import weakref
+
+logger = logging.getLogger(__name__)
+
+class TimerHandle:
+    """Таймер колеса: отмена, пауза и учет потраченного времени"""
+    __slots__ = ('wheel', 'callback', 'args', 'deadline', 'duration', 'started', 'spent',
+                 'remaining', 'fired', 'tick', '_bucket')
+
+    def __init__(self, wheel: 'TimerWheel', delay: float, callback: Callable, args: tuple):
+        self.wheel = wheel
+        self.callback = callback
+        self.args = args
+        self.duration = delay
+        self.started = wheel.clock()
+        self.deadline = self.started + delay
+        self.spent = 0.0                          # Время до последней паузы
+        self.remaining: Optional[float] = None    # Остаток на паузе
+        self.fired = False
+        self.tick = 0
+        self._bucket: Optional[Dict[int, 'TimerHandle']] = None
+
+    @property
+    def active(self) -> bool:
+        return self._bucket is not None
+
+    @property
+    def paused(self) -> bool:
+        return self.remaining is not None
+
+    def elapsed(self) -> float:
+        """Время работы таймера без пауз"""
+        if self.fired:
+            return self.duration
+        if self.active:
+            return self.spent + self.wheel.clock() - self.started
+        return self.spent
+
+    def time_left(self) -> float:
+        if self.paused:
+            return self.remaining
+        return max(self.duration - self.elapsed(), 0.0)
+
+    def cancel(self) -> None:
+        """Отмена; потраченное время остается в elapsed"""
+        if self._bucket is not None:
+            self.spent += self.wheel.clock() - self.started
+            self.wheel._remove(self)
+        self.remaining = None
+
+    def pause(self) -> None:
+        """Остановка отсчета с сохранением остатка"""
+        if not self.active:
+            return
+        now = self.wheel.clock()
+        self.spent += now - self.started
+        self.wheel._remove(self)
+        self.remaining = max(self.deadline - now, 0.0)
+
+    def resume(self) -> None:
+        """Продолжение отсчета с сохраненного остатка"""
+        if not self.paused:
+            return
+        self.started = self.wheel.clock()
+        self.deadline = self.started + self.remaining
+        self.remaining = None
+        self.wheel._insert(self)
+
+class TimerWheel:
+    """Иерархическое колесо таймеров
+
+    Время делится на тики; уровень 0 хранит таймеры ближайших slots тиков
+    по слоту на тик, уровень l - по слоту на slots^l тиков. Добавление и
+    отмена - O(1) (слот - словарь по id таймера). Когда счетчик тиков
+    проходит границу слота верхнего уровня, его таймеры раскладываются по
+    нижним уровням; таймеры дальше всех уровней ждут в overflow.
+
+    Один экземпляр на event loop (for_loop) обслуживает таймеры хода всех
+    столов одной задачей, которая просыпается раз в тик, пока есть
+    таймеры. Колесо не потокобезопасно: методы вызываются из его цикла.
+    """
+    _wheels: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, TimerWheel]' = \
+        weakref.WeakKeyDictionary()
+
+    def __init__(self, tick: float = 0.05, slots: int = 64, levels: int = 4,
+                 clock: Callable[[], float] = time.monotonic):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.clock = clock
+        self.origin = clock()
+        self.current = 0            # Последний обработанный тик
+        self.count = 0              # Активных таймеров
+        self.wheels: List[List[Dict[int, TimerHandle]]] = \
+            [[{} for _ in range(slots)] for _ in range(levels)]
+        self.overflow: Dict[int, TimerHandle] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @classmethod
+    def for_loop(cls, loop: Optional[asyncio.AbstractEventLoop] = None) -> 'TimerWheel':
+        """Общее колесо цикла (по умолчанию - текущего)"""
+        loop = loop or asyncio.get_running_loop()
+        wheel = cls._wheels.get(loop)
+        if wheel is None:
+            wheel = cls._wheels[loop] = cls()
+        return wheel
+
+    def __len__(self) -> int:
+        return self.count
+
+    def schedule(self, delay: float, callback: Callable, *args: Any) -> TimerHandle:
+        """Вызов callback(*args) через delay секунд"""
+        handle = TimerHandle(self, delay, callback, args)
+        self._insert(handle)
+        self._ensure_running()
+        return handle
+
+    def _insert(self, handle: TimerHandle) -> None:
+        tick = math.ceil((handle.deadline - self.origin) / self.tick)
+        self._place(handle, max(tick, self.current + 1))
+
+    def _place(self, handle: TimerHandle, tick: int) -> None:
+        handle.tick = tick
+        bucket = self.overflow
+        span = 1
+        for level in range(self.levels):
+            if tick - self.current < span * self.slots:
+                bucket = self.wheels[level][(tick // span) % self.slots]
+                break
+            span *= self.slots
+        bucket[id(handle)] = handle
+        handle._bucket = bucket
+        self.count += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _remove(self, handle: TimerHandle) -> None:
+        del handle._bucket[id(handle)]
+        handle._bucket = None
+        self.count -= 1
+
+    def advance(self, now: Optional[float] = None) -> int:
+        """Обработка тиков до момента now, возвращает число сработавших таймеров"""
+        now = self.clock() if now is None else now
+        target = math.floor((now - self.origin) / self.tick)
+        if not self.count:
+            self.current = max(self.current, target)
+            return 0
+
+        fired = 0
+        while self.current < target and self.count:
+            self.current += 1
+            if self.current % self.slots == 0:
+                self._cascade(self.current)
+            bucket = self.wheels[0][self.current % self.slots]
+            if not bucket:
+                continue
+
+            handles = list(bucket.values())
+            bucket.clear()
+            self.count -= len(handles)
+            for handle in handles:
+                handle._bucket = None
+                handle.fired = True
+                fired += 1
+                try:
+                    handle.callback(*handle.args)
+                except Exception:
+                    logger.exception("Ошибка в обработчике таймера")
+        self.current = max(self.current, target)
+        return fired
+
+    def _cascade(self, tick: int) -> None:
+        """Перенос таймеров слотов, чей интервал начинается с tick, на уровень ниже
+
+        Уровни обходятся сверху вниз: перенесенное с верхнего уровня в тот же
+        тик раскладывается дальше.
+        """
+        if tick % self.slots ** self.levels == 0:
+            self._replace(self.overflow)
+        for level in range(self.levels - 1, 0, -1):
+            span = self.slots ** level
+            if tick % span == 0:
+                self._replace(self.wheels[level][(tick // span) % self.slots])
+
+    def _replace(self, bucket: Dict[int, TimerHandle]) -> None:
+        handles = list(bucket.values())
+        bucket.clear()
+        self.count -= len(handles)
+        for handle in handles:
+            self._place(handle, handle.tick)
+
+    def _ensure_running(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return   # Без цикла колесо продвигается вызовами advance
+        self._wakeup = asyncio.Event()
+        self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            if not self.count:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            await asyncio.sleep(self.tick)
+            self.advance()
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -1,4 +1,5 @@
 from typing import Dict, List
+from collections import Counter
 from ..game.evaluator import HandEvaluator
 from ..game.hand import Hand
 
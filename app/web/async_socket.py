@@ -0,0 +1,151 @@
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs
+import socketio
+from ..game.registry import GameRegistry
+from .events import (ACTIONS, Connections, add_deltas, chat_message, new_player,
+                     disconnect_player, player_action)
+from .fanout import AsyncEmitBatcher
+from .rooms import encode_for
+
+class AsyncSocketServer:
+    """Обработчики Socket.IO столов на socketio.AsyncServer (ASGI-режим)
+
+    События и комнаты те же, что у socket.py для Flask-SocketIO (общая
+    логика - в events.py), но обработчики - корутины цикла столов:
+    действия ждут стол через GameRegistry.acall, не занимая поток на запрос.
+    """
+    EVENTS = ('connect', 'join_game', 'sync', 'player_ready', 'chat_message', 'disconnect')
+
+    def __init__(self, server: socketio.AsyncServer, registry: GameRegistry,
+                 batch_interval: float = 0.0):
+        self.server = server
+        self.registry = registry
+        self.batcher = AsyncEmitBatcher(server, interval=batch_interval, encode=encode_for)
+        self.connections = Connections()
+        for event in self.EVENTS:
+            server.on(event, getattr(self, f'on_{event}'))
+        for event in ACTIONS:
+            server.on(event, self._action_handler(event))
+        registry.on_publish = self.emit_deltas
+
+    async def send(self, sid: str, event: str, data) -> None:
+        """Сообщение состояния соединению в его формате"""
+        await self.server.emit(event, self.connections.encode(sid, data), to=sid)
+
+    async def connection(self, sid: str,
+                         data: Optional[dict] = None) -> Tuple[Optional[str], Optional[str]]:
+        """Комната и игрок соединения; до join_game - из данных события"""
+        if sid in self.connections.players:
+            return self.connections.players[sid]
+        player_id = (data or {}).get('player_id')
+        return await self.registry.aroom_of(player_id) if player_id else None, player_id
+
+    def emit_deltas(self, room_id: str, messages: Dict[Optional[str], dict],
+                    skip_sid: Optional[str] = None) -> None:
+        add_deltas(self.batcher, room_id, messages, skip_sid)
+
+    async def broadcast_state(self, room_id: str) -> None:
+        self.emit_deltas(room_id, await self.registry.apublish(room_id))
+
+    async def send_snapshot(self, sid: str, room_id: str, viewer_id: Optional[str]) -> None:
+        """Снимок роли соединению; накопленные дельты - остальным зрителям"""
+        messages, snapshot = await self.registry.asnapshot(room_id, viewer_id)
+        self.emit_deltas(room_id, messages, skip_sid=sid)
+        await self.send(sid, 'game_state', snapshot)
+
+    async def enter(self, sid: str, room_id: str, player_id: Optional[str]) -> None:
+        """Соединение входит в комнату стола и комнату своей роли"""
+        table = await self.registry.aget(room_id)
+        leave, join = self.connections.enter(sid, room_id,
+                                             table.role(player_id) if table else None)
+        for room in leave:
+            await self.server.leave_room(sid, room)
+        for room in join:
+            await self.server.enter_room(sid, room)
+
+    async def on_connect(self, sid: str, environ: dict, auth=None) -> None:
+        """?room= - наблюдение за столом, ?encoding=binary - двоичный формат"""
+        query = parse_qs(environ.get('QUERY_STRING', ''))
+        self.connections.negotiate(sid, query.get('encoding', [None])[0])
+        room_id = query.get('room', [None])[0]
+        if room_id and await self.registry.aget(room_id):
+            await self.enter(sid, room_id, None)
+            await self.send_snapshot(sid, room_id, None)
+
+    async def on_join_game(self, sid: str, data: dict) -> None:
+        """Вход в комнату стола; со spectate - наблюдателем"""
+        self.connections.negotiate(sid, data.get('encoding'))
+        player_id = data.get('player_id')
+        room_id = data.get('room') or await self.registry.aroom_of(player_id) or \
+            self.registry.DEFAULT_ROOM
+
+        if data.get('spectate'):
+            await self.registry.aget_or_create(room_id)
+            player_id = None
+        elif not player_id:
+            await self.server.emit('error', {'message': 'No player id'}, to=sid)
+            return
+        else:
+            try:
+                await self.registry.ajoin(room_id, new_player(player_id, data))
+            except ValueError as e:
+                await self.server.emit('error', {'message': str(e)}, to=sid)
+                return
+
+        await self.enter(sid, room_id, player_id)
+        await self.send_snapshot(sid, room_id, player_id)
+
+    async def on_sync(self, sid: str, data: dict) -> None:
+        """Клиент пропустил дельты: догоняет по истории или получает снимок"""
+        room_id, player_id = await self.connection(sid, data)
+        if not room_id or not await self.registry.aget(room_id):
+            return
+        since = data.get('since')
+        messages = await self.registry.asince(room_id, since, player_id) \
+            if isinstance(since, int) else None
+        if messages is None:
+            await self.send_snapshot(sid, room_id, player_id)
+            return
+        await self.send(sid, 'state_deltas', messages)
+
+    async def on_player_ready(self, sid: str, data: dict) -> None:
+        room_id, player_id = await self.connection(sid, data)
+        if not room_id:
+            return
+        if await self.registry.acall(room_id, lambda game: game.core.set_ready(player_id)):
+            if self.connections.players.get(sid) != (room_id, player_id):
+                await self.enter(sid, room_id, player_id)
+            await self.broadcast_state(room_id)
+
+    def _action_handler(self, event: str):
+        """Обработчик события действия игрока (events.ACTIONS)"""
+        async def handle(sid: str, data: dict) -> None:
+            await self.apply_action(sid, data, player_action(event, data))
+        return handle
+
+    async def apply_action(self, sid: str, data: dict, action: dict) -> None:
+        """Действие игрока на его столе и рассылка результата"""
+        room_id, player_id = await self.connection(sid, data)
+        success = bool(room_id) and await self.registry.acall(
+            room_id, lambda game: game.handle_player_action(player_id, action))
+        if success:
+            await self.broadcast_state(room_id)
+        else:
+            await self.server.emit('error', {'message': 'Invalid move'}, to=sid)
+
+    async def on_chat_message(self, sid: str, data: dict) -> None:
+        room_id, player_id = await self.connection(sid, data)
+        if not room_id:
+            return
+        player = await self.registry.acall(
+            room_id, lambda game: game.player_manager.get_player(player_id))
+        if player:
+            await self.server.emit('chat_message', chat_message(player, data), to=room_id)
+
+    async def on_disconnect(self, sid: str, *args) -> None:
+        """Карты отключившегося игрока расставляются сразу"""
+        room_id, player_id = self.connections.drop(sid)
+        if not room_id or not await self.registry.aget(room_id):
+            return
+        if await self.registry.acall(room_id, disconnect_player(player_id)):
+            await self.broadcast_state(room_id)
@@ -0,0 +1,81 @@
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from ..game.game import Game
+from ..game.player import Player
+from . import wire
+from .rooms import BINARY, view_room
+
+# Логика событий Socket.IO столов, общая для сервера Flask-SocketIO
+# (socket.py) и ASGI-сервера (async_socket.py); в модулях серверов
+# остаются только вызовы реестра и ввод-вывод своего транспорта
+
+# Поля событий действий игрока, передаваемые в Game.handle_player_action
+ACTIONS = {
+    'place_card': ('card', 'position', 'index'),
+    'submit_street': ('placements',),
+    'remove_card': ('position', 'index'),
+}
+
+class Connections:
+    """Соединения сервера: комната и роль каждого, формат их сообщений"""
+    def __init__(self):
+        # sid -> (room_id, player_id); player_id наблюдателя - None
+        self.players: Dict[str, Tuple[str, Optional[str]]] = {}
+        # Соединения, договорившиеся о двоичном формате (encoding: 'binary')
+        self.binary: Set[str] = set()
+
+    def negotiate(self, sid: str, encoding: Optional[str]) -> None:
+        """Формат сообщений состояния соединения: 'binary' или JSON"""
+        if encoding == 'binary':
+            self.binary.add(sid)
+        elif encoding == 'json':
+            self.binary.discard(sid)
+
+    def encode(self, sid: str, data):
+        """Сообщение состояния в формате соединения"""
+        return wire.encode(data) if sid in self.binary else data
+
+    def enter(self, sid: str, room_id: str,
+              role: Optional[str]) -> Tuple[List[str], List[str]]:
+        """Переход соединения к столу и роли: комнаты Socket.IO, которые
+        оно покидает, и комнаты, в которые входит"""
+        previous = self.players.get(sid)
+        leave = [previous[0], view_room(*previous), view_room(*previous) + BINARY] \
+            if previous else []
+        self.players[sid] = (room_id, role)
+        room = view_room(room_id, role)
+        return leave, [room_id, room + BINARY if sid in self.binary else room]
+
+    def drop(self, sid: str) -> Tuple[Optional[str], Optional[str]]:
+        """Отключение: стол и игрок соединения"""
+        self.binary.discard(sid)
+        return self.players.pop(sid, (None, None))
+
+def add_deltas(batcher, room_id: str, messages: Dict[Optional[str], dict],
+               skip_sid: Optional[str] = None) -> None:
+    """Дельты ролей стола - в комнаты их зрителей в обоих форматах (одна
+    сериализация на роль и формат)"""
+    for role, message in messages.items():
+        room = view_room(room_id, role)
+        batcher.add(room, message, skip_sid=skip_sid)
+        batcher.add(room + BINARY, message, skip_sid=skip_sid)
+
+def player_action(event: str, data: dict) -> dict:
+    """Действие игрока из данных события ACTIONS"""
+    action = {'type': event}
+    for key in ACTIONS[event]:
+        action[key] = data.get(key)
+    return action
+
+def new_player(player_id: str, data: dict) -> Player:
+    """Игрок события join_game"""
+    return Player(player_id, data.get('name', f'Player_{player_id[:6]}'))
+
+def chat_message(player: Player, data: dict) -> dict:
+    return {
+        'player_name': player.name,
+        'message': data.get('message')
+    }
+
+def disconnect_player(player_id: str) -> Callable[[Game], Awaitable[bool]]:
+    """Действие стола при отключении игрока (Game.handle_disconnect)"""
+    return lambda game: game.handle_disconnect(player_id)
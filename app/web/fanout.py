@@ -0,0 +1,150 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import threading
+import socketio
+
+class LocalMessageQueue(socketio.Manager):
+    """Очередь сообщений Socket.IO внутри процесса (memory://канал)
+
+    Замена Redis pub/sub для тестов и запуска одним процессом: emit
+    доставляется клиентам всех серверов, подключенных к тому же каналу,
+    каждый сервер рассылает его своим клиентам комнаты.
+    """
+    _channels: Dict[str, List['LocalMessageQueue']] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, channel: str = 'socketio'):
+        super().__init__()
+        self.channel = channel
+        self.published = 0     # Сообщений, отправленных в канал
+
+    def initialize(self) -> None:
+        super().initialize()
+        with self._lock:
+            managers = self._channels.setdefault(self.channel, [])
+            if self not in managers:
+                managers.append(self)
+
+    def emit(self, event, data, namespace=None, room=None, skip_sid=None,
+             callback=None, to=None, **kwargs):
+        self.published += 1
+        with self._lock:
+            managers = list(self._channels.get(self.channel, [self]))
+        for manager in managers:
+            # Ответ (callback) возможен только от клиентов своего сервера
+            socketio.Manager.emit(manager, event, data, namespace=namespace or '/',
+                                  room=to or room, skip_sid=skip_sid,
+                                  callback=callback if manager is self else None, **kwargs)
+
+    def close(self) -> None:
+        """Отключение от канала"""
+        with self._lock:
+            managers = self._channels.get(self.channel, [])
+            if self in managers:
+                managers.remove(self)
+
+def client_manager(url: Optional[str]) -> Optional[socketio.Manager]:
+    """Менеджер клиентов Socket.IO для очереди сообщений url
+
+    redis:// - Redis pub/sub (сообщения доходят до клиентов всех
+    процессов), memory://канал - очередь внутри процесса, None - без
+    очереди (только клиенты своего процесса).
+    """
+    if not url:
+        return None
+    if url.startswith('memory://'):
+        return LocalMessageQueue(url[len('memory://'):] or 'socketio')
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return socketio.RedisManager(url)
+    return socketio.KombuManager(url)
+
+def async_client_manager(url: Optional[str]) -> Optional[socketio.AsyncManager]:
+    """Менеджер клиентов socketio.AsyncServer (ASGI-режим) для очереди url
+
+    memory:// - без очереди: внутри процесса ASGI-сервер один.
+    """
+    if not url or url.startswith('memory://'):
+        return None
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return socketio.AsyncRedisManager(url)
+    return socketio.AsyncAioPikaManager(url)
+
+class EmitBatcher:
+    """Сообщения комнат, накопленные за тик, одним событием на комнату
+
+    Через очередь сообщений каждый emit - публикация, которую читают все
+    процессы. За тик (interval секунд) сообщения одной комнаты собираются
+    в список и уходят одним событием event; порядок сообщений комнаты
+    сохраняется. interval=0 - без накопления (каждое сообщение сразу).
+    encode(комната, сообщения) - данные события для комнаты (по умолчанию
+    список сообщений как есть).
+    """
+    def __init__(self, server, event: str = 'state_deltas', interval: float = 0.0,
+                 encode: Optional[Callable[[str, List[Dict]], Any]] = None):
+        self.server = server
+        self.event = event
+        self.interval = interval
+        self.encode = encode or (lambda room, messages: messages)
+        self._pending: Dict[str, List[Tuple[Optional[str], Dict]]] = {}
+        self._scheduled = False
+        self._lock = threading.Lock()
+
+    def add(self, room: str, message: Dict, skip_sid: Optional[str] = None) -> None:
+        with self._lock:
+            self._pending.setdefault(room, []).append((skip_sid, message))
+            schedule = self.interval > 0 and not self._scheduled
+            if schedule:
+                self._scheduled = True
+        if self.interval <= 0:
+            self.flush()
+        elif schedule:
+            self.server.start_background_task(self._tick)
+
+    def _tick(self) -> None:
+        self.server.sleep(self.interval)
+        self.flush()
+
+    def _take(self) -> List[Tuple[str, Any, Optional[str]]]:
+        """Накопленные события (комната, данные, skip_sid); подряд идущие
+        сообщения комнаты с одним skip_sid - одно событие"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._scheduled = False
+
+        events = []
+        for room, entries in pending.items():
+            start = 0
+            for end in range(1, len(entries) + 1):
+                if end == len(entries) or entries[end][0] != entries[start][0]:
+                    messages = [message for _, message in entries[start:end]]
+                    events.append((room, self.encode(room, messages), entries[start][0]))
+                    start = end
+        return events
+
+    def flush(self) -> int:
+        """Отправка накопленного, возвращает число событий"""
+        events = self._take()
+        for room, data, skip_sid in events:
+            self.server.emit(self.event, data, to=room, skip_sid=skip_sid)
+        return len(events)
+
+class AsyncEmitBatcher(EmitBatcher):
+    """EmitBatcher для socketio.AsyncServer (ASGI): add вызывается в цикле
+    сервера, отправка идет его задачей"""
+    def add(self, room: str, message: Dict, skip_sid: Optional[str] = None) -> None:
+        with self._lock:
+            self._pending.setdefault(room, []).append((skip_sid, message))
+            schedule = not self._scheduled
+            self._scheduled = True
+        if schedule:
+            self.server.start_background_task(self._tick)
+
+    async def _tick(self) -> None:
+        if self.interval > 0:
+            await self.server.sleep(self.interval)
+        await self.flush()
+
+    async def flush(self) -> int:
+        events = self._take()
+        for room, data, skip_sid in events:
+            await self.server.emit(self.event, data, to=room, skip_sid=skip_sid)
+        return len(events)
@@ -0,0 +1,16 @@
+from typing import Optional
+from . import wire
+
+# Комнаты Socket.IO стола, общие для сервера Flask-SocketIO (socket.py)
+# и ASGI-сервера (async_socket.py)
+
+# Суффикс комнат ролей для клиентов с двоичным форматом (app/web/wire.py)
+BINARY = '#bin'
+
+def view_room(room_id: str, role: Optional[str]) -> str:
+    """Комната Socket.IO зрителей одной роли стола: места игрока или наблюдателей"""
+    return f"{room_id}#seat:{role}" if role is not None else f"{room_id}#watch"
+
+def encode_for(room: str, messages: list):
+    """Пачка дельт в формате комнаты: двоичный кадр или список как есть"""
+    return wire.encode(messages) if room.endswith(BINARY) else messages
@@ -1,44 +1,64 @@
-from flask import Blueprint, render_template, jsonify, request, session
-from ..game.game import Game
+from flask import Blueprint, Response, render_template, jsonify, request, session
+from .. import registry
 from ..game.player import Player
 import uuid
 
 bp = Blueprint('routes', __name__)
-game_instance = Game()
+
+def current_room() -> str:
+    """Комната запроса: параметр room, иначе комната из сессии"""
+    data = request.get_json(silent=True) or {}
+    return data.get('room') or request.args.get('room') or \
+        session.get('room_id') or registry.DEFAULT_ROOM
+
+def table_state(room_id: str) -> dict:
+    """Состояние стола, видимое игроку сессии; для несуществующей комнаты - пустое"""
+    player_id = session.get('player_id')
+    try:
+        return registry.call(room_id, lambda game: game.get_view(player_id))
+    except ValueError:
+        return {'state': None, 'players': {}}
 
 @bp.route('/')
 def index():
     """Главная страница"""
     if 'player_id' not in session:
         session['player_id'] = str(uuid.uuid4())
-    
-    return render_template('index.html', 
+
+    room_id = current_room()
+    return render_template('index.html',
                          player_id=session['player_id'],
-                         game_state=game_instance.get_game_state())
+                         room_id=room_id,
+                         game_state=table_state(room_id))
 
 @bp.route('/join', methods=['POST'])
 def join_game():
     """Присоединение к игре"""
     data = request.get_json()
     player_id = session.get('player_id')
-    
+
     if not player_id:
         return jsonify({'error': 'No session found'}), 400
-        
+
     player = Player(
         player_id=player_id,
         name=data.get('name', f'Player_{player_id[:6]}'),
         is_ai=False
     )
-    
-    game_instance.player_manager.add_player(player)
-    return jsonify({'status': 'success', 'player_id': player_id})
+
+    room_id = current_room()
+    try:
+        registry.join(room_id, player)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    session['room_id'] = room_id
+    return jsonify({'status': 'success', 'player_id': player_id, 'room': room_id})
 
 @bp.route('/start', methods=['POST'])
 def start_game():
     """Начало игры"""
     try:
-        game_instance.start_game()
+        registry.call(current_room(), lambda game: game.start_game())
         return jsonify({'status': 'success'})
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
@@ -49,15 +69,33 @@ def player_action():
     player_id = session.get('player_id')
     if not player_id:
         return jsonify({'error': 'No session found'}), 400
-        
+
     data = request.get_json()
-    success = game_instance.handle_player_action(player_id, data)
-    
+    try:
+        success = registry.call(current_room(),
+                                lambda game: game.handle_player_action(player_id, data))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     if success:
         return jsonify({'status': 'success'})
     return jsonify({'error': 'Invalid action'}), 400
 
 @bp.route('/state')
 def get_state():
-    """Получение текущего состояния игры"""
-    return jsonify(game_instance.get_game_state())
+    """Состояние игры, видимое игроку сессии (JSON кэшируется до изменения стола)"""
+    room_id = current_room()
+    player_id = session.get('player_id')
+    try:
+        payload = registry.call(room_id, lambda game: game.get_view_json(player_id))
+    except ValueError:
+        return jsonify({'state': None, 'players': {}})
+    return Response(payload, mimetype='application/json')
+
+@bp.route('/tables')
+def list_tables():
+    """Столы процесса"""
+    return jsonify({
+        'tables': [table.to_dict() for table in registry],
+        'max_tables': registry.max_tables
+    })
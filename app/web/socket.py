@@ -1,76 +1,158 @@
-from flask_socketio import emit
-from .. import socketio, game_instance  # Импортируем socketio из __init__.py
+from typing import Dict, Optional, Tuple
+from flask_socketio import emit, join_room, leave_room
+from .. import socketio, registry  # Импортируем socketio из __init__.py
 from flask import request  # Добавляем импорт request
+from .events import (Connections, add_deltas, chat_message, disconnect_player, new_player,
+                     player_action)
+from .fanout import EmitBatcher
+from .rooms import encode_for
+
+# Стол, роль и формат сообщений соединений
+connections = Connections()
+# Дельты состояния уходят пачками раз в тик (create_app задает интервал)
+batcher = EmitBatcher(socketio, encode=encode_for)
+
+def send(event: str, data) -> None:
+    """Сообщение состояния соединению в его формате"""
+    emit(event, connections.encode(request.sid, data), room=request.sid)
+
+def connection(data: Optional[dict] = None) -> Tuple[Optional[str], Optional[str]]:
+    """Комната и игрок соединения; до join_game - из данных события"""
+    if request.sid in connections.players:
+        return connections.players[request.sid]
+    player_id = (data or {}).get('player_id')
+    return registry.room_of(player_id) if player_id else None, player_id
+
+def emit_deltas(room_id: str, messages: Dict[Optional[str], dict],
+                skip_sid: Optional[str] = None) -> None:
+    add_deltas(batcher, room_id, messages, skip_sid)
+
+def broadcast_state(room_id: str) -> None:
+    """Рассылка изменений стола его зрителям (дельты с номерами)"""
+    emit_deltas(room_id, registry.publish(room_id))
+
+def send_snapshot(room_id: str, viewer_id: Optional[str]) -> None:
+    """Снимок роли соединению; накопленные дельты - остальным зрителям"""
+    messages, snapshot = registry.snapshot(room_id, viewer_id)
+    emit_deltas(room_id, messages, skip_sid=request.sid)
+    send('game_state', snapshot)
+
+def enter(room_id: str, player_id: Optional[str]) -> None:
+    """Соединение входит в комнату стола и комнату своей роли"""
+    table = registry.get(room_id)
+    leave, join = connections.enter(request.sid, room_id,
+                                    table.role(player_id) if table else None)
+    for room in leave:
+        leave_room(room)
+    for room in join:
+        join_room(room)
+
+def publish_update(room_id: str, messages: Dict[Optional[str], dict]) -> None:
+    """Дельты, возникшие вне запросов (таймаут хода)"""
+    emit_deltas(room_id, messages)
+
+registry.on_publish = publish_update
 
 @socketio.on('connect')
 def handle_connect():
-    """Обработка подключения клиента"""
-    emit('game_state', game_instance.get_game_state())
+    """Обработка подключения клиента: ?room= - наблюдение за столом,
+    ?encoding=binary - двоичный формат состояния"""
+    connections.negotiate(request.sid, request.args.get('encoding'))
+    room_id = request.args.get('room')
+    if room_id and room_id in registry:
+        enter(room_id, None)
+        send_snapshot(room_id, None)
+
+@socketio.on('join_game')
+def handle_join_game(data):
+    """Вход в комнату стола (стол и место создаются при необходимости);
+    со spectate - без места, наблюдателем; encoding - формат состояния"""
+    connections.negotiate(request.sid, data.get('encoding'))
+    player_id = data.get('player_id')
+    room_id = data.get('room') or registry.room_of(player_id) or registry.DEFAULT_ROOM
+
+    if data.get('spectate'):
+        registry.get_or_create(room_id)
+        player_id = None
+    elif not player_id:
+        emit('error', {'message': 'No player id'}, room=request.sid)
+        return
+    else:
+        try:
+            registry.join(room_id, new_player(player_id, data))
+        except ValueError as e:
+            emit('error', {'message': str(e)}, room=request.sid)
+            return
+
+    enter(room_id, player_id)
+    send_snapshot(room_id, player_id)
+
+@socketio.on('sync')
+def handle_sync(data):
+    """Клиент пропустил дельты: догоняет по истории или получает снимок"""
+    room_id, player_id = connection(data)
+    if not room_id or room_id not in registry:
+        return
+    since = data.get('since')
+    messages = registry.since(room_id, since, player_id) if isinstance(since, int) else None
+    if messages is None:
+        send_snapshot(room_id, player_id)
+        return
+    send('state_deltas', messages)
 
 @socketio.on('player_ready')
 def handle_player_ready(data):
     """Обработка готовности игрока"""
-    player_id = data.get('player_id')
-    player = game_instance.player_manager.get_player(player_id)
-    
-    if player:
-        player.is_ready = True
-        emit('game_state', game_instance.get_game_state(), broadcast=True)
+    room_id, player_id = connection(data)
+    if not room_id:
+        return
 
-@socketio.on('place_card')
-def handle_place_card(data):
-    """Обработка размещения карты"""
-    player_id = data.get('player_id')
-    card_data = data.get('card')
-    position = data.get('position')
-    index = data.get('index')
-    
-    action = {
-        'type': 'place_card',
-        'card': card_data,
-        'position': position,
-        'index': index
-    }
-    
-    success = game_instance.handle_player_action(player_id, action)
+    if registry.call(room_id, lambda game: game.core.set_ready(player_id)):
+        if connections.players.get(request.sid) != (room_id, player_id):
+            enter(room_id, player_id)
+        broadcast_state(room_id)
+
+def apply_action(data, action: dict) -> None:
+    """Действие игрока на его столе и рассылка результата"""
+    room_id, player_id = connection(data)
+    success = bool(room_id) and registry.call(
+        room_id, lambda game: game.handle_player_action(player_id, action))
     if success:
-        emit('game_state', game_instance.get_game_state(), broadcast=True)
+        broadcast_state(room_id)
     else:
         emit('error', {'message': 'Invalid move'}, room=request.sid)
 
+@socketio.on('place_card')
+def handle_place_card(data):
+    """Обработка размещения карты"""
+    apply_action(data, player_action('place_card', data))
+
+@socketio.on('submit_street')
+def handle_submit_street(data):
+    """Расстановка всей улицы одним событием: [{card, position, index}, ...]"""
+    apply_action(data, player_action('submit_street', data))
+
 @socketio.on('remove_card')
 def handle_remove_card(data):
     """Обработка удаления карты"""
-    player_id = data.get('player_id')
-    position = data.get('position')
-    index = data.get('index')
-    
-    action = {
-        'type': 'remove_card',
-        'position': position,
-        'index': index
-    }
-    
-    success = game_instance.handle_player_action(player_id, action)
-    if success:
-        emit('game_state', game_instance.get_game_state(), broadcast=True)
-    else:
-        emit('error', {'message': 'Invalid move'}, room=request.sid)
+    apply_action(data, player_action('remove_card', data))
 
 @socketio.on('chat_message')
 def handle_chat_message(data):
     """Обработка сообщений чата"""
-    player_id = data.get('player_id')
-    message = data.get('message')
-    player = game_instance.player_manager.get_player(player_id)
-    
+    room_id, player_id = connection(data)
+    if not room_id:
+        return
+    player = registry.call(room_id, lambda game: game.player_manager.get_player(player_id))
+
     if player:
-        emit('chat_message', {
-            'player_name': player.name,
-            'message': message
-        }, broadcast=True)
+        emit('chat_message', chat_message(player, data), to=room_id)
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Обработка отключения клиента"""
-    pass
+    room_id, player_id = connections.drop(request.sid)
+    if not room_id or room_id not in registry:
+        return
+    if registry.call(room_id, disconnect_player(player_id)):
+        broadcast_state(room_id)
@@ -0,0 +1,147 @@
+from typing import Any, Dict
+import struct
+from ..game.deck import CARD_IDS, CARD_KEYS
+
+# Компактный двоичный формат сообщений состояния (снимки и дельты)
+#
+# Кадр: байт версии формата и значение. Значение - байт тега и данные:
+# карта - один байт (номер 0-51, deck.CARD_IDS), список карт (линия,
+# рука) - строка байтов, известные ключи и строки - номер в ATOMS,
+# повтор строки кадра - номер ее первого вхождения, целые - zigzag varint.
+# Декодер клиента - decodeWire в static/js/game.js, таблицы ATOMS, мастей
+# и рангов там совпадают с этими.
+FORMAT_VERSION = 1
+
+NULL, FALSE, TRUE, INT, FLOAT, STR, ATOM, LIST, DICT, CARD, CARDS, REF = range(12)
+
+ATOMS = [
+    'version', 'state', 'current_street', 'current_player', 'fantasy_players', 'players',
+    'id', 'name', 'hand', 'score', 'fantasy_count', 'time_bank', 'is_ready', 'is_ai',
+    'top', 'middle', 'bottom', 'current', 'hidden', 'seq', 'ops', 'rank', 'suit',
+    'waiting', 'dealing', 'playing', 'fantasy', 'scoring', 'finished', 's', 'd', 'm',
+]
+_ATOM_IDS = {atom: index for index, atom in enumerate(ATOMS)}
+_FLOAT = struct.Struct('<d')
+
+def _is_card(value: Any) -> bool:
+    return isinstance(value, dict) and len(value) == 2 and \
+        (value.get('rank'), value.get('suit')) in CARD_IDS
+
+def _varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _encode(out: bytearray, value: Any, strings: Dict[str, int]) -> None:
+    if value is None:
+        out.append(NULL)
+    elif value is True or value is False:
+        out.append(TRUE if value else FALSE)
+    elif isinstance(value, float) and not value.is_integer():
+        out.append(FLOAT)
+        out += _FLOAT.pack(value)
+    elif isinstance(value, (int, float)):
+        value = int(value)
+        out.append(INT)
+        _varint(out, value << 1 if value >= 0 else (-value << 1) - 1)
+    elif isinstance(value, str):
+        if value in _ATOM_IDS:
+            out.append(ATOM)
+            out.append(_ATOM_IDS[value])
+        elif value in strings:
+            out.append(REF)
+            _varint(out, strings[value])
+        else:
+            strings[value] = len(strings)
+            encoded = value.encode()
+            out.append(STR)
+            _varint(out, len(encoded))
+            out += encoded
+    elif isinstance(value, dict):
+        if _is_card(value):
+            out.append(CARD)
+            out.append(CARD_IDS[(value['rank'], value['suit'])])
+            return
+        out.append(DICT)
+        _varint(out, len(value))
+        for key, item in value.items():
+            _encode(out, key, strings)
+            _encode(out, item, strings)
+    elif isinstance(value, (list, tuple)):
+        if value and all(_is_card(item) for item in value):
+            out.append(CARDS)
+            _varint(out, len(value))
+            out += bytes(CARD_IDS[(card['rank'], card['suit'])] for card in value)
+            return
+        out.append(LIST)
+        _varint(out, len(value))
+        for item in value:
+            _encode(out, item, strings)
+    else:
+        raise TypeError(f"Значение {type(value).__name__} не кодируется")
+
+def encode(value: Any) -> bytes:
+    """Кадр значения (словари, списки, строки, числа, карты rank/suit)"""
+    out = bytearray([FORMAT_VERSION])
+    _encode(out, value, {})
+    return bytes(out)
+
+class _Decoder:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pos = 1
+        self.strings = []
+
+    def varint(self) -> int:
+        result = shift = 0
+        while True:
+            byte = self.data[self.pos]
+            self.pos += 1
+            result |= (byte & 0x7f) << shift
+            shift += 7
+            if byte < 0x80:
+                return result
+
+    def card(self, card_id: int) -> Dict[str, str]:
+        rank, suit = CARD_KEYS[card_id]
+        return {'rank': rank, 'suit': suit}
+
+    def value(self) -> Any:
+        tag = self.data[self.pos]
+        self.pos += 1
+        if tag in (NULL, FALSE, TRUE):
+            return (None, False, True)[tag]
+        if tag == INT:
+            value = self.varint()
+            return -((value + 1) >> 1) if value & 1 else value >> 1
+        if tag == FLOAT:
+            self.pos += _FLOAT.size
+            return _FLOAT.unpack_from(self.data, self.pos - _FLOAT.size)[0]
+        if tag == STR:
+            size = self.varint()
+            self.pos += size
+            self.strings.append(self.data[self.pos - size:self.pos].decode())
+            return self.strings[-1]
+        if tag == REF:
+            return self.strings[self.varint()]
+        if tag == ATOM:
+            self.pos += 1
+            return ATOMS[self.data[self.pos - 1]]
+        if tag == LIST:
+            return [self.value() for _ in range(self.varint())]
+        if tag == DICT:
+            return {self.value(): self.value() for _ in range(self.varint())}
+        if tag == CARD:
+            self.pos += 1
+            return self.card(self.data[self.pos - 1])
+        if tag == CARDS:
+            size = self.varint()
+            self.pos += size
+            return [self.card(card_id) for card_id in self.data[self.pos - size:self.pos]]
+        raise ValueError(f"Неизвестный тег {tag}")
+
+def decode(data: bytes) -> Any:
+    if not data or data[0] != FORMAT_VERSION:
+        raise ValueError("Неподдерживаемая версия формата")
+    return _Decoder(data).value()
@@ -2,7 +2,10 @@ class GameClient {
     constructor() {
         this.socket = io();
         this.playerId = null;
+        this.roomId = null;
         this.gameState = null;
+        this.seq = null;          // Номер последней примененной дельты
+        this.syncing = false;
         this.setupSocketHandlers();
         this.setupEventListeners();
     }
@@ -12,9 +15,22 @@ class GameClient {
             console.log('Connected to server');
         });
 
-        this.socket.on('game_state', (state) => {
-            this.gameState = state;
-            this.updateUI();
+        // Полный снимок: при входе и после пропуска дельт
+        this.socket.on('game_state', (payload) => {
+            const snapshot = decodePayload(payload);
+            this.gameState = snapshot.state;
+            this.seq = snapshot.seq;
+            this.syncing = false;
+            if (this.gameState) this.updateUI();
+        });
+
+        // Дельты одного тика сервера; интерфейс перерисовывается один раз
+        this.socket.on('state_deltas', (payload) => {
+            let applied = false;
+            for (const delta of decodePayload(payload)) {
+                applied = this.applyDelta(delta) || applied;
+            }
+            if (applied) this.updateUI();
         });
 
         this.socket.on('error', (data) => {
@@ -26,6 +42,22 @@ class GameClient {
         });
     }
 
+    applyDelta(delta) {
+        if (this.seq !== null && delta.seq <= this.seq) return false;  // Повтор
+        if (this.seq === null || delta.seq !== this.seq + 1) {
+            // Пропуск: дельты после this.seq догоняются с сервера
+            if (!this.syncing) {
+                this.syncing = true;
+                this.socket.emit('sync', { player_id: this.playerId, since: this.seq });
+            }
+            return false;
+        }
+        this.gameState = applyOps(this.gameState, delta.ops);
+        this.seq = delta.seq;
+        this.syncing = false;
+        return true;
+    }
+
     setupEventListeners() {
         // Обработчики для drag and drop
         document.querySelectorAll('.card').forEach(card => {
@@ -83,6 +115,16 @@ class GameClient {
         slot.classList.remove('drag-over');
     }
 
+    // Вся улица одним событием: [{card, position, index}, ...] в порядке
+    // расстановки; сервер принимает ее целиком или отклоняет
+    submitStreet(placements) {
+        if (!this.canMove()) return;
+        this.socket.emit('submit_street', {
+            player_id: this.playerId,
+            placements: placements
+        });
+    }
+
     canMove() {
         return this.gameState && 
                this.gameState.current_player === this.playerId &&
@@ -259,16 +301,119 @@ class GameClient {
         });
     }
 
-    init(playerId) {
+    init(playerId, roomId) {
         this.playerId = playerId;
+        this.roomId = roomId;
         this.setupEventListeners();
-        this.socket.emit('join_game', { player_id: playerId });
+        // Состояние - в компактном двоичном формате (app/web/wire.py)
+        this.socket.emit('join_game', { player_id: playerId, room: roomId, encoding: 'binary' });
     }
 }
 
+// Применение операций дельты состояния (app/game/delta.py):
+// ['s', путь, значение], ['d', путь], ['m', путь к руке, карта, из, в, индекс]
+function applyOps(state, ops) {
+    const sameCard = (a, b) => a.rank === b.rank && a.suit === b.suit;
+    ops.forEach(([kind, path, ...args]) => {
+        if (kind === 's' && path.length === 0) {
+            state = args[0];
+            return;
+        }
+        const keys = kind === 'm' ? path : path.slice(0, -1);
+        const target = keys.reduce((node, key) => node[key], state);
+        const last = path[path.length - 1];
+
+        if (kind === 's') {
+            target[last] = args[0];
+        } else if (kind === 'd') {
+            delete target[last];
+        } else if (kind === 'm') {
+            const [card, from, to, index] = args;
+            target[from] = target[from].filter(other => !sameCard(other, card));
+            target[to].splice(index, 0, card);
+        }
+    });
+    return state;
+}
+
+// Двоичный формат состояния (app/web/wire.py): байт версии, затем
+// значения с байтом тега; таблицы совпадают с серверными
+const WIRE_ATOMS = [
+    'version', 'state', 'current_street', 'current_player', 'fantasy_players', 'players',
+    'id', 'name', 'hand', 'score', 'fantasy_count', 'time_bank', 'is_ready', 'is_ai',
+    'top', 'middle', 'bottom', 'current', 'hidden', 'seq', 'ops', 'rank', 'suit',
+    'waiting', 'dealing', 'playing', 'fantasy', 'scoring', 'finished', 's', 'd', 'm',
+];
+const WIRE_RANKS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A'];
+const WIRE_SUITS = ['♥', '♦', '♣', '♠'];
+
+function decodeWire(buffer) {
+    const bytes = new Uint8Array(buffer);
+    const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+    const text = new TextDecoder();
+    if (bytes[0] !== 1) throw new Error('Unsupported wire format');
+    let pos = 1;
+    const strings = [];  // Строки кадра для повторов (тег 11)
+    const varint = () => {
+        let result = 0, scale = 1, byte;
+        do {
+            byte = bytes[pos++];
+            result += (byte & 0x7f) * scale;
+            scale *= 128;
+        } while (byte >= 0x80);
+        return result;
+    };
+    const card = (id) => ({ rank: WIRE_RANKS[id >> 2], suit: WIRE_SUITS[id & 3] });
+    const value = () => {
+        const tag = bytes[pos++];
+        switch (tag) {
+            case 0: return null;
+            case 1: return false;
+            case 2: return true;
+            case 3: {
+                const n = varint();
+                return n % 2 ? -(n + 1) / 2 : n / 2;
+            }
+            case 4: pos += 8; return view.getFloat64(pos - 8, true);
+            case 5: {
+                const size = varint();
+                pos += size;
+                strings.push(text.decode(bytes.subarray(pos - size, pos)));
+                return strings[strings.length - 1];
+            }
+            case 6: return WIRE_ATOMS[bytes[pos++]];
+            case 7: return Array.from({ length: varint() }, value);
+            case 8: {
+                const result = {};
+                for (let i = varint(); i > 0; i--) {
+                    const key = value();
+                    result[key] = value();
+                }
+                return result;
+            }
+            case 9: return card(bytes[pos++]);
+            case 10: {
+                const size = varint();
+                pos += size;
+                return Array.from(bytes.subarray(pos - size, pos), card);
+            }
+            case 11: return strings[varint()];
+        }
+        throw new Error(`Unknown wire tag ${tag}`);
+    };
+    return value();
+}
+
+// Сообщение состояния: двоичный кадр или уже разобранный JSON
+function decodePayload(payload) {
+    return payload instanceof ArrayBuffer || ArrayBuffer.isView(payload)
+        ? decodeWire(payload) : payload;
+}
+
 // Инициализация при загрузке страницы
 document.addEventListener('DOMContentLoaded', () => {
     const gameClient = new GameClient();
     const playerId = document.body.dataset.playerId;
-    gameClient.init(playerId);
+    const roomId = document.body.dataset.roomId;
+    gameClient.init(playerId, roomId);
 });
@@ -137,3 +137,62 @@ def test_progress_serialization(mccfr_agent):
     # Загружаем прогресс
     loaded_state = mccfr_agent.load_state()
     assert loaded_state is not None
+
+def test_mccfr_train_leaves_state_untouched(mccfr_agent):
+    def cards(names):
+        return [Card(name[:-1], name[-1]) for name in names]
+
+    state = GameStateInfo(
+        available_cards=[],
+        hand_cards=cards(['A♥', '2♣']),
+        top_line=cards(['Q♥', 'Q♦']),
+        middle_line=cards(['9♣', '9♦', '9♥', '2♦']),
+        bottom_line=cards(['5♠', '6♠', '8♠', 'J♠', '3♠']),
+        opponent_visible={},
+        street=5,
+        is_fantasy=False
+    )
+    hand_before = list(state.hand_cards)
+    mccfr_agent.train(state)
+
+    assert state.hand_cards == hand_before
+    assert len(state.top_line) == 2 and len(state.middle_line) == 4
+    assert mccfr_agent.strategy_sum
+    # Четыре пути ведут к двум различным конечным доскам
+    assert mccfr_agent.transpositions.hits > 0
+
+def test_rule_based_strategy_places_street_jointly():
+    def cards(names):
+        return [Card(name[:-1], name[-1]) for name in names]
+
+    strategy = RuleBasedStrategy()
+
+    def play_street(middle):
+        state = GameStateInfo(
+            available_cards=[],
+            hand_cards=cards(['2♣', '7♠', '7♦']),
+            top_line=[],
+            middle_line=cards(middle),
+            bottom_line=cards(['A♠', 'A♦']),
+            opponent_visible={},
+            street=2,
+            is_fantasy=False
+        )
+        placed = []
+        for _ in range(2):
+            action = strategy.get_action(state)
+            state.place_card(action['card'], action['position'], action['index'])
+            placed.append((action['card'].rank, action['position']))
+        return placed, state
+
+    # Без пары в середине пара наверху вела бы к мертвой руке
+    placed, _ = play_street(['9♥', '10♥', 'J♣'])
+    assert ('7', 'top') not in placed
+
+    # Пара семерок целиком уходит наверх, двойка сбрасывается
+    placed, state = play_street(['9♥', '9♣', 'J♣'])
+    assert placed == [('7', 'top'), ('7', 'top')]
+    assert [card.rank for card in state.hand_cards] == ['2']
+
+    state.hand_cards = cards(['Q♦', 'K♣', 'K♦', 'A♦', '2♥'] + ['3♣'] * 9)
+    assert strategy.get_action(state)['type'] == 'place_card'
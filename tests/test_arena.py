@@ -0,0 +1,64 @@
+import numpy as np
+from app.ai.arena import Arena, HandRunner, StrategySpec, score_boards, deal_deck
+from app.ai.strategy import RandomStrategy
+from app.game.deck import Card
+
+def cards(names):
+    return [Card(name[:-1], name[-1]) for name in names]
+
+def board(top, middle, bottom):
+    return {'top': cards(top), 'middle': cards(middle), 'bottom': cards(bottom)}
+
+def test_score_boards_handles_fouls_and_scoops():
+    strong = board(['Q♥', 'Q♦', '2♣'], ['J♠', 'J♦', '9♣', '9♥', '3♠'],
+                   ['A♠', 'K♠', '8♠', '6♠', '4♠'])
+    weak = board(['2♥', '3♦', '5♣'], ['K♥', 'J♥', '8♥', '6♦', '4♦'],
+                 ['A♥', 'A♦', '10♣', '7♥', '5♦'])
+    fouled = board(['A♣', 'A♥', '3♣'], ['K♣', '7♦', '6♣', '5♥', '2♦'],
+                   ['Q♣', 'Q♠', '10♠', '9♦', '7♠'])
+
+    points, records = score_boards([strong, weak])
+    # Три линии, бонус за все линии и роялти 1 (QQ) + 4 (флеш)
+    assert points == [3 + 3 + 5, -(3 + 3 + 5)]
+    assert records[0].fantasy and not records[1].fantasy
+
+    points, records = score_boards([weak, fouled])
+    assert records[1].fouled and records[1].royalties == 0
+    assert points[0] == 6 and points[1] == -6
+
+def test_hand_runner_plays_complete_boards_deterministically():
+    runner = HandRunner()
+    strategies = [RandomStrategy(), RandomStrategy()]
+    # Случайные стратегии зависят от глобального генератора numpy
+    np.random.seed(7)
+    first = runner.play(strategies, seed=7)
+    np.random.seed(7)
+    second = runner.play(strategies, seed=7)
+
+    assert [str(card) for card in deal_deck(7)] == [str(card) for card in deal_deck(7)]
+    assert first[0].points == -first[1].points
+    assert all(record.errors == 0 for record in first)
+    assert [record.points for record in first] == [record.points for record in second]
+
+def test_arena_duplicate_match_is_symmetric():
+    arena = Arena(workers=1, seed=3)
+    spec = StrategySpec('random')
+    result = arena.match(spec, spec, deals=5)
+
+    assert result.hands == 10
+    assert result.first_stats.hands == result.second_stats.hands == 10
+    # Одна и та же стратегия с одинаковым генератором на обоих местах:
+    # раздачи пары зеркальны, сумма очков пары равна нулю
+    assert result.points_per_hand == 0.0
+    assert result.ci95 == 0.0
+    report = result.to_dict()
+    assert 0.0 <= report['first_stats']['foul_rate'] <= 1.0
+    assert report['hands_per_second'] > 0
+
+def test_arena_rule_based_beats_random():
+    arena = Arena(workers=2, seed=1)
+    result = arena.match(StrategySpec.parse('rule'), StrategySpec.parse('random'), deals=20)
+
+    assert result.hands == 40
+    assert result.points_per_hand > 0
+    assert result.first_stats.to_dict()['foul_rate'] < result.second_stats.to_dict()['foul_rate']
@@ -0,0 +1,95 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+import pytest
+import requests
+import socketio
+from app.game.delta import apply_ops
+from app.web import wire
+
+pytest.importorskip('uvicorn')
+pytest.importorskip('asgiref')
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Не дождались события"
+        time.sleep(0.02)
+
+@pytest.fixture
+def server_url(tmp_path):
+    """ASGI-приложение под uvicorn в отдельном процессе"""
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    env = dict(os.environ, JOURNAL_DIR='', SOCKETIO_BATCH_INTERVAL='0.01',
+               PYTHONPATH=os.pathsep.join(sys.path))
+    process = subprocess.Popen([sys.executable, '-m', 'uvicorn', '--factory',
+                                'app.asgi:create_asgi_app', '--port', str(port),
+                                '--log-level', 'warning', '--timeout-graceful-shutdown', '1'],
+                               cwd=tmp_path, env=env)
+    url = f'http://127.0.0.1:{port}'
+
+    def ready() -> bool:
+        try:
+            return requests.get(f'{url}/tables', timeout=1).ok
+        except requests.ConnectionError:
+            assert process.poll() is None, "Сервер не запустился"
+            return False
+
+    try:
+        wait_for(ready, timeout=60.0)
+        yield url
+    finally:
+        process.terminate()
+        process.wait(30)
+
+def test_asgi_server_drives_tables(server_url):
+    views, seqs, clients = {}, {}, {}
+
+    def on_state(name, decode):
+        def handle(payload):
+            snapshot = decode(payload)
+            views[name], seqs[name] = snapshot['state'], snapshot['seq']
+
+        def handle_deltas(payload):
+            for delta in decode(payload):
+                if delta['seq'] == seqs[name] + 1:
+                    views[name] = apply_ops(views[name], delta['ops'])
+                    seqs[name] = delta['seq']
+        return handle, handle_deltas
+
+    try:
+        for name, encoding, decode in (('a', 'binary', wire.decode),
+                                       ('b', 'json', lambda payload: payload)):
+            client = socketio.Client()
+            handle, handle_deltas = on_state(name, decode)
+            client.on('game_state', handle)
+            client.on('state_deltas', handle_deltas)
+            client.connect(server_url, transports=['polling'], wait_timeout=10)
+            client.emit('join_game', {'player_id': f'asgi-{name}', 'room': 'asgi',
+                                      'encoding': encoding})
+            clients[name] = client
+            wait_for(lambda: name in views)
+
+        # Страницы и HTTP API - приложение Flask в том же сервере
+        assert requests.post(f'{server_url}/start', json={'room': 'asgi'}).json() == \
+            {'status': 'success'}
+        for client in clients.values():
+            client.emit('sync', {})     # Без since - свежий снимок
+        wait_for(lambda: all(view['state'] == 'dealing' for view in views.values()))
+
+        mover = views['a']['current_player']
+        name = mover[len('asgi-'):]
+        cards = views[name]['players'][mover]['hand']['current']
+        clients[name].emit('submit_street', {'placements': [
+            {'card': card, 'position': 'bottom', 'index': 0} for card in cards]})
+        wait_for(lambda: all(view['current_player'] != mover for view in views.values()))
+        for view in views.values():
+            assert len(view['players'][mover]['hand']['bottom']) == 5
+    finally:
+        for client in clients.values():
+            # Без ожидания длинного опроса (polling) до интервала ping
+            client.eio.disconnect(abort=True)
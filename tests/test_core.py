@@ -0,0 +1,198 @@
+import asyncio
+import random
+import time
+from app.game.core import GameCore, GameState
+from app.game.game import Game
+from app.game.player import Player, PlayerManager
+from app.game.deck import Card
+from app.ai.state import ActionSpace
+
+class FirstPlacementAgent:
+    """Агент, кладущий первую карту в первую свободную линию"""
+    space = ActionSpace()
+
+    def get_action(self, state, deadline=None):
+        return self.space.get_placements(state)[0]
+
+def make_core(seed, count=2):
+    players = PlayerManager()
+    for i in range(count):
+        players.add_player(Player(f"p{i}", f"Player {i}"))
+    return GameCore(players, random.Random(seed))
+
+def boards(core):
+    return [[str(card) for position in ('top', 'middle', 'bottom')
+             for card in getattr(player.hand, position)]
+            for player in core.players.values()]
+
+def test_core_plays_full_hand_synchronously():
+    core = make_core(seed=1, count=3)
+    agents = {player_id: FirstPlacementAgent() for player_id in core.players}
+    result = core.play_hand(agents)
+
+    assert core.state == GameState.FINISHED
+    assert all(player.hand.is_complete() for player in core.players.values())
+    assert sum(result.scores.values()) == 0
+    # 5 карт первой улицы и по 2 на четырех следующих
+    assert result.decisions == 3 * 13
+    assert all(count == 0 for count in result.errors.values())
+
+def test_core_is_deterministic_for_seed():
+    first, second = make_core(seed=7), make_core(seed=7)
+    agents = {player_id: FirstPlacementAgent() for player_id in first.players}
+    first.play_hand(agents)
+    second.play_hand(agents)
+    assert boards(first) == boards(second)
+
+def test_core_replaces_invalid_actions_and_deals_fantasy():
+    class BrokenAgent:
+        def get_action(self, state, deadline=None):
+            return {'type': 'place_card', 'card': Card('A', '♠'), 'position': 'nowhere',
+                    'index': 0}
+
+    core = make_core(seed=3)
+    result = core.play_hand({'p0': BrokenAgent(), 'p1': FirstPlacementAgent()})
+    assert result.errors['p0'] == 13 and result.errors['p1'] == 0
+
+    # Игрок с фантазией получает 14 карт и расставляет их за одну улицу
+    core.fantasy_players = ['p0']
+    core.start_hand()
+    assert core.state == GameState.FANTASY
+    assert len(core.players['p0'].hand.current_cards) == 14
+    assert len(core.players['p1'].hand.current_cards) == 5
+
+def test_core_throughput():
+    core = make_core(seed=5)
+    agents = {player_id: FirstPlacementAgent() for player_id in core.players}
+    started = time.monotonic()
+    for _ in range(200):
+        core.play_hand(agents)
+    assert 200 / (time.monotonic() - started) > 200
+
+def test_game_adapter_restarts_timer_on_turn_change():
+    async def scenario():
+        game = Game()
+        for i in range(2):
+            game.player_manager.add_player(Player(f"p{i}", f"Player {i}"))
+        await game.start_game()
+        assert game.state == GameState.DEALING and game.turn_timer is not None
+
+        first = game.current_player_id
+        player = game.player_manager.get_player(first)
+        timer = game.turn_timer
+        for card in list(player.hand.current_cards):
+            line = 'bottom' if len(player.hand.bottom) < 5 else 'middle'
+            assert await game.handle_player_action(
+                first, {'type': 'place_card', 'card': card.to_dict(), 'position': line,
+                        'index': 0})
+
+        # Улица первого игрока закончена: ход и таймер переходят ко второму
+        assert game.current_player_id != first
+        assert game.turn_timer is not timer
+        assert not timer.active and game.turn_timer.active
+        game.stop_turn_timer()
+
+    asyncio.run(scenario())
+
+def test_disconnect_passes_turn_without_waiting_for_timer():
+    from app.game.journal import restore_core, snapshot_core
+
+    async def scenario():
+        game = Game()
+        for i in range(2):
+            game.player_manager.add_player(Player(f"p{i}", f"Player {i}"))
+        await game.start_game()
+        mover = game.current_player_id
+        other = next(player_id for player_id in game.player_manager.players
+                     if player_id != mover)
+
+        # Отключение в чужой ход: карты не трогаются до хода игрока
+        assert await game.handle_disconnect(other)
+        assert game.current_player_id == mover
+        assert len(game.player_manager.get_player(other).hand.current_cards) == 5
+        player = game.player_manager.get_player(mover)
+        assert await game.handle_player_action(mover, {'type': 'submit_street', 'placements': [
+            {'card': card.to_dict(), 'position': 'bottom', 'index': 0}
+            for card in player.hand.current_cards]})
+        # Ход отключившегося не ждет таймера: его улица расставлена сразу
+        assert game.current_street == 2 and game.current_player_id == mover
+        assert game.turn_timer.args[0].id == mover
+        hand = game.player_manager.get_player(other).hand
+        assert len(hand.top) + len(hand.middle) + len(hand.bottom) >= 5
+
+        # Отключение в свой ход: ход сразу переходит дальше
+        game.core.set_away(other, False)
+        assert await game.handle_disconnect(mover)
+        assert game.current_player_id == other and game.turn_timer.args[0].id == other
+        assert len(player.hand.current_cards) == 1
+
+        # Отметка отключения переходит в состояние другого процесса
+        assert restore_core(snapshot_core(game.core)).away == [mover]
+        game.stop_turn_timer()
+
+    asyncio.run(scenario())
+
+def test_stale_timeout_is_dropped_after_core_replacement():
+    from app.game.journal import restore_core, snapshot_core
+
+    async def scenario():
+        # Два процесса с общим состоянием стола (как через Redis)
+        first, second = Game(), Game()
+        for i in range(2):
+            second.player_manager.add_player(Player(f"p{i}", f"Player {i}"))
+        await second.start_game()
+        mover = second.current_player_id
+        stale = second._turn_serial
+
+        first.replace_core(restore_core(snapshot_core(second.core)))
+        for _ in range(2):
+            player_id = first.current_player_id
+            cards = first.player_manager.get_player(player_id).hand.current_cards
+            assert await first.handle_player_action(player_id, {
+                'type': 'submit_street',
+                'placements': [{'card': card.to_dict(), 'position': 'bottom', 'index': 0}
+                               for card in cards]})
+        assert first.current_street == 2 and first.current_player_id == mover
+
+        # Таймаут первой улицы, ожидавший блокировку, не трогает вторую
+        second.replace_core(restore_core(snapshot_core(first.core)))
+        await second.handle_turn_timeout(second.player_manager.get_player(mover), stale)
+        assert len(second.player_manager.get_player(mover).hand.current_cards) == 3
+        first.stop_turn_timer()
+        second.stop_turn_timer()
+
+    asyncio.run(scenario())
+
+def test_core_submits_street_atomically():
+    core = make_core(seed=9)
+    core.start_game()
+    player_id = core.current_player_id
+    hand = core.players[player_id].hand
+    cards = [card.to_dict() for card in hand.current_cards]
+    street = [{'card': card, 'position': position, 'index': 0}
+              for card, position in zip(cards, ('top', 'middle', 'middle', 'bottom', 'bottom'))]
+    version = core.version
+
+    # Повтор карты, чужая карта, переполнение линии, неполная улица -
+    # рука не меняется
+    for placements in (street[:4] + street[:1],
+                       street[:4] + [dict(street[4], card={'rank': 'A', 'suit': 'X'})],
+                       [dict(placement, position='top') for placement in street],
+                       street[:4]):
+        assert not core.submit_street(player_id, placements)
+    assert len(hand.current_cards) == 5 and core.version == version
+
+    assert core.submit_street(player_id, street)
+    assert [len(hand.top), len(hand.middle), len(hand.bottom)] == [1, 2, 2]
+    assert core.current_player_id != player_id
+    # Следующие улицы: две карты из трех, третья сбрасывается
+    other = core.current_player_id
+    others = [card.to_dict() for card in core.players[other].hand.current_cards]
+    assert core.submit_street(other, [{'card': card, 'position': 'bottom', 'index': 0}
+                                      for card in others])
+    assert core.state == GameState.PLAYING and core.current_street == 2
+    current = [card.to_dict() for card in hand.current_cards]
+    assert not core.submit_street(player_id, [{'card': card, 'position': 'top', 'index': 1}
+                                              for card in current])
+    assert core.submit_street(player_id, [{'card': card, 'position': 'top', 'index': 1}
+                                          for card in current[:2]])
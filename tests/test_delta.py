@@ -0,0 +1,101 @@
+import json
+import random
+from app.game.delta import StateStream, diff_states, apply_ops, MOVE, SET
+from app.game.core import GameCore, IN_PROGRESS
+from app.game.player import Player, PlayerManager
+from app.game.registry import GameRegistry
+
+def encoded(state):
+    return json.loads(json.dumps(state))
+
+def play_states(seed):
+    """Состояния игроков после каждого действия раздачи, включая снятия карт"""
+    players = PlayerManager()
+    for i in range(2):
+        players.add_player(Player(f"p{i}", f"Player {i}"))
+    core = GameCore(players, random.Random(seed))
+    rng = random.Random(seed)
+
+    def state():
+        return encoded({'version': core.version, 'state': core.state,
+                        'players': {pid: p.to_dict() for pid, p in core.players.items()}})
+
+    core.start_hand()
+    states = [state()]
+    while core.state in IN_PROGRESS:
+        player_id = core.current_player_id
+        actions = core.action_space.get_placements(core.get_state_info(player_id))
+        core.apply_action(player_id, rng.choice(actions))
+        player = core.players[player_id]
+        if rng.random() < 0.2 and player.hand.bottom and not core.is_street_completed(player):
+            core.apply_action(player_id, {'type': 'remove_card', 'position': 'bottom',
+                                          'index': 0})
+        states.append(state())
+    return states
+
+def test_diff_reproduces_every_step_of_a_hand():
+    states = play_states(seed=3)
+    moves = 0
+    for old, new in zip(states, states[1:]):
+        ops = diff_states(old, new)
+        assert apply_ops(old, ops) == new
+        moves += sum(op[0] == MOVE for op in ops)
+    assert moves >= 26
+
+    # Ход одной картой: перемещение и новая версия вместо всего состояния
+    ops = diff_states(states[0], states[1])
+    assert [op[0] for op in ops] == [SET, MOVE]
+    assert len(json.dumps(ops)) * 5 < len(json.dumps(states[1]))
+
+def test_stream_numbers_deltas_and_serves_gaps():
+    states = play_states(seed=5)
+    stream = StateStream(history=4)
+    first = stream.publish(states[0])
+    assert first == {'seq': 1, 'ops': [[SET, [], states[0]]]}
+    assert stream.publish(states[0]) is None
+
+    client = {'seq': 1, 'state': states[0]}
+    messages = [stream.publish(state) for state in states[1:7]]
+    assert [message['seq'] for message in messages] == list(range(2, 8))
+
+    # Клиент видел только первую дельту: история хранит 4 последних
+    assert stream.since(client['seq']) is None
+    snapshot = stream.snapshot()
+    assert snapshot['seq'] == 7 and snapshot['state'] is states[6]
+
+    client = {'seq': 5, 'state': states[4]}
+    for message in stream.since(client['seq']):
+        client['state'] = apply_ops(client['state'], message['ops'])
+    assert client['state'] == states[6] and stream.since(7) == []
+
+def test_registry_publishes_deltas_per_role():
+    registry = GameRegistry(max_players=2)
+    try:
+        for i in range(2):
+            registry.join('room', Player(f"p{i}", f"Player {i}"))
+        registry.call('room', lambda game: game.start_game())
+        messages, snapshot = registry.snapshot('room', 'p0')
+        # Роли: два места и наблюдатели
+        assert set(messages) == {None, 'p0', 'p1'}
+        assert snapshot['seq'] == 1 and registry.publish('room') == {}
+
+        game = registry.get('room').game
+        player = game.player_manager.get_player(game.current_player_id)
+        other = next(pid for pid in game.player_manager.players if pid != player.id)
+        card = player.hand.current_cards[0].to_dict()
+        before = registry.snapshot('room', player.id)[1]['state']
+        registry.call('room', lambda game: game.handle_player_action(
+            player.id, {'type': 'place_card', 'card': card, 'position': 'top', 'index': 0}))
+
+        messages = registry.publish('room')
+        path = ['players', player.id, 'hand']
+        assert [MOVE, path, card, 'current', 'top', 0] in messages[player.id]['ops']
+        # Остальные видят карту на линии и уменьшившееся число скрытых карт
+        for role in (other, None):
+            ops = messages[role]['ops']
+            assert [SET, path + ['top'], [card]] in ops
+            assert [SET, path + ['hidden'], 4] in ops
+
+        assert apply_ops(before, messages[player.id]['ops']) == encoded(game.get_view(player.id))
+    finally:
+        registry.close()
@@ -0,0 +1,97 @@
+from itertools import combinations, permutations
+import time
+import numpy as np
+from app.ai.endgame import EndgameSolver, canonical_key, permute_suits
+from app.ai.search_state import card_mask
+from app.ai.strategy import MCTSStrategy
+from app.ai.state import GameStateInfo
+from app.ai.batch_eval import settle_board
+from app.game.deck import Card
+from tests.test_search import make_state
+
+def index(cards):
+    return [GameStateInfo._card_to_index(card) for card in cards]
+
+def best_completion(lines, hand, place_count):
+    """Перебор размещений place_count карт руки в свободные места"""
+    free = [3 - len(lines[0]), 5 - len(lines[1]), 5 - len(lines[2])]
+    best = -np.inf
+    for cards in combinations(hand, place_count):
+        for targets in np.ndindex(*(3,) * place_count):
+            if any(targets.count(line) > free[line] for line in range(3)):
+                continue
+            board = [list(line) for line in lines]
+            for card, line in zip(cards, targets):
+                board[line].append(card)
+            best = max(best, settle_board(*board))
+    return best
+
+def test_canonical_key_ignores_suit_names():
+    lines = [card_mask([0, 5]), card_mask([10, 14, 18]), card_mask([51])]
+    keys = {canonical_key([permute_suits(mask, permutation) for mask in lines])
+            for permutation in permutations(range(4))}
+    assert len(keys) == 1
+    # Другой набор рангов дает другой ключ
+    assert canonical_key([card_mask([0, 4]), lines[1], lines[2]]) not in keys
+
+def test_endgame_last_street_matches_brute_force():
+    state = make_state(['A♠', '3♦', '7♥'], top=['Q♥', 'Q♦', '4♣'],
+                       middle=['9♣', '9♦', '2♥', '2♦'],
+                       bottom=['5♠', '6♠', '8♠', 'J♠'], street=5)
+    solution = EndgameSolver().solve(state)
+
+    lines = [index(state.top_line), index(state.middle_line), index(state.bottom_line)]
+    assert solution.value == best_completion(lines, index(state.hand_cards), 2)
+    assert ('A', 'bottom') in [(a['card'].rank, a['position']) for a in solution.actions]
+
+def test_endgame_expectimax_matches_brute_force():
+    # Маленькая колода, чтобы перебрать все раздачи последней улицы вручную
+    state = make_state(['K♣', '4♦', 'J♥'], top=['Q♥', '3♣'],
+                       middle=['9♣', '9♦', '2♥'],
+                       bottom=['5♠', '6♠', '8♠', '10♦'], street=4)
+    state.available_cards = [Card(rank, suit) for rank, suit in
+                             [('Q', '♠'), ('7', '♠'), ('9', '♥'), ('2', '♣'), ('A', '♦')]]
+    solution = EndgameSolver().solve(state)
+
+    lines = [index(state.top_line), index(state.middle_line), index(state.bottom_line)]
+    hand, deck = index(state.hand_cards), index(state.available_cards)
+    free = [3 - len(lines[0]), 5 - len(lines[1]), 5 - len(lines[2])]
+    best = -np.inf
+    for cards in combinations(hand, 2):
+        for targets in np.ndindex(3, 3):
+            if any(targets.count(line) > free[line] for line in range(3)):
+                continue
+            board = [list(line) for line in lines]
+            for card, line in zip(cards, targets):
+                board[line].append(card)
+            value = np.mean([best_completion(board, deal, 2) for deal in combinations(deck, 3)])
+            best = max(best, value)
+
+    assert np.isclose(solution.value, best)
+    assert len(solution.actions) == 2
+
+def test_endgame_skips_early_streets_and_reuses_memo():
+    solver = EndgameSolver()
+    assert solver.solve(make_state(['A♥', 'K♦', '2♣'], middle=['9♣', '9♦'])) is None
+
+    state = make_state(['K♣', '4♦', 'J♥'], top=['Q♥', '3♣'], middle=['9♣', '9♦', '2♥'],
+                       bottom=['5♠', '6♠', '8♠', '10♦'], street=4)
+    first = solver.solve(state)
+    action = first.actions[0]
+    state.place_card(action['card'], action['position'], action['index'])
+    second = solver.solve(state)
+
+    # Второе размещение улицы использует ожидания первого вызова
+    assert second.memo_hits > 0 and second.boards == 0
+    assert np.isclose(second.value, first.value)
+
+def test_mcts_delegates_late_streets_to_endgame_solver():
+    strategy = MCTSStrategy(simulation_count=200)
+    state = make_state(['K♣', '4♦', 'J♥'], top=['Q♥', '3♣'], middle=['9♣', '9♦', '2♥'],
+                       bottom=['5♠', '6♠', '8♠', '10♦'], street=4)
+    started = time.monotonic()
+    action = strategy.get_action(state)
+
+    assert time.monotonic() - started < 1.0
+    assert strategy.last_stats.simulations == 0
+    assert action == strategy.last_endgame.actions[0]
@@ -0,0 +1,25 @@
+from app.web.events import Connections, player_action
+from app.web.rooms import BINARY, view_room
+
+def test_connections_track_rooms_and_format():
+    connections = Connections()
+    connections.negotiate('s1', 'binary')
+    leave, join = connections.enter('s1', 'room', None)
+    assert leave == [] and join == ['room', view_room('room', None) + BINARY]
+
+    # Смена роли: соединение покидает комнаты прежней роли в обоих форматах
+    connections.negotiate('s1', 'json')
+    leave, join = connections.enter('s1', 'room', 'p0')
+    assert leave == ['room', view_room('room', None), view_room('room', None) + BINARY]
+    assert join == ['room', view_room('room', 'p0')]
+    assert connections.encode('s1', {'a': 1}) == {'a': 1}
+
+    assert connections.drop('s1') == ('room', 'p0')
+    assert connections.drop('s1') == (None, None)
+
+def test_player_action_takes_event_fields():
+    data = {'card': {'rank': 'A', 'suit': '♠'}, 'position': 'top', 'index': 0, 'extra': 1}
+    assert player_action('place_card', data) == {
+        'type': 'place_card', 'card': data['card'], 'position': 'top', 'index': 0}
+    assert player_action('remove_card', data) == {
+        'type': 'remove_card', 'position': 'top', 'index': 0}
@@ -0,0 +1,63 @@
+from flask import Flask
+from flask_socketio import SocketIO, join_room
+from app.game.delta import apply_ops
+from app.game.player import Player
+from app.web.fanout import LocalMessageQueue
+from app.web.rooms import view_room
+
+def test_table_events_reach_clients_of_every_worker():
+    from app import create_app, socketio, registry
+    from app.web import socket
+    app = create_app({'TESTING': True, 'SECRET_KEY': 'test',
+                      'SOCKETIO_MESSAGE_QUEUE': 'memory://fanout'})
+    queue = socketio.server.manager
+    assert isinstance(queue, LocalMessageQueue)
+
+    # Второй процесс: свой сервер Socket.IO на том же канале очереди
+    other_app = Flask('other')
+    remote_queue = LocalMessageQueue('fanout')
+    other = SocketIO(other_app, async_mode='threading', client_manager=remote_queue)
+
+    @other.on('watch')
+    def watch(data):
+        join_room(view_room(data['room'], None))
+
+    player = socketio.test_client(app)
+    remote = other.test_client(other_app)
+    try:
+        remote.emit('watch', {'room': 'fan'})
+        player.emit('join_game', {'player_id': 'fan-a', 'room': 'fan'})
+        registry.join('fan', Player('fan-b', 'Player B'))
+        registry.call('fan', lambda game: game.start_game())
+
+        # Дельты тика копятся и уходят одним сообщением очереди на комнату
+        socket.batcher.interval = 60.0
+        published = queue.published
+        game = registry.get('fan').game
+        mover = game.current_player_id
+        for card in list(game.player_manager.get_player(mover).hand.current_cards)[:3]:
+            registry.call('fan', lambda game: game.handle_player_action(
+                mover, {'type': 'place_card', 'card': card.to_dict(), 'position': 'bottom',
+                        'index': 0}))
+            socket.publish_update('fan', registry.publish('fan'))
+        assert queue.published == published
+        # Две роли игроков и наблюдатели, каждая в JSON и двоичном формате
+        assert socket.batcher.flush() == 6
+        assert queue.published == published + 6
+
+        view = None
+        seqs = []
+        for event in remote.get_received():
+            assert event['name'] == 'state_deltas'
+            for delta in event['args'][0]:
+                seqs.append(delta['seq'])
+                view = apply_ops(view or {}, delta['ops'])
+        assert seqs == list(range(1, len(seqs) + 1)) and len(seqs) >= 4
+        assert view == registry.call('fan', lambda game: game.get_view(None))
+    finally:
+        socket.batcher.interval = 0.0
+        player.disconnect()
+        remote.disconnect()
+        queue.close()
+        remote_queue.close()
+        registry.evict('fan')
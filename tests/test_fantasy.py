@@ -0,0 +1,63 @@
+import itertools
+import pytest
+import numpy as np
+from app.ai.fantasy import FantasySolver
+from app.ai.batch_eval import settle_boards
+from app.ai.state import GameStateInfo
+from app.game.evaluator import HandEvaluator
+from app.game.deck import Card, Deck
+
+def cards(names):
+    return [Card(name[:-1], name[-1]) for name in names]
+
+def exhaustive_best(hand):
+    """Лучшая оценка полным перебором всех расстановок 13 карт"""
+    ids = np.array([GameStateInfo._card_to_index(card) for card in hand])
+    rows = []
+    for bottom in itertools.combinations(range(13), 5):
+        rest = [i for i in range(13) if i not in bottom]
+        for middle in itertools.combinations(rest, 5):
+            top = [i for i in rest if i not in middle]
+            rows.append((top, list(middle), list(bottom)))
+    top, middle, bottom = (ids[[row[i] for row in rows]] for i in range(3))
+    value, _, _ = settle_boards(top, middle, bottom)
+    return value.max()
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_solver_matches_exhaustive_search(seed):
+    rng = np.random.default_rng(seed)
+    deck = [Card(rank, suit) for suit in Deck.SUITS for rank in Deck.RANKS]
+    hand = [deck[i] for i in rng.permutation(52)[:13]]
+
+    solution = FantasySolver().solve(hand)
+    assert solution.value == pytest.approx(exhaustive_best(hand))
+    assert solution.discards == []
+
+def test_solver_avoids_foul_and_discards_one_card():
+    hand = cards(['A♥', 'A♦', 'A♣', 'K♠', 'K♥', 'Q♠', 'Q♦', '7♣', '7♦',
+                  '2♠', '5♥', '9♣', 'J♦', '3♦'])
+    solution = FantasySolver().solve(hand)
+
+    assert len(solution.discards) == 1
+    assert (len(solution.top), len(solution.middle), len(solution.bottom)) == (3, 5, 5)
+    categories = [HandEvaluator.evaluate_line(line)[0]
+                  for line in (solution.top, solution.middle, solution.bottom)]
+    assert categories == sorted(categories)
+    assert solution.elapsed < 1.0
+
+    placed = solution.top + solution.middle + solution.bottom + solution.discards
+    assert sorted(map(str, placed)) == sorted(map(str, hand))
+
+def test_refantasy_bonus_keeps_queens_on_top():
+    hand = cards(['Q♥', 'Q♦', '9♠', '9♥', '9♦', '4♣', '4♦', '7♠', '8♠',
+                  '10♠', 'J♠', '2♠', '3♥', '6♦'])
+    plain = FantasySolver().solve(hand)
+    greedy = FantasySolver(refantasy_bonus=20.0).solve(hand)
+
+    assert greedy.refantasy
+    assert sorted(card.rank for card in greedy.top).count('Q') == 2
+    assert greedy.value >= plain.value
+
+def test_solver_requires_thirteen_cards():
+    with pytest.raises(ValueError):
+        FantasySolver().solve(cards(['A♥', 'K♦']))
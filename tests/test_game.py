@@ -1,5 +1,9 @@
 import pytest
+import asyncio
+import json
+import time
 from app.game.game import Game, GameState
+from app.ai.state import ActionSpace
 from app.game.player import Player
 from app.game.deck import Card
 
@@ -116,3 +120,159 @@ def test_scoring(game, players):
     game.end_game()
     
     assert player1.score != 0 or player2.score != 0
+
+class FirstPlacementAgent:
+    """Агент, кладущий первую карту в первую свободную линию"""
+    def __init__(self):
+        self.deadlines = []
+
+    def get_action(self, state, deadline=None):
+        self.deadlines.append(deadline)
+        return ActionSpace().get_placements(state)[0]
+
+def test_ai_turn_places_street_within_time_bank(game):
+    ai_player = Player("bot", "Bot", is_ai=True)
+    game.player_manager.add_player(ai_player)
+    game.player_manager.add_player(Player("player1", "Player 1"))
+    game.current_street = 1
+    ai_player.add_cards(game.deck.draw(5))
+    game.ai_agent = FirstPlacementAgent()
+
+    asyncio.run(game.handle_ai_turn(ai_player))
+
+    assert ai_player.hand.current_cards == []
+    assert len(game.ai_agent.deadlines) == 5
+    assert all(deadline <= time.monotonic() + ai_player.time_bank
+               for deadline in game.ai_agent.deadlines)
+
+def test_slow_ai_does_not_block_loop_and_falls_back(game):
+    class SlowAgent:
+        def get_action(self, state, deadline=None):
+            time.sleep(max(deadline - time.monotonic(), 0) + 0.5)
+            return ActionSpace().get_placements(state)[0]
+
+    ai_player = Player("bot", "Bot", is_ai=True)
+    game.player_manager.add_player(ai_player)
+    game.player_manager.add_player(Player("player1", "Player 1"))
+    game.current_street = 2
+    ai_player.add_cards(game.deck.draw(3))
+    game.ai_agent = SlowAgent()
+    game.AI_TURN_TIME_LIMIT = 0.4    # По 0.2 с на каждую из двух карт улицы
+    game.AI_TIME_MARGIN = 0.0
+
+    async def run():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        started = time.monotonic()
+        await game.handle_ai_turn(ai_player)
+        ticker.cancel()
+        return ticks, time.monotonic() - started
+
+    ticks, elapsed = asyncio.run(run())
+    # Пока агент думал, цикл обслуживал другие задачи; после дедлайна
+    # улица расставлена эвристикой
+    assert ticks >= 10 and elapsed < 0.6
+    assert len(ai_player.hand.current_cards) == 1
+    assert game.decisions.timeouts == 1
+
+def test_state_info_hides_unseen_cards(game, players):
+    for player in players:
+        game.player_manager.add_player(player)
+    players[0].add_cards(game.deck.draw(5))
+    players[1].hand.bottom = game.deck.draw(2)
+
+    state = game.get_state_info(players[0].id)
+    assert len(state.hand_cards) == 5
+    assert len(state.available_cards) == 52 - 7
+    assert state.opponent_visible[players[1].id] == players[1].hand.bottom
+
+def test_ai_fantasy_turn_arranges_all_cards(game):
+    ai_player = Player("bot", "Bot", is_ai=True)
+    game.player_manager.add_player(ai_player)
+    game.player_manager.add_player(Player("player1", "Player 1"))
+    game.fantasy_players = [ai_player.id]
+    game.current_street = 1
+    ai_player.add_cards(game.deck.draw(14))
+
+    started = time.monotonic()
+    asyncio.run(game.handle_ai_turn(ai_player))
+
+    assert time.monotonic() - started < 1.0
+    assert ai_player.hand.is_complete()
+    assert len(ai_player.hand.current_cards) == 1
+    assert game.is_street_completed(ai_player)
+
+def test_auto_complete_turn_uses_placer(game, players):
+    for player in players:
+        game.player_manager.add_player(player)
+    player = players[0]
+    game.current_player_id = player.id
+    game.current_street = 5
+    player.hand.top = [Card('9', '♦'), Card('5', '♣')]
+    player.hand.middle = [Card('K', '♣'), Card('J', '♦'), Card('8', '♥'),
+                          Card('6', '♠'), Card('4', '♣')]
+    player.hand.bottom = [Card('A', '♠'), Card('A', '♦'), Card('10', '♣'),
+                          Card('10', '♥'), Card('7', '♣')]
+    player.add_cards([Card('9', '♠'), Card('2', '♥'), Card('3', '♦')])
+
+    assert game.auto_place(player)
+    assert player.hand.is_complete()
+    assert game.is_street_completed(player)
+    assert player.hand.top[-1].rank != '9'
+
+def test_game_state_is_cached_until_mutation(game, players):
+    async def scenario():
+        for player in players:
+            game.player_manager.add_player(player)
+        await game.start_game()
+
+        state = game.get_game_state()
+        payload = game.get_game_state_json()
+        assert game.get_game_state() is state and game.get_game_state_json() is payload
+        assert json.loads(payload) == state
+
+        player = game.player_manager.get_player(game.current_player_id)
+        card = player.hand.current_cards[0]
+        assert not await game.handle_player_action(player.id, {'type': 'unknown'})
+        assert game.get_game_state() is state
+
+        assert await game.handle_player_action(
+            player.id, {'type': 'place_card', 'card': card.to_dict(), 'position': 'bottom',
+                        'index': 0})
+        updated = game.get_game_state()
+        assert updated['version'] > state['version']
+        assert len(updated['players'][player.id]['hand']['bottom']) == 1
+
+        # Изменения в обход методов ядра тоже меняют версию
+        version = game.version
+        game.auto_place(player)
+        assert game.version > version
+        game.stop_turn_timer()
+
+    asyncio.run(scenario())
+
+def test_views_hide_other_hands_and_are_shared_per_role(game, players):
+    for player in players:
+        game.player_manager.add_player(player)
+    game.core.start_game()
+    first, second = players
+
+    view = game.get_view(first.id)
+    assert game.get_view(first.id) is view
+    assert len(view['players'][first.id]['hand']['current']) == 5
+    assert view['players'][second.id]['hand']['current'] == []
+    assert view['players'][second.id]['hand']['hidden'] == 5
+
+    # Все наблюдатели получают один и тот же объект; полное состояние не меняется
+    spectator = game.get_view(None)
+    assert game.get_view('someone') is spectator
+    assert all(player['hand']['current'] == [] for player in spectator['players'].values())
+    assert len(game.get_game_state()['players'][second.id]['hand']['current']) == 5
+    assert json.loads(game.get_view_json(second.id)) == game.get_view(second.id)
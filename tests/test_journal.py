@@ -0,0 +1,123 @@
+import os
+import random
+import threading
+from app.game.journal import Journal, decode_records, encode_record, read_log
+from app.game.core import GameCore, GameState
+from app.game.player import Player
+from app.game.registry import GameRegistry
+
+def play_hands(registry, room_id, seed, hands=1):
+    """Раздачи стола: действия игроков вперемешку с расстановкой по таймауту
+    (раздача фантазии не доигрывается: start_game ее сбрасывает)"""
+    rng = random.Random(seed)
+    for _ in range(hands):
+        registry.call(room_id, lambda game: game.start_game())
+        game = registry.get(room_id).game
+        while game.state in (GameState.DEALING, GameState.PLAYING):
+            player = game.player_manager.get_player(game.current_player_id)
+            if rng.random() < 0.3:
+                def timeout(game):
+                    game.core.note('timeout', player.id)
+                    return game.auto_complete_turn(player)
+                registry.call(room_id, timeout)
+                continue
+            actions = game.core.action_space.get_placements(game.get_state_info(player.id))
+            action = dict(rng.choice(actions), card=rng.choice(actions)['card'])
+            registry.call(room_id, lambda game: game.handle_player_action(player.id, action))
+
+def comparable(game):
+    state = dict(game.get_game_state())
+    del state['version']
+    return state
+
+def test_recovery_replays_tables_after_restart(tmp_path):
+    journal = Journal(str(tmp_path), snapshot_every=40)
+    registry = GameRegistry(max_players=2, journal=journal)
+    states = {}
+    for room_id, seed in (('a', 1), ('b/2', 2)):
+        for i in range(2):
+            registry.join(room_id, Player(f"{room_id}-p{i}", f"Player {i}"))
+        play_hands(registry, room_id, seed, hands=2)
+        game = registry.get(room_id).game
+        # Вторая раздача остается незаконченной
+        registry.call(room_id, lambda game: game.start_game())
+        for _ in range(3):
+            player_id = game.current_player_id
+            actions = game.core.action_space.get_placements(game.get_state_info(player_id))
+            registry.call(room_id, lambda game: game.handle_player_action(player_id, actions[0]))
+        registry.call(room_id, lambda game: game.core.set_time_bank(player_id, 12.5))
+        states[room_id] = comparable(game)
+    registry.close()
+    assert os.path.exists(tmp_path / 'a.snap')
+
+    # Недописанный кадр в конце журнала отбрасывается
+    with open(tmp_path / 'a.log', 'ab') as f:
+        f.write(encode_record('next_turn', None, ())[:-1])
+
+    restored = GameRegistry(max_players=2, journal=Journal(str(tmp_path)))
+    try:
+        assert sorted(restored.recover()) == ['a', 'b/2']
+        for room_id, state in states.items():
+            game = restored.get(room_id).game
+            assert comparable(game) == state
+            assert game.turn_timer is not None and game.turn_timer.active
+            assert restored.room_of(f"{room_id}-p0") == room_id
+        _, end = decode_records(open(tmp_path / 'a.log', 'rb').read())
+        assert end == os.path.getsize(tmp_path / 'a.log')
+
+        # Восстановленный стол продолжает игру и журнал
+        game = restored.get('a').game
+        player_id = game.current_player_id
+        actions = game.core.action_space.get_placements(game.get_state_info(player_id))
+        assert restored.call('a', lambda game: game.handle_player_action(player_id, actions[0]))
+    finally:
+        restored.close()
+
+    again = Journal(str(tmp_path)).recover()
+    assert again['a'].players[player_id].hand.to_dict() == \
+        game.player_manager.get_player(player_id).hand.to_dict()
+
+def test_group_commit_batches_fsync_across_tables(tmp_path):
+    journal = Journal(str(tmp_path))
+    core = GameCore()
+    logs = [journal.open(f"t{i}") for i in range(20)]
+
+    def write(log):
+        for _ in range(200):
+            log.record('next_turn', core, ())
+
+    threads = [threading.Thread(target=write, args=(log,)) for log in logs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert journal.wait(10)
+    # Записи, пришедшие во время fsync, уходят на диск одной группой
+    assert journal.commits < 20 * 200 / 2
+    for log in logs:
+        assert len(list(read_log(log.path))) == 200
+        log.close()
+    journal.close()
+
+def test_hand_histories_cover_archived_tables(tmp_path):
+    journal = Journal(str(tmp_path))
+    registry = GameRegistry(max_players=2, journal=journal)
+    try:
+        for i in range(2):
+            registry.join('room', Player(f"p{i}", f"Player {i}"))
+        play_hands(registry, 'room', seed=3, hands=3)
+        registry.evict('room')
+    finally:
+        registry.close()
+
+    assert not os.path.exists(tmp_path / 'room.log')
+    assert Journal(str(tmp_path)).recover() == {}
+    hands = list(Journal(str(tmp_path)).histories())
+    assert len(hands) >= 3
+    for hand in hands:
+        assert hand['room_id'] == 'room' and set(hand['players']) == {'p0', 'p1'}
+        assert len(hand['deck']) == 52
+        assert sum(hand['scores'].values()) == 0
+        kinds = {move[0] for move in hand['moves']}
+        assert kinds <= {'action', 'place', 'timeout'}
+    assert any(move[0] == 'timeout' for hand in hands for move in hand['moves'])
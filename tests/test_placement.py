@@ -0,0 +1,44 @@
+import time
+from app.ai.placement import AutoPlacer, street_assignments
+from app.ai.rollout import DISCARD
+from app.game.evaluator import HandEvaluator
+from tests.test_search import make_state
+
+def apply(state, actions):
+    for action in actions:
+        assert action['index'] == len(getattr(state, f"{action['position']}_line"))
+        state.place_card(action['card'], action['position'], action['index'])
+
+def test_street_assignments_respect_capacity():
+    rows = street_assignments(3, 2, (0, 1, 4))
+    # Сброс одной из трех карт, из двух оставшихся в середину не больше одной
+    assert len(rows) == 3 * 3
+    assert ((rows != DISCARD).sum(axis=1) == 2).all()
+    assert not (rows == 0).any()
+    assert ((rows == 1).sum(axis=1) <= 1).all()
+
+def test_auto_placer_avoids_certain_foul():
+    # Пара девяток наверху при законченной средней линии без пары - мертвая рука
+    state = make_state(['9♠', '2♥', '3♦'], top=['9♦', '5♣'],
+                       middle=['K♣', 'J♦', '8♥', '6♠', '4♣'],
+                       bottom=['A♠', 'A♦', '10♣', '10♥', '7♣'], street=5)
+    actions = AutoPlacer().place_street(state)
+
+    assert len(actions) == 1
+    assert actions[0]['card'].rank != '9'
+    apply(state, actions)
+    categories = [HandEvaluator.evaluate_line(getattr(state, f"{p}_line"))[0]
+                  for p in ('top', 'middle', 'bottom')]
+    assert categories == sorted(categories)
+
+def test_auto_placer_first_street_is_fast():
+    placer = AutoPlacer()
+    state = make_state(['A♥', 'A♦', '2♣', '7♠', '9♠'], street=1)
+    started = time.monotonic()
+    actions = placer.place_street(state)
+
+    assert time.monotonic() - started < 0.05
+    assert len(actions) == 5
+    apply(state, actions)
+    # Пара тузов не уходит наверх без поддержки снизу
+    assert [card.rank for card in state.top_line].count('A') < 2
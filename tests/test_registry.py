@@ -0,0 +1,203 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import time
+import pytest
+from app.game.registry import GameRegistry
+from app.game.timers import TimerWheel
+from app.game.delta import apply_ops
+from app.game.core import GameState
+from app.game.player import Player
+
+@pytest.fixture
+def registry():
+    registry = GameRegistry(max_tables=300, max_players=2)
+    yield registry
+    registry.close()
+
+def test_registry_creates_and_evicts_tables(registry):
+    table = registry.create('alpha')
+    assert registry.get('alpha') is table and 'alpha' in registry
+    assert registry.get_or_create('alpha') is table
+    with pytest.raises(ValueError):
+        registry.create('alpha')
+
+    other = registry.create()
+    assert other.room_id != 'alpha' and len(registry) == 2
+    # Агент ИИ один на все столы
+    assert other.game.ai_agent is table.game.ai_agent
+
+    assert registry.evict('alpha') and not registry.evict('alpha')
+    assert 'alpha' not in registry and len(registry) == 1
+    with pytest.raises(ValueError):
+        registry.call('alpha', lambda game: game.get_game_state())
+
+def test_registry_enforces_capacity_limits():
+    registry = GameRegistry(max_tables=2, max_players=2)
+    try:
+        registry.create('a')
+        registry.create('b')
+        with pytest.raises(ValueError):
+            registry.create('c')
+
+        registry.join('a', Player('p1', 'One'))
+        registry.join('a', Player('p2', 'Two'))
+        with pytest.raises(ValueError):
+            registry.join('a', Player('p3', 'Three'))
+        assert registry.room_of('p1') == 'a' and registry.room_of('p3') is None
+
+        # Переход за другой стол освобождает место
+        registry.join('b', Player('p2', 'Two'))
+        registry.join('a', Player('p3', 'Three'))
+        assert registry.room_of('p2') == 'b' and registry.get('a').player_count == 2
+    finally:
+        registry.close()
+
+def test_registry_routes_actions_to_own_table(registry):
+    for room in ('red', 'blue'):
+        registry.join(room, Player(f'{room}-1', 'One'))
+        registry.join(room, Player(f'{room}-2', 'Two'))
+    registry.call('red', lambda game: game.start_game())
+
+    red, blue = registry.get('red').game, registry.get('blue').game
+    assert red.state == GameState.DEALING and blue.state == GameState.WAITING
+    # Таймер хода - в общем колесе цикла столов реестра
+    assert red.turn_timer.active
+    assert red.turn_timer.wheel is TimerWheel.for_loop(registry.runner.loop)
+
+    player_id = red.current_player_id
+    card = red.player_manager.get_player(player_id).hand.current_cards[0]
+    action = {'type': 'place_card', 'card': card.to_dict(), 'position': 'bottom', 'index': 0}
+    assert not registry.call('blue', lambda game: game.handle_player_action(player_id, action))
+    assert registry.call('red', lambda game: game.handle_player_action(player_id, action))
+
+    registry.evict('red')
+    assert registry.runner.run(asyncio.sleep(0, result=True))
+    assert red.turn_timer is None
+
+def test_registry_collects_idle_and_empty_tables(registry):
+    registry.join('busy', Player('p1', 'One'))
+    registry.create('empty')
+    idle = registry.create('idle')
+    idle.game.player_manager.add_player(Player('p2', 'Two'))
+
+    now = time.monotonic()
+    assert registry.collect_garbage(now) == []
+    assert registry.collect_garbage(now + registry.empty_timeout) == ['empty']
+    assert sorted(registry.collect_garbage(now + registry.idle_timeout)) == ['busy', 'idle']
+    assert len(registry) == 0 and registry.room_of('p1') is None
+
+def test_registry_serves_hundreds_of_tables_concurrently(registry):
+    rooms = [f'room-{i}' for i in range(200)]
+
+    def play(room):
+        registry.join(room, Player(f'{room}-a', 'A'))
+        registry.join(room, Player(f'{room}-b', 'B'))
+        registry.call(room, lambda game: game.start_game())
+        return registry.call(room, lambda game: game.get_game_state())
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        states = list(pool.map(play, rooms))
+
+    assert len(registry) == 200
+    assert all(state['state'] == GameState.DEALING for state in states)
+    assert all(set(state['players']) == {f'{room}-a', f'{room}-b'}
+               for room, state in zip(rooms, states))
+
+def test_registry_runs_in_server_loop():
+    registry = GameRegistry(max_players=2)
+
+    async def serve():
+        # Цикл столов - цикл ASGI-сервера: корутины ждут столы через await,
+        # синхронные вызовы идут из потоков (страницы Flask)
+        registry.runner.attach(asyncio.get_running_loop())
+        registry.start_gc()
+        try:
+            for i in range(2):
+                await registry.ajoin('loop', Player(f"l{i}", f"Player {i}"))
+            await registry.acall('loop', lambda game: game.start_game())
+            with pytest.raises(RuntimeError):
+                registry.call('loop', lambda game: game.state)
+            state = await asyncio.to_thread(registry.call, 'loop', lambda game: game.state)
+            messages, snapshot = await registry.asnapshot('loop', 'l0')
+            await registry.aleave('l1')
+            return state, snapshot
+        finally:
+            registry.close()
+
+    state, snapshot = asyncio.run(serve())
+    assert state == GameState.DEALING
+    assert snapshot['state']['players']['l0']['hand']['current']
+    assert registry.room_of('l1') is None and len(registry) == 0
+
+def test_routes_are_scoped_by_room():
+    from app import create_app, registry
+    app = create_app({'TESTING': True, 'SECRET_KEY': 'test'})
+
+    clients = [app.test_client() for _ in range(3)]
+    for client in clients:
+        client.get('/')
+    for client, room in zip(clients, ('east', 'east', 'west')):
+        response = client.post('/join', json={'room': room, 'name': 'Player'})
+        assert response.get_json()['room'] == room
+
+    assert clients[0].post('/start', json={}).status_code == 200
+    # Комната запоминается в сессии
+    assert clients[1].get('/state').get_json()['state'] == GameState.DEALING
+    assert clients[2].get('/state').get_json()['state'] == GameState.WAITING
+    assert clients[2].post('/start', json={}).status_code == 400
+
+    rooms = {table['room_id'] for table in clients[0].get('/tables').get_json()['tables']}
+    assert {'east', 'west'} <= rooms
+    for room in ('east', 'west'):
+        registry.evict(room)
+
+def test_socket_events_are_scoped_to_table_and_role():
+    from app import create_app, socketio, registry
+    app = create_app({'TESTING': True, 'SECRET_KEY': 'test'})
+    clients = {name: socketio.test_client(app) for name in ('a', 'b', 'watcher', 'stranger')}
+    clients['a'].emit('join_game', {'player_id': 'sock-a', 'room': 'north'})
+    clients['b'].emit('join_game', {'player_id': 'sock-b', 'room': 'north'})
+    clients['watcher'].emit('join_game', {'room': 'north', 'spectate': True})
+    clients['stranger'].emit('join_game', {'player_id': 'sock-x', 'room': 'south'})
+    views = {}
+
+    def replay(name):
+        """Состояние клиента: последний снимок и дельты после него"""
+        events = clients[name].get_received()
+        for event in events:
+            payload = event['args'][0]
+            if event['name'] == 'game_state':
+                views[name] = payload['state']
+            elif event['name'] == 'state_deltas':
+                for delta in payload:
+                    views[name] = apply_ops(views[name], delta['ops'])
+        return [event['name'] for event in events]
+
+    for name in clients:
+        replay(name)
+
+    registry.call('north', lambda game: game.start_game())
+    game = registry.get('north').game
+    mover = game.current_player_id
+    card = game.player_manager.get_player(mover).hand.current_cards[0].to_dict()
+    sender = clients['a'] if mover == 'sock-a' else clients['b']
+    sender.emit('place_card', {'card': card, 'position': 'bottom', 'index': 0})
+
+    assert replay('stranger') == []
+    for name in ('a', 'b', 'watcher'):
+        assert replay(name) == ['state_deltas']
+        assert views[name]['state'] == GameState.DEALING
+
+    # Наблюдатель не видит карт в руках, игрок видит только свои
+    def hands(name):
+        return {pid: player['hand']['current'] for pid, player in views[name]['players'].items()}
+
+    assert all(cards == [] for cards in hands('watcher').values())
+    assert hands('a')['sock-a'] and hands('a')['sock-b'] == []
+    assert hands('b')['sock-b'] and hands('b')['sock-a'] == []
+    assert card in views['watcher']['players'][mover]['hand']['bottom']
+
+    for client in clients.values():
+        client.disconnect()
+    for room in ('north', 'south'):
+        registry.evict(room)
@@ -0,0 +1,276 @@
+import copy
+import pytest
+import time
+import numpy as np
+from app.ai.strategy import MCTSStrategy
+from app.ai.parallel import ParallelMCTSStrategy
+from app.ai.state import GameStateInfo
+from app.ai.tree import NodeKind
+from app.ai.transposition import TranspositionTable
+from app.ai.search_state import SearchState
+from app.ai.batch_eval import line_categories, top_royalties, settle_board, FOUL_PENALTY
+from app.ai.rollout import RolloutEngine, RandomRolloutPolicy, HeuristicRolloutPolicy
+from app.game.evaluator import HandEvaluator
+from app.game.deck import Card, Deck
+
+def make_state(hand, top=(), middle=(), bottom=(), street=2, seen=()):
+    """Состояние, где available_cards - все неизвестные игроку карты"""
+    def cards(names):
+        return [Card(name[:-1], name[-1]) for name in names]
+
+    known = set(hand) | set(top) | set(middle) | set(bottom) | set(seen)
+    deck = [f"{rank}{suit}" for suit in Deck.SUITS for rank in Deck.RANKS]
+    return GameStateInfo(
+        available_cards=cards([name for name in deck if name not in known]),
+        hand_cards=cards(hand),
+        top_line=cards(top),
+        middle_line=cards(middle),
+        bottom_line=cards(bottom),
+        opponent_visible={},
+        street=street,
+        is_fantasy=False
+    )
+
+@pytest.fixture(autouse=True)
+def seed():
+    np.random.seed(0)
+
+def test_street_rules():
+    state = make_state(['A♥', 'K♦', '2♣'], top=['Q♥'], middle=['9♣', '9♦'],
+                       bottom=['5♠', '6♠'])
+    assert state.free_slots() == 8
+    assert not state.is_street_complete()
+
+    state.hand_cards = state.hand_cards[:1]
+    assert state.is_street_complete()
+    assert len(state.remaining_deck()) == 52 - 8
+
+def test_mcts_builds_tree_with_chance_nodes():
+    strategy = MCTSStrategy(simulation_count=300)
+    state = make_state(['A♥', 'K♦', '2♣'], top=['Q♥'], middle=['9♣', '9♦'],
+                       bottom=['5♠', '6♠'])
+    action = strategy.get_action(state)
+
+    assert action['type'] == 'place_card'
+    assert action['index'] == len(getattr(state, f"{action['position']}_line"))
+
+    # После двух размещений улица завершается и появляются узлы раздачи
+    kinds = set()
+    frontier = [strategy.root]
+    while frontier:
+        node = frontier.pop()
+        kinds.add(node.kind)
+        frontier.extend(node.children.values())
+    assert NodeKind.CHANCE in kinds
+
+def test_mcts_reuses_subtree_of_played_action():
+    strategy = MCTSStrategy(simulation_count=200)
+    state = make_state(['A♥', 'K♦', '2♣'], middle=['9♣', '9♦'], bottom=['5♠', '6♠'])
+    action = strategy.get_action(state)
+    reused = strategy.root
+
+    state.place_card(action['card'], action['position'], action['index'])
+    assert reused.key == state.zobrist()
+
+    visits_before = reused.visits
+    strategy.get_action(state)
+    assert visits_before > 0
+    # Новый корень - потомок сохраненного поддерева
+    assert strategy.root in reused.children.values()
+
+def test_mcts_completes_last_slot():
+    strategy = MCTSStrategy(simulation_count=50)
+    state = make_state(
+        ['A♠', '3♦', '7♥'],
+        top=['Q♥', 'Q♦', '4♣'],
+        middle=['9♣', '9♦', '9♥', '2♦', '3♥'],
+        bottom=['5♠', '6♠', '8♠', 'J♠'],
+        street=5
+    )
+    action = strategy.get_action(state)
+    assert action['position'] == 'bottom'
+    # Флеш в нижней линии выгоднее остальных карт
+    assert action['card'].suit == '♠'
+
+def test_batch_evaluator_matches_hand_evaluator():
+    lines = [
+        ['10♥', 'J♥', 'Q♥', 'K♥', 'A♥'],
+        ['9♥', '10♥', 'J♥', 'Q♥', 'K♥'],
+        ['A♥', 'A♦', 'A♣', 'K♠', 'K♥'],
+        ['2♥', '3♦', '4♣', '5♠', '6♥'],
+        ['2♥', '7♥', '4♥', '5♥', '9♥'],
+        ['A♥', '2♦', '3♣', '4♠', '5♥'],
+        ['Q♥', 'Q♦', 'K♣'],
+        ['7♥', '7♦', '7♣'],
+    ]
+    for names in lines:
+        cards = [Card(name[:-1], name[-1]) for name in names]
+        ids = [GameStateInfo._card_to_index(card) for card in cards]
+        padded = np.array([ids + [-1] * (5 - len(ids))])
+        assert line_categories(padded)[0] == HandEvaluator.evaluate_line(cards)[0]
+        if len(cards) == 3:
+            expected = HandEvaluator.calculate_royalties('top', cards)
+            assert top_royalties(padded[:, :3])[0] == expected
+
+def test_settle_board_penalizes_foul():
+    def ids(names):
+        return [GameStateInfo._card_to_index(Card(n[:-1], n[-1])) for n in names]
+
+    fouled = settle_board(ids(['A♥', 'A♦', '3♣']), ids(['2♥', '5♦', '8♣', 'J♠', 'K♥']),
+                          ids(['7♥', '7♦', '9♣', '9♠', '4♥']))
+    valid = settle_board(ids(['2♣', '5♦', '3♣']), ids(['A♥', 'A♦', '8♣', 'J♠', 'K♥']),
+                         ids(['7♥', '7♦', '9♣', '9♠', '4♥']))
+    assert fouled == -FOUL_PENALTY
+    assert valid > 0
+
+class RecordingPolicy(RandomRolloutPolicy):
+    def __init__(self):
+        self.dealt = []
+
+    def assign(self, lines, line_len, cards, place_count, rng):
+        self.dealt.append((cards.copy(), place_count))
+        return super().assign(lines, line_len, cards, place_count, rng)
+
+def test_rollout_engine_deals_future_streets():
+    state = make_state(['A♥', 'K♦', '2♣'], top=['Q♥'], middle=['9♣', '9♦'],
+                       bottom=['5♠', '6♠'], seen=['3♥', '4♥'])
+    policy = RecordingPolicy()
+    values = RolloutEngine(policy, seed=1).run(state, 500)
+
+    assert values.shape == (500,)
+    # Текущая улица и еще три улицы до заполнения 13 мест
+    assert [place for _, place in policy.dealt] == [2, 2, 2, 2]
+    known = {GameStateInfo._card_to_index(card) for card in
+             state.hand_cards + state.top_line + state.middle_line + state.bottom_line}
+    known |= {GameStateInfo._card_to_index(Card(n[:-1], n[-1])) for n in ['3♥', '4♥']}
+    future = np.concatenate([cards for cards, _ in policy.dealt[1:]], axis=1)
+    assert not np.isin(future, list(known)).any()
+    # Карты внутри одной симуляции не повторяются
+    assert all(len(set(row)) == len(row) for row in future[:50])
+
+@pytest.mark.parametrize("policy", [RandomRolloutPolicy(), HeuristicRolloutPolicy()])
+def test_rollout_policies_respect_capacity(policy):
+    state = make_state(['A♥', 'K♦', '2♣', '7♠', '7♦'], street=1)
+    values = RolloutEngine(policy, seed=2).run(state, 200)
+    # Доски заполняются до конца, поэтому часть рук оказывается мертвой
+    fouled = values == -FOUL_PENALTY
+    assert fouled.any() and not fouled.all()
+
+def test_heuristic_rollouts_foul_less_than_random():
+    states = [make_state(['A♥', 'K♦', '2♣', '7♠', '7♦'], street=1),
+              make_state(['A♥', 'K♦', '2♣'], top=['Q♥'], middle=['9♣', '9♦'],
+                         bottom=['5♠', '6♠'])]
+    for state in states:
+        for seed in range(3):
+            random_fouls = (RolloutEngine(RandomRolloutPolicy(), seed=seed)
+                            .run(state, 1000) == -FOUL_PENALTY).mean()
+            heuristic_fouls = (RolloutEngine(HeuristicRolloutPolicy(), seed=seed)
+                               .run(state, 1000) == -FOUL_PENALTY).mean()
+            assert heuristic_fouls < random_fouls
+
+def test_mcts_runs_until_deadline():
+    strategy = MCTSStrategy(simulation_count=1)
+    state = make_state(['A♥', 'K♦', '2♣'], middle=['9♣', '9♦'], bottom=['5♠', '6♠'])
+    deadline = time.monotonic() + 0.3
+    action = strategy.get_action(state, deadline)
+
+    assert action['type'] == 'place_card'
+    assert strategy.last_stats.simulations > 1
+    assert time.monotonic() - deadline < 0.2
+
+def test_parallel_search_merges_workers_before_deadline():
+    strategy = ParallelMCTSStrategy(workers=2, safety_margin=0.1)
+    state = make_state(['A♥', 'K♦', '2♣'], middle=['9♣', '9♦'], bottom=['5♠', '6♠'])
+    try:
+        # Первый вызов прогревает пул процессов
+        strategy.get_action(state, time.monotonic() + 2.0)
+        deadline = time.monotonic() + 0.5
+        action = strategy.get_action(state, deadline)
+    finally:
+        strategy.close()
+
+    result = strategy.last_result
+    assert action['type'] == 'place_card'
+    assert time.monotonic() - deadline < 0.2
+    assert result.workers_reported == 2
+    # Воркеры переиспользуют деревья, поэтому посещений не меньше симуляций
+    assert 0 < result.simulations <= sum(result.visits.values())
+
+def test_zobrist_hash_is_incremental_and_order_independent():
+    state = make_state(['A♥', 'K♦', '2♣'], top=['Q♥'], middle=['9♣', '9♦'],
+                       bottom=['5♠', '6♠'])
+    state.zobrist()
+    first, second = copy.deepcopy(state), copy.deepcopy(state)
+
+    first.place_card(first.hand_cards[0], 'top', 1)
+    first.place_card(first.hand_cards[0], 'bottom', 2)
+    second.place_card(second.hand_cards[1], 'bottom', 2)
+    second.place_card(second.hand_cards[0], 'top', 1)
+    assert first.zobrist() == second.zobrist() != state.zobrist()
+
+    dealt = first.remaining_deck()[:3]
+    first.deal_street(dealt)
+    fresh = copy.deepcopy(first)
+    fresh.zobrist_key = None
+    assert first.zobrist() == fresh.zobrist()
+
+def test_transposition_table_replacement_policy():
+    class Entry:
+        def __init__(self, visits):
+            self.visits = visits
+
+    table = TranspositionTable(capacity=4)
+    assert table.size == 4
+    assert table.store(1, Entry(10))
+    # Коллизия в текущем поколении: менее посещаемая запись не вытесняет
+    assert not table.store(5, Entry(3))
+    assert table.get(5) is None and table.get(1).visits == 10
+
+    # Записи прошлого поиска замещаются всегда
+    table.new_generation()
+    assert table.store(5, Entry(1))
+    assert table.get(1) is None
+    stats = table.stats()
+    assert stats['rejections'] == 1 and stats['replacements'] == 1
+    assert stats['hits'] == 1 and stats['misses'] == 2
+
+def test_mcts_shares_statistics_between_transpositions():
+    strategy = MCTSStrategy(simulation_count=400)
+    state = make_state(['A♥', 'K♦', '2♣'], top=['Q♥'], middle=['9♣', '9♦'],
+                       bottom=['5♠', '6♠'])
+    strategy.get_action(state)
+    assert strategy.transpositions.hits > 0
+
+    # Узел после двух размещений достижим из обоих порядков
+    root = strategy.transpositions.get(state.zobrist())
+    shared = 0
+    for first in root.children.values():
+        for second in first.children.values():
+            parents = [node for node in root.children.values()
+                       if any(child is second for child in node.children.values())]
+            shared += len(parents) > 1
+    assert shared > 0
+
+def test_search_state_apply_and_undo_restore_position():
+    state = make_state(['A♥', 'K♦', '2♣'], top=['Q♥'], middle=['9♣', '9♦'],
+                       bottom=['5♠', '6♠'])
+    search_state = SearchState.from_state(state)
+    assert search_state.key == state.zobrist()
+    lines = [list(line) for line in search_state.lines]
+    hand, deck = search_state.hand, search_state.deck
+
+    ace, king = (GameStateInfo._card_to_index(card) for card in state.hand_cards[:2])
+    search_state.apply(ace, 0, 0)
+    search_state.apply(king, 2)
+    assert search_state.line(0)[0] == ace and search_state.line(2)[-1] == king
+    assert search_state.is_street_complete()
+
+    dealt = search_state.remaining_deck()[:3]
+    search_state.deal(dealt)
+    assert search_state.key == SearchState.from_state(search_state.to_state()).key
+    assert search_state.street == 3 and search_state.hand_cards() == dealt
+
+    search_state.undo_to(0)
+    assert search_state.lines == lines
+    assert (search_state.hand, search_state.deck) == (hand, deck)
+    assert search_state.key == state.zobrist() and search_state.street == 2
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import threading
+import uuid
+import pytest
+import redis
+from app.game.core import GameState
+from app.game.player import Player
+from app.game.registry import GameRegistry
+from app.game.store import RedisStore
+
+@pytest.fixture
+def client():
+    """fakeredis, иначе локальный Redis (REDIS_URL); без обоих тесты пропускаются"""
+    try:
+        import fakeredis
+        return fakeredis.FakeRedis()
+    except ImportError:
+        pass
+    client = redis.Redis.from_url(os.environ.get('REDIS_URL', 'redis://localhost:6379/15'))
+    try:
+        client.ping()
+    except redis.ConnectionError:
+        pytest.skip("Нет fakeredis и локального Redis")
+    return client
+
+@pytest.fixture
+def workers(client):
+    """Два процесса (реестра) с общим хранилищем"""
+    prefix = f'test-{uuid.uuid4().hex[:8]}:'
+    registries = [GameRegistry(max_players=2, store=RedisStore(client, prefix=prefix))
+                  for _ in range(2)]
+    yield registries
+    for registry in registries:
+        registry.close()
+    for key in client.scan_iter(f'{prefix}*'):
+        client.delete(key)
+
+def test_any_worker_serves_any_table(workers):
+    first, second = workers
+    first.join('room', Player('p0', 'Player 0'))
+    # Второй процесс находит стол в хранилище и сажает второго игрока
+    assert 'room' in second
+    second.join('room', Player('p1', 'Player 1'))
+    assert first.room_of('p1') == 'room' and second.room_of('p0') == 'room'
+
+    first.call('room', lambda game: game.start_game())
+    game = second.table('room').game
+    player_id = second.call('room', lambda game: game.current_player_id)
+    card = game.player_manager.get_player(player_id).hand.current_cards[0].to_dict()
+    assert second.call('room', lambda game: game.handle_player_action(
+        player_id, {'type': 'place_card', 'card': card, 'position': 'bottom', 'index': 0}))
+
+    state = first.call('room', lambda game: game.get_game_state())
+    assert state['state'] == GameState.DEALING
+    assert state['players'][player_id]['hand']['bottom'] == [card]
+    assert state == second.call('room', lambda game: game.get_game_state())
+
+def test_conflicting_write_is_retried_on_fresh_state(workers):
+    first, second = workers
+    for i in range(2):
+        first.join('room', Player(f"p{i}", f"Player {i}"))
+    seen = []
+
+    def ready(game):
+        seen.append(game.player_manager.get_player('p0').is_ready)
+        if len(seen) == 1:
+            # Пока второй процесс выполняет действие, стол меняет первый
+            first.call('room', lambda game: game.core.set_ready('p0'))
+        return game.core.set_ready('p1')
+
+    # Запись поверх устаревшей версии отклоняется, действие повторяется
+    # на состоянии первого процесса
+    assert second.call('room', ready)
+    assert seen == [False, True]
+    players = first.call('room', lambda game: game.get_game_state()['players'])
+    assert players['p0']['is_ready'] and players['p1']['is_ready']
+
+def test_store_calls_leave_server_loop(client):
+    store = RedisStore(client, prefix=f'test-{uuid.uuid4().hex[:8]}:')
+    registry = GameRegistry(max_players=2, store=store)
+    threads = set()
+    for name in ('exists', 'load', 'save', 'room_of', 'clear_room'):
+        def record(*args, method=getattr(store, name)):
+            threads.add(threading.get_ident())
+            return method(*args)
+        setattr(store, name, record)
+
+    async def serve():
+        # Цикл ASGI-сервера не ждет ответов Redis: столы и рассылка других
+        # комнат продолжают работать
+        registry.runner.attach(asyncio.get_running_loop())
+        try:
+            for i in range(2):
+                await registry.ajoin('room', Player(f"p{i}", f"Player {i}"))
+            await registry.acall('room', lambda game: game.start_game())
+            await registry.asnapshot('room', 'p0')
+            await registry.aleave('p1')
+        finally:
+            registry.close()
+        return threading.get_ident()
+
+    try:
+        loop_thread = asyncio.run(serve())
+        assert threads and loop_thread not in threads
+    finally:
+        for key in client.scan_iter(f'{store.prefix}*'):
+            client.delete(key)
+
+def test_store_round_trip_and_pipelined_reads(client):
+    store = RedisStore(client, prefix=f'test-{uuid.uuid4().hex[:8]}:')
+    try:
+        assert store.load('a') is None
+        assert store.save('a', 0, {'n': 1}, ['p0']) == 1
+        assert store.save('a', 0, {'n': 2}) is None
+        assert store.save('b', 0, {'n': 3}) == 1
+        assert store.load('a') == (1, {'n': 1}) and store.load('a', 1) is None
+        assert store.load_many(['a', 'b', 'c']) == {'a': (1, {'n': 1}), 'b': (1, {'n': 3})}
+        assert store.room_of('p0') == 'a'
+        store.clear_room('p0')
+        assert store.room_of('p0') is None
+    finally:
+        for key in client.scan_iter(f'{store.prefix}*'):
+            client.delete(key)
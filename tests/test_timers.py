@@ -0,0 +1,110 @@
+import asyncio
+import random
+import time
+from app.game.timers import TimerWheel
+from app.game.game import Game
+from app.game.core import GameState
+from app.game.player import Player
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_wheel_fires_timers_in_deadline_order_across_levels():
+    clock = FakeClock()
+    wheel = TimerWheel(tick=0.1, slots=8, levels=2, clock=clock)
+    fired = []
+    delays = random.Random(1).sample(range(1, 2000), 200)
+    handles = {delay: wheel.schedule(delay / 10, fired.append, delay) for delay in delays}
+
+    cancelled = set(delays[::4])
+    for delay in cancelled:
+        handles[delay].cancel()
+    assert len(wheel) == len(delays) - len(cancelled)
+
+    # Таймеры дальше уровней колеса ждут в overflow и спускаются по мере хода
+    while clock.now < 200:
+        clock.now += 0.7
+        wheel.advance()
+        assert all(delay / 10 <= clock.now for delay in fired)
+
+    assert fired == sorted(set(delays) - cancelled)
+    assert len(wheel) == 0
+
+def test_wheel_pause_keeps_remaining_time():
+    clock = FakeClock()
+    wheel = TimerWheel(tick=0.1, clock=clock)
+    fired = []
+    handle = wheel.schedule(10.0, fired.append, 'turn')
+
+    clock.now = 4.0
+    handle.pause()
+    clock.now = 100.0
+    wheel.advance()
+    assert not fired and handle.time_left() == 6.0 and handle.elapsed() == 4.0
+
+    handle.resume()
+    clock.now = 105.0
+    wheel.advance()
+    assert not fired
+    clock.now = 106.1
+    wheel.advance()
+    assert fired == ['turn'] and handle.elapsed() == 10.0
+
+def test_wheel_cost_does_not_grow_with_pending_timers():
+    clock = FakeClock()
+    wheel = TimerWheel(tick=0.05, clock=clock)
+    started = time.perf_counter()
+    handles = [wheel.schedule(60.0 + i % 600, lambda: None) for i in range(50000)]
+    for handle in handles[::2]:
+        handle.cancel()
+    assert time.perf_counter() - started < 2.0
+
+    # Тики без срабатываний не перебирают ожидающие таймеры
+    started = time.perf_counter()
+    for _ in range(500):
+        clock.now += 0.05
+        assert wheel.advance() == 0
+    assert time.perf_counter() - started < 0.5
+    assert len(wheel) == 25000
+
+def test_game_charges_time_bank_and_times_out_through_wheel():
+    async def scenario():
+        clock = FakeClock()
+        wheel = TimerWheel(tick=0.1, clock=clock)
+        game = Game(timers=wheel)
+        for i in range(2):
+            game.player_manager.add_player(Player(f"p{i}", f"Player {i}"))
+        await game.start_game()
+
+        first = game.player_manager.get_player(game.current_player_id)
+        clock.now = game.TURN_TIME + 12.0
+        for card in list(first.hand.current_cards):
+            line = 'bottom' if len(first.hand.bottom) < 5 else 'middle'
+            assert await game.handle_player_action(
+                first.id, {'type': 'place_card', 'card': card.to_dict(),
+                           'position': line, 'index': 0})
+        # Сверх времени хода потрачено 12 секунд банка
+        assert first.time_bank == 48
+
+        second = game.player_manager.get_player(game.current_player_id)
+        assert second is not first
+        game.pause_turn_timer()
+        clock.now += 1000.0
+        wheel.advance()
+        game.resume_turn_timer()
+        clock.now += game.TURN_TIME + second.time_bank + 0.2
+        assert wheel.advance() == 1
+        await game._timeout_task
+
+        # Таймаут расставил карты второго игрока и списал весь банк
+        assert second.time_bank == 0
+        assert len(second.hand.top + second.hand.middle + second.hand.bottom) == 5
+        assert game.state == GameState.PLAYING and game.current_street == 2
+        game.stop_turn_timer()
+        wheel.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,115 @@
+import pytest
+import numpy as np
+import torch
+from app.ai.experience import (
+    ExperienceStore, PolicyTrainer, make_experience_loader,
+    STATE_SIZE, ACTION_SIZE
+)
+from app.ai.mccfr import MCCFRAgent, PolicyNetwork
+from app.ai.distill import (
+    PolicyDistiller, StrategyTableTeacher, DistilledPolicyStrategy,
+    model_memory_bytes, sample_states, save_compact_policy
+)
+from app.ai.state import ActionSpace, GameStateInfo
+
+def fill_store(store, count, seed=0):
+    rng = np.random.default_rng(seed)
+    states = rng.random((count, STATE_SIZE), dtype=np.float32)
+    masks = np.zeros((count, ACTION_SIZE), dtype=np.uint8)
+    targets = np.zeros((count, ACTION_SIZE), dtype=np.float32)
+    for i in range(count):
+        legal = rng.choice(ACTION_SIZE, size=4, replace=False)
+        masks[i, legal] = 1
+        targets[i, legal[0]] = 1.0
+    store.extend(states, masks, targets)
+    return states
+
+def test_experience_store_append_and_reopen(tmp_path):
+    store = ExperienceStore(str(tmp_path / "exp"), capacity=4)
+    states = fill_store(store, 10)
+    store.flush()
+
+    # Емкость выросла, данные сохранились
+    assert len(store) == 10
+    assert store.capacity >= 10
+
+    reopened = ExperienceStore(str(tmp_path / "exp"), readonly=True)
+    assert len(reopened) == 10
+    batch_states, masks, targets, weights = reopened.get_batch(np.array([7, 2]))
+    np.testing.assert_allclose(batch_states, states[[2, 7]])
+    assert masks.sum(axis=1).tolist() == [4, 4]
+    assert weights.tolist() == [1.0, 1.0]
+
+def test_readonly_store_rejects_writes(tmp_path):
+    ExperienceStore(str(tmp_path / "exp")).flush()
+    store = ExperienceStore(str(tmp_path / "exp"), readonly=True)
+    with pytest.raises(ValueError):
+        fill_store(store, 1)
+
+def test_loader_yields_shuffled_minibatches(tmp_path):
+    store = ExperienceStore(str(tmp_path / "exp"))
+    fill_store(store, 50)
+    store.flush()
+
+    loader = make_experience_loader(str(tmp_path / "exp"), batch_size=16,
+                                    num_workers=0, seed=1)
+    batches = list(loader)
+    assert [len(b[0]) for b in batches] == [16, 16, 16, 2]
+    states, masks, targets, weights = batches[0]
+    assert states.shape == (16, STATE_SIZE)
+    assert masks.dtype == torch.bool
+
+def test_trainer_reduces_loss(tmp_path):
+    torch.manual_seed(0)
+    store = ExperienceStore(str(tmp_path / "exp"))
+    fill_store(store, 64)
+    store.flush()
+
+    network = PolicyNetwork(hidden_size=64)
+    trainer = PolicyTrainer(network, torch.optim.Adam(network.parameters(), lr=0.01))
+    loader = make_experience_loader(str(tmp_path / "exp"), batch_size=32, num_workers=0)
+    losses = trainer.fit(loader, epochs=5)
+
+    assert losses[-1] < losses[0]
+    assert not network.training
+
+class HighCardBottomTeacher:
+    """Учитель, всегда кладущий старшую карту руки вниз"""
+    def __init__(self):
+        self.action_space = ActionSpace()
+
+    def get_average_strategy(self, state):
+        actions = self.action_space.get_valid_actions(state)
+        best = max(state.hand_cards, key=GameStateInfo._card_to_index)
+        strategy = np.zeros(len(actions))
+        for i, action in enumerate(actions):
+            if action['card'] is best and action['position'] == 'bottom':
+                strategy[i] = 1.0
+                break
+        return strategy
+
+def test_distilled_policy_agrees_with_teacher(tmp_path):
+    torch.manual_seed(0)
+    distiller = PolicyDistiller(HighCardBottomTeacher(), learning_rate=0.01, batch_size=64)
+    states = [s for s in sample_states(600, seed=0) if len(s.bottom_line) < 5]
+    holdout = [s for s in sample_states(100, seed=1) if len(s.bottom_line) < 5]
+
+    model, report = distiller.distill(states, hidden_sizes=(64,), epochs=15, holdout=holdout)
+
+    assert report.agreement > 0.5
+    assert report.memory_bytes < 4 * 1024 * 1024
+    assert report.memory_bytes == model_memory_bytes(model)
+
+    path = str(tmp_path / "student.pt")
+    save_compact_policy(model, path)
+    strategy = DistilledPolicyStrategy.from_file(path)
+    action = strategy.get_action(holdout[0])
+    assert action['type'] == 'place_card'
+
+def test_table_teacher_normalizes_strategy_sum():
+    state = sample_states(1, seed=3)[0]
+    key = MCCFRAgent._state_to_key(state)
+    teacher = StrategyTableTeacher({f"{key}_0": 3.0, f"{key}_1": 1.0})
+    strategy = teacher.get_average_strategy(state)
+    assert strategy[0] == pytest.approx(0.75)
+    assert strategy.sum() == pytest.approx(1.0)
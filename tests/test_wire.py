@@ -0,0 +1,67 @@
+import json
+from app.game.delta import apply_ops
+from app.game.player import Player
+from app.game.registry import GameRegistry
+from app.web import wire
+
+def played_table():
+    """Стол двух игроков посреди раздачи: карты на линиях и в руке"""
+    registry = GameRegistry(max_players=2)
+    for i in range(2):
+        registry.join('room', Player(f"wire-{i}", f"Player {i}"))
+    registry.call('room', lambda game: game.start_game())
+    game = registry.get('room').game
+    for _ in range(4):
+        mover = game.current_player_id
+        card = game.player_manager.get_player(mover).hand.current_cards[0].to_dict()
+        registry.call('room', lambda game: game.handle_player_action(
+            mover, {'type': 'place_card', 'card': card, 'position': 'bottom', 'index': 0}))
+    return registry, game
+
+def test_wire_round_trip_and_size():
+    registry, game = played_table()
+    try:
+        state = registry.call('room', lambda game: game.get_game_state())
+        frame = wire.encode(state)
+        assert wire.decode(frame) == state
+        # Полное состояние в разы компактнее JSON (к концу раздачи - больше)
+        assert len(frame) * 4 < len(json.dumps(state).encode())
+
+        values = [None, True, False, 0, -1, 300, -70000, 2 ** 40, 0.5, 2.0, '', 'текст', 'текст',
+                  {'rank': '10', 'suit': '♠'}, [{'rank': 'A', 'suit': '♥'}], [], [None, 1]]
+        assert wire.decode(wire.encode(values)) == values
+    finally:
+        registry.close()
+
+def test_binary_clients_receive_frames():
+    from app import create_app, socketio, registry
+    app = create_app({'TESTING': True, 'SECRET_KEY': 'test'})
+    binary, plain = socketio.test_client(app), socketio.test_client(app)
+    try:
+        binary.emit('join_game', {'player_id': 'wire-a', 'room': 'wire', 'encoding': 'binary'})
+        plain.emit('join_game', {'player_id': 'wire-b', 'room': 'wire'})
+        registry.call('wire', lambda game: game.start_game())
+        game = registry.get('wire').game
+        card = game.player_manager.get_player(game.current_player_id).hand.current_cards[0]
+        sender = binary if game.current_player_id == 'wire-a' else plain
+        sender.emit('place_card', {'card': card.to_dict(), 'position': 'bottom', 'index': 0})
+
+        def replay(client, decode):
+            view = None
+            for event in client.get_received():
+                payload = decode(event['args'][0])
+                if event['name'] == 'game_state':
+                    view = payload['state']
+                elif event['name'] == 'state_deltas':
+                    for delta in payload:
+                        view = apply_ops(view, delta['ops'])
+            return view
+
+        assert replay(binary, wire.decode) == \
+            registry.call('wire', lambda game: game.get_view('wire-a'))
+        assert replay(plain, lambda payload: payload) == \
+            registry.call('wire', lambda game: game.get_view('wire-b'))
+    finally:
+        binary.disconnect()
+        plain.disconnect()
+        registry.evict('wire')